@@ -0,0 +1,89 @@
+import argparse
+import json
+import time
+import tracemalloc
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric
+from synthetic_portfolio import synthetic_rows
+from transaction_row import fifo_fund_row
+
+scenarios = {
+    'lots_per_register' : [{'registers' : 10, 'lots_per_register' : lots} for lots in (100, 1000, 5000)],
+    'registers' : [{'registers' : registers, 'lots_per_register' : 100} for registers in (10, 100, 1000)],
+    'partial_fill_ratio' : [{'registers' : 10, 'lots_per_register' : 1000, 'partial_fill_ratio' : ratio} for ratio in (0.0, 0.5, 1.0)],
+    'conversion_depth' : [{'registers' : 10, 'lots_per_register' : 1000, 'conversion_depth' : depth} for depth in (0, 2, 8)],
+}
+
+def percentile(samples : list, fraction : float):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def replay(transactions : list):
+    engine = fifo_transaction_engine()
+    operations = {'Buy' : engine.add_payment, 'Conversion' : engine.add_conversion, 'Sell' : engine.add_withdrawal}
+    latencies = {operation : [] for operation in operations}
+    clock = time.perf_counter
+    for transaction in transactions:
+        start = clock()
+        operations[transaction[0]](*transaction[1:])
+        latencies[transaction[0]].append(clock() - start)
+    engine.aggregates
+    return latencies
+
+def peak_memory(transactions : list):
+    tracemalloc.start()
+    engine = fifo_transaction_engine()
+    engine.apply_batch(transactions)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+def run_scenario(seed : int, parameters : dict):
+    numeric = fraction_numeric()
+    rows = list(synthetic_rows(seed, **parameters))
+    start = time.perf_counter()
+    transactions = [fifo_fund_row(numeric, row) for row in rows]
+    parse_time = time.perf_counter() - start
+    start = time.perf_counter()
+    engine = fifo_transaction_engine()
+    engine.apply_batch(transactions)
+    engine.aggregates
+    apply_time = time.perf_counter() - start
+    latencies = replay(transactions)
+    result = {'parameters' : parameters, 'rows' : len(rows), 'parse_rows_per_second' : len(rows) / parse_time,
+              'apply_rows_per_second' : len(rows) / apply_time, 'peak_memory_bytes' : peak_memory(transactions), 'latency' : {}}
+    for (operation, samples) in latencies.items():
+        if not samples:
+            continue
+        samples.sort()
+        result['latency'][operation] = {'count' : len(samples), 'p50_us' : percentile(samples, 0.5) * 1e6,
+                                        'p95_us' : percentile(samples, 0.95) * 1e6, 'max_us' : samples[-1] * 1e6}
+    return result
+
+def print_result(name : str, result : dict):
+    parameters = ', '.join(f'{key}={value}' for (key, value) in result['parameters'].items())
+    print(f'[{name}] {parameters}')
+    print(f'  rows {result["rows"]:,}  parse {result["parse_rows_per_second"]:,.0f} rows/s  apply {result["apply_rows_per_second"]:,.0f} rows/s'
+          f'  peak {result["peak_memory_bytes"] / 2 ** 20:,.1f} MiB')
+    for (operation, latency) in result['latency'].items():
+        print(f'  {operation:<10} n={latency["count"]:<8,} p50 {latency["p50_us"]:8.1f} us  p95 {latency["p95_us"]:8.1f} us'
+              f'  max {latency["max_us"]:10.1f} us')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Benchmark fifo_transaction_engine on seeded synthetic portfolios')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenario', help='Scenario group to run (default: all)', choices=sorted(scenarios), action='append')
+    parser.add_argument('--scale', help='Multiplier applied to lots per register and register counts', type=float, default=1.0)
+    parser.add_argument('--output', help='Write results as JSON for comparing runs')
+    options = parser.parse_args()
+    results = {}
+    for name in options.scenario or sorted(scenarios):
+        results[name] = []
+        for parameters in scenarios[name]:
+            parameters = {key : max(1, int(value * options.scale)) if key in ('registers', 'lots_per_register') else value
+                          for (key, value) in parameters.items()}
+            result = run_scenario(options.seed, parameters)
+            print_result(name, result)
+            results[name].append(result)
+    if options.output is not None:
+        with open(options.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
@@ -0,0 +1,37 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+def cold_start(module : str):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', f'import {module}'], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    return time.perf_counter() - start
+
+def import_times(module : str):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for line in result.stderr.splitlines()[1:]:
+        (own, cumulative, name) = line.split(':', 1)[1].split('|')
+        times.append((int(cumulative), name.strip()))
+    return times
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Measure cold start import time of the cost_base entry points')
+    parser.add_argument('--module', help='Module to import', action='append')
+    parser.add_argument('--repeat', help='Cold starts per module', type=int, default=10)
+    parser.add_argument('--top', help='Slowest imports listed per module', type=int, default=5)
+    parser.add_argument('--max-ms', help='Fail when the median cold start exceeds this budget', type=float)
+    options = parser.parse_args()
+    baseline = statistics.median(cold_start('sys') for _ in range(options.repeat))
+    failed = False
+    for module in options.module or ['cost_base', 'service']:
+        elapsed = statistics.median(cold_start(module) for _ in range(options.repeat))
+        print(f'{module:<16} {elapsed * 1000:>8.1f} ms  ({(elapsed - baseline) * 1000:.1f} ms over bare interpreter)')
+        for (cumulative, name) in sorted(import_times(module), reverse=True)[1:options.top + 1]:
+            print(f'    {name:<28} {cumulative / 1000:>8.1f} ms')
+        failed = failed or (options.max_ms is not None and elapsed * 1000 > options.max_ms)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,27 @@
+import argparse
+import time
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric, decimal_numeric
+
+def split_chain(numeric, splits : int):
+    engine = fifo_transaction_engine(numeric)
+    engine.add_payment('fund', 'register', numeric.from_cell(1000000.37), numeric.from_cell(0.0), numeric.units_from_cell(100000.0),
+                       numeric.units_from_cell(3.9137), 'buy')
+    units = numeric.units_from_cell(0.37)
+    payment = numeric.from_cell(4.11)
+    rate = numeric.units_from_cell(4.0211)
+    fee = numeric.from_cell(0.0)
+    start = time.perf_counter()
+    for i in range(splits):
+        engine.add_withdrawal('fund', 'register', payment, fee, units, rate, f'sell {i}')
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Compare numeric backends on a long chain of partial sells from one lot')
+    parser.add_argument('--splits', help='Number of partial sells', type=int, default=2000)
+    parser.add_argument('--places', help='Decimal places of money amounts kept by the decimal backend', type=int, default=8)
+    parser.add_argument('--unit-places', help='Decimal places of units and conversion rates kept by the decimal backend', type=int, default=8)
+    options = parser.parse_args()
+    for (name, numeric) in (('fraction', fraction_numeric()), ('decimal', decimal_numeric(options.places, unit_places=options.unit_places))):
+        elapsed = split_chain(numeric, options.splits)
+        print(f'{name:<10} {options.splits / elapsed:>12,.0f} splits/s  ({elapsed:.3f} s)')
@@ -0,0 +1,26 @@
+import argparse
+import time
+from numeric import fraction_numeric, decimal_numeric
+from synthetic_portfolio import synthetic_rows
+from transaction_row import fifo_fund_row, fifo_fund_rows
+
+def row_parse(numeric, rows : list):
+    return [fifo_fund_row(numeric, values) for values in rows]
+
+def time_parse(parse, numeric, rows : list, batch_size : int):
+    start = time.perf_counter()
+    for offset in range(0, len(rows), batch_size):
+        parse(numeric, rows[offset:offset + batch_size])
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Compare row-by-row and columnar parsing of spreadsheet rows')
+    parser.add_argument('--registers', help='Number of synthetic registers', type=int, default=100)
+    parser.add_argument('--lots', help='Number of lots per register', type=int, default=200)
+    parser.add_argument('--batch-size', help='Rows parsed per batch', type=int, default=4096)
+    options = parser.parse_args()
+    rows = list(synthetic_rows(registers=options.registers, lots_per_register=options.lots))
+    for (numeric_name, numeric) in (('fraction', fraction_numeric()), ('decimal', decimal_numeric())):
+        for (name, parse) in (('row', row_parse), ('columnar', fifo_fund_rows)):
+            elapsed = time_parse(parse, numeric, rows, options.batch_size)
+            print(f'{numeric_name:<10} {name:<10} {len(rows) / elapsed:>12,.0f} rows/s  ({elapsed:.3f} s)')
@@ -0,0 +1,67 @@
+import argparse
+import copy
+import sys
+import time
+import tracemalloc
+from fractions import Fraction
+from payment import payment_unit
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric
+from synthetic_portfolio import row
+from transaction_row import fifo_fund_rows
+
+def deepcopy_split(unit : payment_unit, units : Fraction):
+    split_ration = units / unit.units
+    portion = copy.deepcopy(unit)
+    for (lot, multiplier) in ((portion, split_ration), (unit, 1 - split_ration)):
+        (fund_name, register, transaction, lot_units, cost, status, cost_in_local_currency, redemption) = lot.__getstate__()
+        lot.__setstate__((fund_name, register, transaction, lot_units * multiplier, cost * multiplier, status,
+                          cost_in_local_currency * multiplier, redemption))
+    return portion
+
+def direct_split(unit : payment_unit, units : Fraction):
+    return unit.split(units)
+
+def time_lot_splits(split, splits : int):
+    unit = payment_unit('fund', 'register', Fraction(10 ** 9), Fraction(10 ** 9), Fraction(4), 'buy')
+    units = Fraction(1)
+    start = time.perf_counter()
+    for _ in range(splits):
+        split(unit, units)
+    return time.perf_counter() - start
+
+def time_partial_fills(sells : int):
+    engine = fifo_transaction_engine()
+    zero = Fraction(0)
+    for i in range(sells):
+        engine.add_payment('fund', 'register', Fraction(100 + i % 7), zero, Fraction(3), Fraction(4), f'buy {i}')
+    start = time.perf_counter()
+    for i in range(sells):
+        engine.add_withdrawal('fund', 'register', Fraction(250), zero, Fraction(2), Fraction(4), f'sell {i}')
+    return time.perf_counter() - start
+
+def lot_memory(lots : int, registers : int = 10):
+    rows = [row(i, 'Buy', ''.join(['fund ', str(i % registers)]), ''.join(['register ', str(i % registers)]), 1.0 + i % 7, 100.0 + i,
+                rate=4.0) for i in range(lots)]
+    transactions = fifo_fund_rows(fraction_numeric(), rows)
+    del rows
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    units = [payment_unit(*transaction[1:4], *transaction[5:8]) for transaction in transactions]
+    allocated = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return (allocated / len(units), sys.getsizeof(units[0]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Measure lot split cost on partial-fill heavy workloads')
+    parser.add_argument('--splits', help='Number of lot splits', type=int, default=100000)
+    parser.add_argument('--sells', help='Number of partial-fill sells replayed through the engine', type=int, default=5000)
+    parser.add_argument('--lots', help='Number of parsed lots whose memory is measured', type=int, default=100000)
+    options = parser.parse_args()
+    for (name, split) in (('deepcopy', deepcopy_split), ('split', direct_split)):
+        elapsed = time_lot_splits(split, options.splits)
+        print(f'{name:<10} {options.splits / elapsed:>12,.0f} lot splits/s  ({elapsed:.3f} s)')
+    elapsed = time_partial_fills(options.sells)
+    print(f'{"engine":<10} {options.sells / elapsed:>12,.0f} partial-fill sells/s  ({elapsed:.3f} s)')
+    (allocated, size) = lot_memory(options.lots)
+    print(f'{"memory":<10} {allocated:>12,.0f} bytes/lot  ({size} bytes per payment_unit object)')
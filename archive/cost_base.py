@@ -1,109 +1,236 @@
 import argparse
-import xlrd
+import datetime
+import importlib.util
+import os
+import re
+import sys
+from ingest import open_sheets
 from fifo_transaction_engine import fifo_transaction_engine
-from enum import IntEnum
-from fractions import Fraction
-from tabulate import tabulate
+from lot_store import lot_methods
+from numeric import fraction_numeric, decimal_numeric
+from transaction_row import Field, fifo_fund_transactions
+from timeline import transaction_timeline
+from instrumentation import engine_metrics, timed, text_exporter, json_lines_exporter
+from report import closed_rows, remaining_rows, table_writer, open_report, text_writers, columnar_formats
 
-class Field(IntEnum):
-    lp = 0,
-    date = 1,
-    operation = 2,
-    number = 3,
-    payment = 4,
-    fund_name = 5,
-    register = 6,
-    units = 7,
-    commision = 8,
-    dst_fund_name = 9,
-    dst_register = 10,
-    dst_units = 11,
-    currency_converion_rate = 12
-    tax_gain = 13
+class state_mismatch(ValueError):
+    pass
 
-def fifo_fund_buy_transaction(engine, row):
-    fund_name = row[Field.fund_name].strip()
-    register = row[Field.register].strip()
-    payment = Fraction(repr(row[Field.payment]))
-    units = Fraction(repr(row[Field.units]))
-    currency_conversion_rate = Fraction(repr(row[Field.currency_converion_rate]))
-    fee = Fraction(repr(row[Field.commision]))
-    transaction_number = row[Field.number].strip()
+def write_fifo_fund_tax(writer, closed_transactions : dict, remaining_units : dict, sheet_name : str = None, scope : str = None,
+                        period : tuple = None):
+    writer.write_section('closed', closed_rows(closed_transactions), sheet_name, scope, period)
+    writer.write_section('remaining', remaining_rows(remaining_units), sheet_name, scope, period)
 
-    engine.add_payment(fund_name, register, payment, fee, units, currency_conversion_rate, transaction_number)
+def print_fifo_fund_tax(closed_transactions : dict, remaining_units : dict):
+    write_fifo_fund_tax(table_writer(sys.stdout), closed_transactions, remaining_units)
 
-def fifo_fund_conversion_transaction(engine, row):
-    src_fund_name = row[Field.fund_name].strip()
-    src_register = row[Field.register].strip()
-    src_units = Fraction(repr(row[Field.units]))
-    dst_fund_name = row[Field.dst_fund_name].strip()
-    dst_register = row[Field.dst_register].strip()
-    dst_units = Fraction(repr(row[Field.dst_units]))
-    fee = Fraction(repr(row[Field.commision]))
-    transaction_number = row[Field.number].strip()
-    currency_conversion_rate = Fraction(repr(row[Field.currency_converion_rate]))
+def write_point_in_time(writer, engine, as_of : list = None, realized_between : tuple = None, sheet_name : str = None):
+    for date in as_of or ():
+        (remaining_funds, closed_transactions) = engine.as_of(date)
+        write_fifo_fund_tax(writer, closed_transactions, remaining_funds, sheet_name, f'as of {date}', (None, date))
+    if realized_between is not None:
+        writer.write_section('closed', closed_rows(engine.realized_between(*realized_between)), sheet_name,
+                             f'realized between {realized_between[0]} and {realized_between[1]}', tuple(realized_between))
 
-    engine.add_conversion(src_fund_name, src_register, src_units, dst_fund_name, dst_register, dst_units, fee, currency_conversion_rate, transaction_number)
+def render_fifo_fund_diagram(recorder, render_file : str, render_format : str = 'png', ancestry : str = None, start = None, end = None,
+                             components : bool = False, register : tuple = None):
+    if components:
+        return recorder.render_components(render_file, render_format)
+    transactions = None
+    if ancestry is not None:
+        transactions = recorder.ancestry(ancestry)
+    if register is not None:
+        selected = recorder.register_transactions(*register)
+        transactions = selected if transactions is None else transactions & selected
+    if start is not None or end is not None:
+        selected = recorder.date_range_transactions(start, end)
+        transactions = selected if transactions is None else transactions & selected
+    return recorder.render(render_file, transactions, render_format)
 
-def fifo_fund_sell_transaction(engine, row):
-    fund_name = row[Field.fund_name].strip()
-    register = row[Field.register].strip()
-    payment = Fraction(repr(row[Field.payment]))
-    units = Fraction(repr(row[Field.units]))
-    fee = Fraction(repr(row[Field.commision]))
-    transaction_number = row[Field.number].strip()
-    currency_conversion_rate = Fraction(repr(row[Field.currency_converion_rate]))
+def calculate_fifo_fund_tax(rows, render_file : str, numeric = None, engine = None, render_options : dict = None, metrics = None,
+                            method : str = 'fifo', timeline : bool = False, report_options : dict = None, writer = None, sheet_name : str = None,
+                            rates = None, payments = None):
+    writer = writer if writer is not None else table_writer(sys.stdout)
+    if engine is None:
+        recorder = None
+        if render_file is not None:
+            from diagram import diagram_recorder
+            recorder = diagram_recorder()
+        engine = fifo_transaction_engine(numeric, recorder, metrics, method, transaction_timeline() if timeline or report_options else None, rates,
+                                         payments)
+    else:
+        engine.metrics = metrics
+        if rates is not None:
+            engine.rates = rates
+        rows = (row_values for row_values in rows if not engine.has_transaction(row_values[Field.number].strip()))
+    fifo_fund_transactions(engine, rows)
 
-    engine.add_withdrawal(fund_name, register, payment, fee, units, currency_conversion_rate, transaction_number)
+    with timed(metrics, 'report.aggregate'):
+        (remaining_funds, closed_transactions) = engine.aggregates
+    with timed(metrics, 'report.write'):
+        write_fifo_fund_tax(writer, closed_transactions, remaining_funds, sheet_name)
+        if report_options:
+            write_point_in_time(writer, engine, **report_options, sheet_name=sheet_name)
+    if not render_file is None:
+        with timed(metrics, 'diagram.render'):
+            render_fifo_fund_diagram(engine.observer, render_file, **(render_options or {}))
+    if metrics is not None:
+        metrics.export()
+    return engine
 
-def calculate_fifo_fund_tax(sheet, render_file : str):
-    engine = fifo_transaction_engine()
-    for i in range(3, sheet.nrows):
-        row_values = sheet.row_values(i)
-        transaction_type = row_values[Field.operation]
-        if transaction_type == 'Buy':
-            fifo_fund_buy_transaction(engine, row_values)
-        elif transaction_type == 'Conversion':
-            fifo_fund_conversion_transaction(engine, row_values)
-        elif transaction_type == 'Sell':
-            fifo_fund_sell_transaction(engine, row_values)
-        else:
-            raise ValueError(f'Undefined transaction type {transaction_type}')
+def calculate_methods_tax(rows, methods : list, numeric = None, metrics = None, writer = None, sheet_name : str = None, rates = None):
+    from multi_method_engine import multi_method_engine
+    writer = writer if writer is not None else table_writer(sys.stdout)
+    engine = multi_method_engine(methods, numeric, metrics, rates)
+    fifo_fund_transactions(engine, rows)
+    for (method, (remaining_funds, closed_transactions)) in engine.aggregates.items():
+        write_fifo_fund_tax(writer, closed_transactions, remaining_funds, sheet_name, f'method {method}')
+    if metrics is not None:
+        metrics.export()
+    return engine
 
-    closed_transactions = engine.closed_transactions
-    print(f'Closed transactions:')
-    headers = ['Fund', 'Register', 'Transaction', 'Cost PLN', 'Cost USD', 'Payment USD', 'Payment PLN', 'Units']
-    entries = []
-    for (key, value) in closed_transactions.items():
-        list_values = []
-        for item in key:
-            list_values.append(f'{item}')
-        for item in value:
-            list_values.append(f'{float(item):,.2f}')
-        entries.append(list_values)
-    print(tabulate(entries, headers))
-    remaining_units = engine.remaining_funds
-    print(f'\nRemaining funds:')
-    headers = ['Fund', 'Register', 'Cost PLN', 'Cost USD', 'Units']
-    entries = []
-    for (key, value) in remaining_units.items():
-        list_values = [f'{key[0]}', f'{key[1]}']
-        for item in value:
-            list_values.append(f'{float(item):,.2f}')
-        entries.append(list_values)
-    print(tabulate(entries, headers))
-    if not render_file is None:
-        engine.generate_diagram(render_file)
+def sheet_state_file(state_directory : str, sheet_name : str):
+    return os.path.join(state_directory, re.sub(r'[^\w.-]', '_', sheet_name) + '.state')
+
+def sheet_lot_store(lot_directory : str, sheet_name : str, method : str = 'fifo', numeric = None):
+    if lot_directory is None:
+        return None
+    from sqlite_lot_store import sqlite_lot_store
+    os.makedirs(lot_directory, exist_ok=True)
+    database_file = os.path.join(lot_directory, re.sub(r'[^\w.-]', '_', sheet_name) + '.sqlite')
+    for stale_file in (database_file, f'{database_file}-wal', f'{database_file}-shm'):
+        if os.path.exists(stale_file):
+            os.remove(stale_file)
+    return sqlite_lot_store(database_file, method, numeric=numeric)
+
+def load_sheet_state(state_file : str, numeric = None, method : str = None, render : bool = False):
+    if not os.path.exists(state_file):
+        return None
+    from sqlite_lot_store import stale_lot_database
+    try:
+        engine = fifo_transaction_engine.load(state_file)
+    except stale_lot_database as error:
+        print(f'{error}; replaying {state_file} from the spreadsheet', file=sys.stderr)
+        return None
+    if numeric is not None and engine.numeric.to_record() != numeric.to_record():
+        raise state_mismatch(f'{state_file} was saved with numeric backend {engine.numeric.to_record()}, not {numeric.to_record()}')
+    if method is not None and engine.method != method:
+        raise state_mismatch(f'{state_file} was saved with lot selection method {engine.method}, not {method}')
+    if render and engine.observer is None:
+        print(f'{state_file} was saved without a diagram recorder; replaying it from the spreadsheet for --render', file=sys.stderr)
+        return None
+    return engine
+
+def named_sheets(sheets, sheet_names : list):
+    for (sheet_name, rows) in sheets:
+        sheet_names.append(sheet_name)
+        yield (sheet_name, rows)
 
-def calculate_tax(spreadsheet_file : str, render_file):
-    workbook = xlrd.open_workbook(spreadsheet_file)
-    for sheet_name in workbook.sheet_names():
-        calculate_fifo_fund_tax(workbook.sheet_by_name(sheet_name), render_file)
+def calculate_tax(spreadsheet_file : str, render_file, numeric = None, jobs : int = 1, state_directory : str = None,
+                  render_options : dict = None, metrics = None, methods : list = None, report_options : dict = None, writer = None, rates = None,
+                  lot_directory : str = None):
+    methods = methods or ['fifo']
+    writer = writer if writer is not None else table_writer(sys.stdout)
+    if len(methods) > 1:
+        for (sheet_name, rows) in open_sheets(spreadsheet_file, len(Field)):
+            calculate_methods_tax(rows, methods, numeric, metrics, writer, sheet_name, rates)
+        return
+    if state_directory is not None:
+        os.makedirs(state_directory, exist_ok=True)
+        for (sheet_name, rows) in open_sheets(spreadsheet_file, len(Field)):
+            state_file = sheet_state_file(state_directory, sheet_name)
+            with timed(metrics, 'state.load'):
+                engine = load_sheet_state(state_file, numeric if numeric is not None else fraction_numeric(), methods[0],
+                                          render_file is not None)
+            payments = sheet_lot_store(lot_directory, sheet_name, methods[0], numeric) if engine is None else None
+            engine = calculate_fifo_fund_tax(rows, render_file, numeric, engine, render_options, metrics, methods[0], True, report_options,
+                                             writer, sheet_name, rates, payments)
+            with timed(metrics, 'state.save'):
+                engine.save(state_file)
+        return
+    if jobs > 1 and render_file is None and not report_options and lot_directory is None:
+        from parallel import calculate_parallel
+        sheet_names = []
+        results = calculate_parallel(named_sheets(open_sheets(spreadsheet_file, len(Field)), sheet_names), numeric, jobs, methods[0], rates,
+                                     metrics)
+        for ((closed_transactions, remaining_units), sheet_name) in zip(results, sheet_names):
+            with timed(metrics, 'report.write'):
+                write_fifo_fund_tax(writer, closed_transactions, remaining_units, sheet_name)
+            if metrics is not None:
+                metrics.export()
+        return
+    for (sheet_name, rows) in open_sheets(spreadsheet_file, len(Field)):
+        payments = sheet_lot_store(lot_directory, sheet_name, methods[0], numeric)
+        calculate_fifo_fund_tax(rows, render_file, numeric, None, render_options, metrics, methods[0], False, report_options, writer, sheet_name,
+                                rates, payments)
+        if payments is not None:
+            payments.disconnect()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description = 'Calculate tax gain based on transaction set')
-    parser.add_argument('spreadsheet', help='Spreadsheet with transaction record .xlsx', nargs=1)
+    parser.add_argument('spreadsheet', help='Spreadsheet with transaction record .xlsx, .xls or .csv', nargs=1)
     parser.add_argument('--render',  help='Render diagram .png file',nargs='?')
+    parser.add_argument('--render-format', help='Diagram output format', choices=['png', 'svg', 'pdf'], default='png')
+    parser.add_argument('--render-ancestry', help='Render only the transactions that funded the given transaction number')
+    parser.add_argument('--render-from', help='Render only transactions dated on or after YYYY-MM-DD', type=datetime.date.fromisoformat)
+    parser.add_argument('--render-to', help='Render only transactions dated on or before YYYY-MM-DD', type=datetime.date.fromisoformat)
+    parser.add_argument('--render-register', help='Render only the transactions booked in the given fund and register', nargs=2,
+                        metavar=('FUND', 'REGISTER'))
+    parser.add_argument('--render-components', help='Render every connected component into its own file in the --render directory',
+                        action='store_true')
+    parser.add_argument('--numeric', help='Numeric backend used for lot arithmetic', choices=['fraction', 'decimal'], default='fraction')
+    parser.add_argument('--places', help='Decimal places of money amounts kept by the decimal backend', type=int, default=8)
+    parser.add_argument('--unit-places', help='Decimal places of units and conversion rates kept by the decimal backend', type=int, default=8)
+    parser.add_argument('--rounding', help='Rounding rule of the decimal backend', default='ROUND_HALF_EVEN',
+                        choices=['ROUND_HALF_EVEN', 'ROUND_HALF_UP', 'ROUND_HALF_DOWN', 'ROUND_UP', 'ROUND_DOWN', 'ROUND_CEILING', 'ROUND_FLOOR'])
+    parser.add_argument('--method', help='Lot selection method; repeat to compare several methods in one pass (without --state, --jobs or --render)',
+                        choices=list(lot_methods), action='append')
+    parser.add_argument('--as-of', help='Also report positions and realized gains as of YYYY-MM-DD (repeatable)', type=datetime.date.fromisoformat,
+                        action='append')
+    parser.add_argument('--realized-between', help='Also report gains realized between two YYYY-MM-DD dates', nargs=2,
+                        type=datetime.date.fromisoformat, metavar=('START', 'END'))
+    parser.add_argument('--format', help='Report format; csv and jsonl keep exact values, arrow and parquet write decimal columns '
+                                         'with --numeric decimal and exact fraction strings otherwise', default='table',
+                        choices=list(text_writers) + list(columnar_formats))
+    parser.add_argument('--output', help='Report file (default: standard output; required for arrow and parquet)')
+    parser.add_argument('--rates', help='CSV with date and rate columns used for rows without a conversion rate')
+    parser.add_argument('--lot-database', help='Directory for SQLite lot stores that keep open and closed lots, transaction ids and lineage '
+                                               'on disk (fifo and lifo only); the --state timeline still stays in memory')
+    parser.add_argument('--state', help='Directory with engine snapshots; only transactions missing from a snapshot are replayed '
+                                        '(a snapshot is only reused with the --numeric and --method it was saved with, '
+                                        'and with --render only if it was saved with --render)')
+    parser.add_argument('--metrics', help='Print engine counters and phase timings to stderr', choices=['text', 'json'])
+    parser.add_argument('--jobs', help='Worker processes for independent sheets and registers (not with --render, --state, --as-of, '
+                                       '--realized-between or --lot-database)', type=int, default=1)
     options = parser.parse_args()
+    if options.method is not None and len(options.method) > 1 and (options.state or options.jobs > 1 or options.render):
+        parser.error('several --method values can\'t be combined with --state, --jobs or --render')
+    if options.jobs > 1 and (options.render or options.state or options.as_of or options.realized_between or options.lot_database):
+        parser.error('--jobs can\'t be combined with --render, --state, --as-of, --realized-between or --lot-database')
+    if options.lot_database is not None and (options.method or ['fifo']) not in (['fifo'], ['lifo']):
+        parser.error('--lot-database supports a single fifo or lifo method')
+    if options.format in columnar_formats and options.output is None:
+        parser.error(f'--format {options.format} needs --output')
+    if options.format in columnar_formats and importlib.util.find_spec('pyarrow') is None:
+        parser.error(f'--format {options.format} needs the optional pyarrow package')
     if options is not None:
-        calculate_tax(options.spreadsheet[0], options.render)
\ No newline at end of file
+        numeric = fraction_numeric() if options.numeric == 'fraction' else decimal_numeric(options.places, options.rounding, unit_places=options.unit_places)
+        render_options = {'render_format' : options.render_format, 'ancestry' : options.render_ancestry, 'start' : options.render_from,
+                          'end' : options.render_to, 'components' : options.render_components,
+                          'register' : tuple(options.render_register) if options.render_register is not None else None}
+        report_options = None
+        if options.as_of or options.realized_between:
+            report_options = {'as_of' : options.as_of, 'realized_between' : options.realized_between}
+        rates = None
+        if options.rates is not None:
+            from rates import rate_table
+            rates = rate_table.from_csv(options.rates, numeric)
+        metrics = None
+        if options.metrics is not None:
+            metrics = engine_metrics([text_exporter(sys.stderr) if options.metrics == 'text' else json_lines_exporter(sys.stderr)])
+        try:
+            with open_report(options.format, options.output, numeric) as writer:
+                calculate_tax(options.spreadsheet[0], options.render, numeric, options.jobs, options.state, render_options, metrics, options.method,
+                              report_options, writer, rates, options.lot_database)
+        except state_mismatch as error:
+            parser.error(f'{error}; pass the matching --numeric/--places/--unit-places/--rounding/--method or remove the snapshot')
\ No newline at end of file
@@ -0,0 +1,134 @@
+import datetime
+import os
+from fractions import Fraction
+from lineage import lineage_index
+
+class diagram_recorder:
+    def __init__(self, lineage : lineage_index = None):
+        self.__events = []
+        self.__lineage = lineage if lineage is not None else lineage_index()
+
+    def attach(self, lineage : lineage_index):
+        self.__lineage = lineage
+
+    def on_buy(self, fund_name : str, register : str, payment : Fraction, fee : Fraction, units : Fraction,
+               currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        self.__events.append(('Buy', fund_name, register, date, payment, fee, units, currency_conversion_rate, transaction_number))
+
+    def on_convert(self, fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, fee : Fraction, units : Fraction,
+                   currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        self.__events.append(('Conversion', fund_name, register, date, cost_usd, cost_pln, fee, units, currency_conversion_rate,
+                              transaction_number))
+
+    def on_sell(self, fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, out_payment : Fraction, fee : Fraction,
+                units : Fraction, currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        self.__events.append(('Sell', fund_name, register, date, cost_usd, cost_pln, out_payment, fee, units, currency_conversion_rate,
+                              transaction_number))
+
+    def to_record(self):
+        return {'events' : [[*event[:3], None if event[3] is None else event[3].isoformat(), [str(x) for x in event[4:-1]], event[-1]]
+                            for event in self.__events]}
+
+    @staticmethod
+    def from_record(record : dict, number_type):
+        recorder = diagram_recorder()
+        recorder.__events = [(operation, fund_name, register, None if date is None else datetime.date.fromisoformat(date),
+                              *map(number_type, values), transaction_number)
+                             for (operation, fund_name, register, date, values, transaction_number) in record['events']]
+        return recorder
+
+    @property
+    def edges(self):
+        return set(self.__lineage.edges())
+
+    def ancestry(self, transaction_number : str):
+        return self.__lineage.ancestors(transaction_number) | {transaction_number}
+
+    def register_transactions(self, fund_name : str, register : str):
+        return {event[-1] for event in self.__events if event[1] == fund_name and event[2] == register}
+
+    def date_range_transactions(self, start = None, end = None):
+        return {event[-1] for event in self.__events
+                if event[3] is not None and (start is None or start <= event[3]) and (end is None or event[3] <= end)}
+
+    def components(self):
+        components = []
+        assigned = set()
+        for event in self.__events:
+            if event[-1] in assigned:
+                continue
+            component = self.__lineage.component(event[-1])
+            assigned.update(component)
+            components.append(component)
+        return components
+
+    @staticmethod
+    def __desc_label(fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, fee_usd : Fraction, fee_pln : Fraction,
+                     units : Fraction, transaction_number : str):
+        text = f'{"Transaction:":<12}  {transaction_number}\\l'
+        text += f'{"Register:":<12}    {register}\\l'
+        text += f'{"Fund:":<12}    "{fund_name}"\\l'
+        text += f'{"Units:":<12}      {float(units):,.2f}\\l'
+        text += f'{"Cost:":<12}     {float(cost_usd):,.2f} USD ({float(cost_pln):,.2f} PLN)\\l'
+        text += f'{"Fee:":<12}      {float(fee_usd):,.2f} USD ({float(fee_pln):,.2f} PLN)\\l'
+        return text
+
+    def build(self, transactions = None):
+        return self.__build_all([transactions])[0]
+
+    def __build_all(self, selections : list):
+        from graphviz import Digraph
+        diagrams = [Digraph(comment='FIFO transactions analysis', engine='dot') for selection in selections]
+        everything = [i for (i, selection) in enumerate(selections) if selection is None]
+        members = {}
+        for (i, selection) in enumerate(selections):
+            for transaction_number in selection or ():
+                members.setdefault(transaction_number, []).append(i)
+        buy_no = 0
+        convert_no = 0
+        sell_no = 0
+        for event in self.__events:
+            if event[0] == 'Buy':
+                buy_no += 1
+            elif event[0] == 'Conversion':
+                convert_no += 1
+            else:
+                sell_no += 1
+            targets = everything + members.get(event[-1], [])
+            if not targets:
+                continue
+            if event[0] == 'Buy':
+                (operation, fund_name, register, date, payment, fee, units, rate, transaction_number) = event
+                text = f'Buy #{buy_no}\\n'
+                text += self.__desc_label(fund_name, register, payment, payment * rate, fee, fee * rate, units, transaction_number)
+                color = 'forestgreen'
+            elif event[0] == 'Conversion':
+                (operation, fund_name, register, date, cost_usd, cost_pln, fee, units, rate, transaction_number) = event
+                text = f'Convert #{convert_no}\n'
+                text += self.__desc_label(fund_name, register, cost_usd, cost_pln, fee, fee * rate, units, transaction_number)
+                color = 'lightskyblue1'
+            else:
+                (operation, fund_name, register, date, cost_usd, cost_pln, out_payment, fee, units, rate, transaction_number) = event
+                text = f'Sell #{sell_no}\n'
+                text += self.__desc_label(fund_name, register, cost_usd, cost_pln, fee, fee * rate, units, transaction_number)
+                text += f'{"Payment:":<12}   {float(out_payment):,.2f} USD ({float(out_payment * rate):,.2f} PLN)\\l'
+                color = 'red2'
+            for i in targets:
+                diagrams[i].node(transaction_number, label=text, shape='box', group=register, style='bold', color=color)
+        for (src, dst) in self.__lineage.edges():
+            dst_members = members.get(dst, [])
+            for i in everything + [i for i in members.get(src, []) if i in dst_members]:
+                diagrams[i].edge(src, dst)
+        return diagrams
+
+    def render(self, render_file : str, transactions = None, format : str = 'png', view : bool = True):
+        return self.build(transactions).render(render_file, view=view, format=format)
+
+    def render_components(self, render_directory : str, format : str = 'svg', jobs : int = None):
+        from concurrent.futures import ThreadPoolExecutor
+        os.makedirs(render_directory, exist_ok=True)
+        diagrams = self.__build_all(self.components())
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(diagram.render, os.path.join(render_directory, f'component_{i + 1}'), format=format)
+                       for (i, diagram) in enumerate(diagrams)]
+            return [future.result() for future in futures]
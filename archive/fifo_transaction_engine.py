@@ -1,167 +1,484 @@
-import copy
+import datetime
+import os
 from fractions import Fraction
 from collections import deque
 from payment import payment_unit
-from graphviz import Digraph
+from lot_store import lot_store, overlay_lots
+from numeric import fraction_numeric, numeric_from_record
+
+state_version = 8
+
+batch_layout = {
+    'Buy' : (8, (3, 5, 6), (3, 4, 5, 6)),
+    'Conversion' : (10, (3, 6), (3, 6, 7, 8)),
+    'Sell' : (8, (3, 5, 6), (3, 4, 5, 6)),
+}
+
+rate_position = {'Buy' : 6, 'Conversion' : 8, 'Sell' : 6}
 
 class fifo_transaction_engine:
-    def __init__(self):
-        self.__payments = {}
-        self.__diagram = Digraph(comment='FIFO transactions analysis', engine='dot')
-        self.__edges = set()
-        self.__buy_no = 1
-        self.__convert_no = 1
-        self.__sell_no = 1
+    def __init__(self, numeric = None, observer = None, metrics = None, method : str = 'fifo', timeline = None, rates = None, payments = None):
+        self.__numeric = numeric if numeric is not None else fraction_numeric()
+        self.__observer = observer
+        self.__metrics = metrics
+        self.__timeline = timeline
+        self.__rates = rates
+        self.__payments = payments if payments is not None else lot_store(method)
+        self.__lineage = self.__payments.lineage()
+        if observer is not None:
+            observer.attach(self.__lineage)
+        self.__remaining_totals = {}
+        self.__closed_totals = {}
+        self.__transactions = self.__payments.transaction_ids()
+        self.__journal_date = datetime.date.min
+
+    def __journal(self, date):
+        if date is not None:
+            self.__journal_date = date
+        return self.__journal_date
 
     def __get_payment_list(self, fund_name : str, register : str):
-        payment_key = (fund_name, register)
-        if payment_key not in self.__payments:
-            self.__payments[payment_key] = deque()
-        return self.__payments[payment_key]
+        return self.__payments.open_lots((fund_name, register))
 
-    def __adjust_payments(self, fund_name : str, register : str, units : Fraction, remove_elements = False):
+    def __adjust_payments(self, payment_list : deque, fund_name : str, register : str, units : Fraction, metrics = None):
         assert units > 0
         remaining_units = units
-        payment_list = self.__get_payment_list(fund_name, register)
         collected_units = deque()
         while remaining_units > 0:
             if len(payment_list) == 0:
                 break
-            payment = payment_list.popleft()
+            payment = payment_list.head()
             if payment.units <= remaining_units:
-                collected_units.append(payment)
+                collected_units.append(payment_list.take())
                 remaining_units -= payment.units
             else:
-                split_ration = remaining_units / payment.units
-                collected_units.append(copy.deepcopy(payment) * split_ration)
-                payment_list.appendleft(payment * (1 - split_ration))
+                collected_units.append(payment.split(remaining_units, self.__numeric.scale(payment.cost, remaining_units, payment.units),
+                                                     self.__numeric.scale(payment.cost_in_local_currency, remaining_units, payment.units)))
                 remaining_units = 0
+                if metrics is not None:
+                    metrics.count('engine.splits')
+                    metrics.observe('engine.cost_size', self.__numeric.size(payment.cost))
+        if metrics is not None:
+            metrics.count('engine.lots_scanned', len(collected_units))
         if remaining_units > 0:
-            raise ValueError(f'Can\'t adjust units in  (remaining units = {float(remaining_units)}, fund name = {fund_name}, register = {register})')
-        if not remove_elements:
-            tmp_collection = collected_units
-            tmp_collection.reverse()
-            payment_list.extendleft(tmp_collection)
+            self.__missing_units(fund_name, register, remaining_units)
         return collected_units
 
-    def __desc_label(self,fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, fee_usd : Fraction, fee_pln : Fraction,
-                          units : Fraction, transaction_number : str):
-        text = f'{"Transaction:":<12}  {transaction_number}\\l'
-        text += f'{"Register:":<12}    {register}\\l'
-        text += f'{"Fund:":<12}    "{fund_name}"\\l'
-        text += f'{"Units:":<12}      {float(units):,.2f}\\l'
-        text += f'{"Cost:":<12}     {float(cost_usd):,.2f} USD ({float(cost_pln):,.2f} PLN)\\l'
-        text += f'{"Fee:":<12}      {float(fee_usd):,.2f} USD ({float(fee_pln):,.2f} PLN)\\l'
-        return text
-
-    def __buy_description(self, fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, fee_usd : Fraction, fee_pln : Fraction,
-                          units : Fraction, transaction_number : str):
-        text = f'Buy #{self.__buy_no}\\n'
-        text += self.__desc_label(fund_name, register, cost_usd, cost_pln, fee_usd, fee_pln, units, transaction_number)
-        self.__buy_no+=1
-        self.__diagram.node(transaction_number, label=text, shape='box', group=register, style='bold', color='forestgreen')
-
-    def __convert_description(self, fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, fee_usd : Fraction,
-                              fee_pln :Fraction, units : Fraction, transaction_number : str):
-        text = f'Convert #{self.__convert_no}\n'
-        text += self.__desc_label(fund_name, register, cost_usd, cost_pln, fee_usd, fee_pln, units, transaction_number)
-        self.__convert_no+=1
-        self.__diagram.node(transaction_number, label=text, shape='box', group=register, style='bold', color='lightskyblue1')
-
-    def __sell_description(self, fund_name : str, register : str, cost_usd : Fraction, cost_pln : Fraction, units : Fraction,
-                    transaction_number : str, fee_usd : Fraction, fee_pln : Fraction, payment_usd : Fraction, payment_pln : Fraction):
-        text = f'Sell #{self.__sell_no}\n'
-        text += self.__desc_label(fund_name, register, cost_usd, cost_pln, fee_usd, fee_pln, units, transaction_number)
-        text += f'{"Payment:":<12}   {float(payment_usd):,.2f} USD ({float(payment_pln):,.2f} PLN)\\l'
-        self.__sell_no += 1
-        self.__diagram.node(transaction_number, label=text, shape='box', group=register, style='bold', color='red2')
+    @staticmethod
+    def __missing_units(fund_name : str, register : str, remaining_units : Fraction):
+        raise ValueError(f'Can\'t adjust units in  (remaining units = {float(remaining_units)}, fund name = {fund_name}, register = {register})')
+
+    def __available_units(self, key):
+        return self.__remaining_totals[key][2] if key in self.__remaining_totals else 0
+
+    def __require_units(self, fund_name : str, register : str, units : Fraction):
+        available = self.__available_units((fund_name, register))
+        if available < units:
+            self.__missing_units(fund_name, register, units - available)
+
+    @staticmethod
+    def __add_totals(totals : dict, key, value : tuple):
+        if key not in totals:
+            totals[key] = value
+        else:
+            totals[key] = tuple(x + y for x, y in zip(value, totals[key]))
+
+    def __remove_remaining(self, key, payment_list):
+        if len(self.__payments.open_lots(key)) == 0:
+            del self.__remaining_totals[key]
+            return
+        removed = (0, 0, 0)
+        for payment in payment_list:
+            removed = tuple(x + y for x, y in zip(removed, payment.remaining_value))
+        self.__remaining_totals[key] = tuple(x - y for x, y in zip(self.__remaining_totals[key], removed))
+
+    def __record_edges(self, lots, payment_list : deque, transaction_number : str):
+        for payment in payment_list:
+            for origin in lots.origins(payment):
+                self.__lineage.add(origin, transaction_number)
+
+    def __shares(self, total : Fraction, payment_list : deque, units : Fraction, scale = None):
+        scale = scale or self.__numeric.scale
+        shares = [scale(total, payment.units, units) for payment in payment_list]
+        shares[-1] = total - sum(shares[:-1])
+        return shares
+
+    @staticmethod
+    def __negated(value : tuple):
+        return tuple(-x for x in value)
+
+    def __consumed_cost(self, payment_list : deque):
+        cost_usd = 0
+        cost_pln = 0
+        for payment in payment_list:
+            cost_usd += payment.cost
+            cost_pln += payment.cost_in_local_currency
+        return (cost_usd, cost_pln)
+
+    def __buy(self, payment_list : deque, fund_name : str, register : str, payment : Fraction, fee : Fraction, units : Fraction,
+              currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        self.__transactions.add(transaction_number)
+        if self.__metrics is not None:
+            self.__metrics.count('engine.buy')
+        unit = payment_unit(fund_name, register, payment, units, currency_conversion_rate, transaction_number,
+                            self.__numeric.quantize(payment * currency_conversion_rate))
+        payment_list.append(unit)
+        self.__add_totals(self.__remaining_totals, unit.key, unit.remaining_value)
+        if self.__timeline is not None:
+            self.__timeline.record(self.__journal(date), ((unit.key, unit.remaining_value),), ())
+        if self.__observer is not None:
+            self.__observer.on_buy(fund_name, register, payment, fee, units, currency_conversion_rate, transaction_number, date)
+
+    def __convert(self, src_list : deque, src_fund_name : str, src_register: str, src_units : Fraction, dst_fund_name : str,
+                  dst_register : str, dst_units : Fraction, fee : Fraction, currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        self.__require_units(src_fund_name, src_register, src_units)
+        payment_list = self.__adjust_payments(src_list, src_fund_name, src_register, src_units, self.__metrics)
+        self.__transactions.add(transaction_number)
+        if self.__metrics is not None:
+            self.__metrics.count('engine.conversion')
+        self.__remove_remaining((src_fund_name, src_register), payment_list)
+        self.__record_edges(src_list, payment_list, transaction_number)
+        journal = self.__timeline is not None
+        if journal:
+            changes = [(payment.key, self.__negated(payment.remaining_value)) for payment in payment_list]
+        for (payment, share) in zip(payment_list, self.__shares(dst_units, payment_list, src_units, self.__numeric.scale_units)):
+            payment.convert(dst_fund_name, dst_register, share, transaction_number)
+            self.__add_totals(self.__remaining_totals, payment.key, payment.remaining_value)
+        if journal:
+            changes.extend((payment.key, payment.remaining_value) for payment in payment_list)
+            self.__timeline.record(self.__journal(date), changes, ())
+        self.__get_payment_list(dst_fund_name, dst_register).extend(payment_list)
+        if self.__observer is not None:
+            (cost_usd, cost_pln) = self.__consumed_cost(payment_list)
+            self.__observer.on_convert(dst_fund_name, dst_register, cost_usd, cost_pln, fee, dst_units, currency_conversion_rate, transaction_number,
+                                       date)
+
+    def __sell(self, payment_list : deque, fund_name : str, register : str, out_payment : Fraction, fee : Fraction, units : Fraction,
+               currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        self.__require_units(fund_name, register, units)
+        unit_list = self.__adjust_payments(payment_list, fund_name, register, units, self.__metrics)
+        self.__transactions.add(transaction_number)
+        if self.__metrics is not None:
+            self.__metrics.count('engine.sell')
+        self.__remove_remaining((fund_name, register), unit_list)
+        closed_totals = self.__closed_totals.setdefault((fund_name, register), {})
+        self.__record_edges(payment_list, unit_list, transaction_number)
+        out_payment_local = self.__numeric.quantize(out_payment * currency_conversion_rate)
+        for (payment, share, share_local) in zip(unit_list, self.__shares(out_payment, unit_list, units),
+                                                 self.__shares(out_payment_local, unit_list, units)):
+            payment.close(share, currency_conversion_rate, transaction_number, share_local)
+            self.__payments.close((fund_name, register), payment)
+            self.__add_totals(closed_totals, payment.close_key, payment.close_value)
+        if self.__timeline is not None:
+            self.__timeline.record(self.__journal(date),
+                                   [(payment.key, self.__negated(payment.remaining_value)) for payment in unit_list],
+                                   [(payment.close_key, payment.close_value) for payment in unit_list])
+        if self.__observer is not None:
+            (cost_usd, cost_pln) = self.__consumed_cost(unit_list)
+            self.__observer.on_sell(fund_name, register, cost_usd, cost_pln, out_payment, fee, units, currency_conversion_rate, transaction_number,
+                                    date)
+
+    def __rate(self, currency_conversion_rate, date, transaction_number : str):
+        if currency_conversion_rate is not None:
+            return currency_conversion_rate
+        if self.__rates is None or date is None:
+            raise ValueError(f'Missing currency conversion rate for transaction {transaction_number}')
+        return self.__rates.rate(date)
+
+    def __resolve_rates(self, transactions : list):
+        for (i, transaction) in enumerate(transactions):
+            position = rate_position.get(transaction[0])
+            if position is not None and transaction[position] is None:
+                date = transaction[position + 2] if len(transaction) > position + 2 else None
+                transactions[i] = transaction[:position] + (self.__rate(None, date, transaction[position + 1]),) + transaction[position + 1:]
 
     def add_payment(self, fund_name : str, register : str, payment : Fraction, fee : Fraction, units : Fraction,
-                    currency_conversion_rate : Fraction, transaction_number : str):
+                    currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        currency_conversion_rate = self.__rate(currency_conversion_rate, date, transaction_number)
         assert units > 0
         assert all([x > 0 for x in (units, payment, currency_conversion_rate)])
-        assert all([type(x) is Fraction for x in (payment, fee, units, currency_conversion_rate)])
-        payment_list = self.__get_payment_list(fund_name, register)
-        payment_list.append(payment_unit(fund_name, register, payment, units, currency_conversion_rate, transaction_number))
-        self.__buy_description(fund_name, register, payment, payment * currency_conversion_rate, fee,
-                               fee * currency_conversion_rate, units, transaction_number)
+        assert all([type(x) is self.__numeric.number_type for x in (payment, fee, units, currency_conversion_rate)])
+        self.__buy(self.__get_payment_list(fund_name, register), fund_name, register, payment, fee, units,
+                   currency_conversion_rate, transaction_number, date)
 
     def add_conversion(self, src_fund_name : str, src_register: str, src_units : Fraction, dst_fund_name : str,
-                       dst_register : str, dst_units : Fraction, fee : Fraction, currency_conversion_rate : Fraction, transaction_number : str):
+                       dst_register : str, dst_units : Fraction, fee : Fraction, currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        currency_conversion_rate = self.__rate(currency_conversion_rate, date, transaction_number)
         assert all([x > 0 for x in (src_units, dst_units)])
-        assert all([type(x) is Fraction for x in (src_units, dst_units, fee, currency_conversion_rate)])
-        payment_list = self.__adjust_payments(src_fund_name, src_register, src_units, True)
-        cost_usd = 0
-        cost_pln = 0
-        for payment in payment_list:
-            current_units = payment.units
-            cost_usd += payment.remaining_value[0]
-            cost_pln += payment.remaining_value[1]
-            self.__edges.add((payment.transaction, transaction_number))
-            payment.convert(dst_fund_name, dst_register, (current_units * dst_units) / src_units, transaction_number)
-        self.__get_payment_list(dst_fund_name, dst_register).extend(payment_list)
-        self.__convert_description(dst_fund_name, dst_register, cost_usd, cost_pln, fee,
-                                   fee * currency_conversion_rate, dst_units, transaction_number)
+        assert all([type(x) is self.__numeric.number_type for x in (src_units, dst_units, fee, currency_conversion_rate)])
+        self.__convert(self.__get_payment_list(src_fund_name, src_register), src_fund_name, src_register,
+                       src_units, dst_fund_name, dst_register, dst_units, fee, currency_conversion_rate, transaction_number, date)
 
     def add_withdrawal(self, fund_name : str, register : str, out_payment : Fraction, fee : Fraction, units : Fraction,
-                       currency_conversion_rate : Fraction, transaction_number : str):
+                       currency_conversion_rate : Fraction, transaction_number : str, date = None):
+        currency_conversion_rate = self.__rate(currency_conversion_rate, date, transaction_number)
         assert all([x > 0 for x in (units, out_payment, currency_conversion_rate)])
-        assert all([type(x) is Fraction for x in (out_payment, fee, units, currency_conversion_rate)])
-        unit_list = self.__adjust_payments(fund_name, register, units)
-        cost_usd = 0
-        cost_pln = 0
-        for payment in unit_list:
-            current_units = payment.units
-            cost_usd += payment.remaining_value[0]
-            cost_pln += payment.remaining_value[1]
-            self.__edges.add((payment.transaction, transaction_number))
-            payment.close((out_payment * current_units) / units, currency_conversion_rate, transaction_number)
-        self.__sell_description(fund_name, register, cost_usd, cost_pln, units, transaction_number, fee,
-                                fee * currency_conversion_rate, out_payment, out_payment * currency_conversion_rate)
+        assert all([type(x) is self.__numeric.number_type for x in (out_payment, fee, units, currency_conversion_rate)])
+        self.__sell(self.__get_payment_list(fund_name, register), fund_name, register, out_payment, fee, units,
+                    currency_conversion_rate, transaction_number, date)
+
+    def __check_batch(self, transactions : list):
+        number_type = self.__numeric.number_type
+        for transaction in transactions:
+            if transaction[0] not in batch_layout:
+                raise ValueError(f'Undefined transaction type {transaction[0]}')
+            (length, positive, numbers) = batch_layout[transaction[0]]
+            assert len(transaction) in (length, length + 1)
+            assert all([transaction[i] > 0 for i in positive])
+            assert all([type(transaction[i]) is number_type for i in numbers])
+
+    def __check_units(self, transactions : list):
+        available = {}
+        for transaction in transactions:
+            (operation, fund_name, register) = transaction[:3]
+            key = (fund_name, register)
+            if key not in available:
+                available[key] = self.__available_units(key)
+            if operation == 'Buy':
+                available[key] += transaction[5]
+                continue
+            units = transaction[5] if operation == 'Sell' else transaction[3]
+            if available[key] < units:
+                self.__missing_units(fund_name, register, units - available[key])
+            available[key] -= units
+            if operation == 'Conversion':
+                dst_key = transaction[4:6]
+                available[dst_key] = available.get(dst_key, self.__available_units(dst_key)) + transaction[6]
+
+    def apply_batch(self, transactions):
+        if self.__metrics is not None:
+            with self.__metrics.phase('engine.apply_batch'):
+                return self.__apply_batch(transactions)
+        return self.__apply_batch(transactions)
+
+    def __apply_batch(self, transactions):
+        transactions = list(transactions)
+        self.__resolve_rates(transactions)
+        self.__check_batch(transactions)
+        self.__check_units(transactions)
+
+        key = None
+        payment_list = None
+        for transaction in transactions:
+            operation = transaction[0]
+            if transaction[1:3] != key:
+                key = transaction[1:3]
+                payment_list = self.__payments.open_lots(key)
+            if operation == 'Buy':
+                self.__buy(payment_list, *transaction[1:])
+            elif operation == 'Sell':
+                self.__sell(payment_list, *transaction[1:])
+            else:
+                self.__convert(payment_list, *transaction[1:])
+
+    def preview(self, transactions):
+        transactions = list(transactions)
+        self.__resolve_rates(transactions)
+        self.__check_batch(transactions)
+        overlays = {}
+        closed_transactions = {}
+        consumed_lots = {}
+
+        def lots(key):
+            if key not in overlays:
+                overlays[key] = overlay_lots(self.__payments.peek_lots(key), self.method)
+            return overlays[key]
+
+        for transaction in transactions:
+            (operation, fund_name, register) = transaction[:3]
+            if operation == 'Buy':
+                (payment, fee, units, currency_conversion_rate, transaction_number) = transaction[3:8]
+                lots((fund_name, register)).append(payment_unit(fund_name, register, payment, units, currency_conversion_rate, transaction_number,
+                                                                self.__numeric.quantize(payment * currency_conversion_rate)))
+                continue
+            units = transaction[5] if operation == 'Sell' else transaction[3]
+            transaction_number = transaction[7] if operation == 'Sell' else transaction[9]
+            payment_list = self.__adjust_payments(lots((fund_name, register)), fund_name, register, units)
+            consumed_lots[transaction_number] = [(payment.transaction, payment.units, payment.cost,
+                                                  payment.cost_in_local_currency) for payment in payment_list]
+            if operation == 'Sell':
+                (out_payment, currency_conversion_rate) = (transaction[3], transaction[6])
+                out_payment_local = self.__numeric.quantize(out_payment * currency_conversion_rate)
+                for (payment, share, share_local) in zip(payment_list, self.__shares(out_payment, payment_list, units),
+                                                         self.__shares(out_payment_local, payment_list, units)):
+                    payment.close(share, currency_conversion_rate, transaction_number, share_local)
+                    self.__add_totals(closed_transactions, payment.close_key, payment.close_value)
+            else:
+                (dst_fund_name, dst_register, dst_units) = transaction[4:7]
+                for (payment, share) in zip(payment_list, self.__shares(dst_units, payment_list, units, self.__numeric.scale_units)):
+                    payment.convert(dst_fund_name, dst_register, share, transaction_number)
+                lots((dst_fund_name, dst_register)).extend(payment_list)
+        return (closed_transactions, consumed_lots)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_fifo_transaction_engine__metrics'] = None
+        return state
+
+    def has_transaction(self, transaction_number : str) -> bool:
+        return transaction_number in self.__transactions
+
+    @staticmethod
+    def __totals_record(totals : dict):
+        return [[list(key), [str(x) for x in value]] for (key, value) in totals.items()]
+
+    @staticmethod
+    def __totals_from_record(record : list, number_type):
+        return {tuple(key) : tuple(map(number_type, value)) for (key, value) in record}
+
+    def __record(self):
+        return {
+            'version' : state_version,
+            'numeric' : self.__numeric.to_record(),
+            'transactions' : self.__payments.transactions_record(self.__transactions),
+            'lots' : self.__payments.to_record(),
+            'remaining_totals' : self.__totals_record(self.__remaining_totals),
+            'closed_totals' : [[*key, self.__totals_record(totals)] for (key, totals) in self.__closed_totals.items()],
+            'lineage' : self.__lineage.to_record(),
+            'timeline' : self.__timeline.to_record() if self.__timeline is not None else None,
+            'journal_date' : self.__journal_date.isoformat(),
+            'rates' : self.__rates.to_record() if self.__rates is not None else None,
+            'observer' : self.__observer.to_record() if self.__observer is not None else None,
+        }
+
+    @staticmethod
+    def __from_record(record : dict):
+        numeric = numeric_from_record(record['numeric'])
+        number_type = numeric.number_type
+        if record['lots']['store'] == 'sqlite':
+            from sqlite_lot_store import sqlite_lot_store
+            payments = sqlite_lot_store.from_record(record['lots'], numeric)
+        else:
+            payments = lot_store.from_record(record['lots'], numeric)
+        timeline = None
+        if record['timeline'] is not None:
+            from timeline import transaction_timeline
+            timeline = transaction_timeline.from_record(record['timeline'], number_type)
+        rates = None
+        if record['rates'] is not None:
+            from rates import rate_table
+            rates = rate_table.from_record(record['rates'], number_type)
+        observer = None
+        if record['observer'] is not None:
+            from diagram import diagram_recorder
+            observer = diagram_recorder.from_record(record['observer'], number_type)
+        engine = fifo_transaction_engine(numeric, observer, None, payments.method, timeline, rates, payments)
+        engine.__transactions = payments.transaction_ids(record['transactions'])
+        engine.__journal_date = datetime.date.fromisoformat(record['journal_date'])
+        engine.__remaining_totals = engine.__totals_from_record(record['remaining_totals'], number_type)
+        engine.__closed_totals = {(fund_name, register) : engine.__totals_from_record(totals, number_type)
+                                  for (fund_name, register, totals) in record['closed_totals']}
+        engine.__lineage = payments.lineage(record['lineage'])
+        if observer is not None:
+            observer.attach(engine.__lineage)
+        return engine
+
+    def save(self, state_file : str):
+        import gzip
+        import json
+        temporary_file = f'{state_file}.tmp'
+        with gzip.open(temporary_file, 'wt', encoding='utf-8') as stream:
+            json.dump(self.__record(), stream, separators=(',', ':'))
+        os.replace(temporary_file, state_file)
+
+    @staticmethod
+    def load(state_file : str):
+        import gzip
+        import json
+        try:
+            with gzip.open(state_file, 'rt', encoding='utf-8') as stream:
+                record = json.load(stream)
+        except (OSError, EOFError, ValueError) as error:
+            raise ValueError(f'Unreadable engine state {state_file}: {error}') from error
+        version = record.get('version') if isinstance(record, dict) else None
+        if version != state_version:
+            raise ValueError(f'Unsupported engine state version {version} in {state_file} (expected {state_version})')
+        return fifo_transaction_engine.__from_record(record)
+
+    @property
+    def numeric(self):
+        return self.__numeric
+
+    @property
+    def method(self) -> str:
+        return self.__payments.method
 
     @property
     def closed_units(self):
-        retval = []
-        for (key, value) in self.__payments.items():
-            for payment in value:
-                if not payment.is_closed:
-                    continue
-                retval.append((payment.close_key, payment.close_value))
-        return retval
+        return [(payment.close_key, payment.close_value) for (key, payment) in self.__payments.iter_closed()]
 
     @property
     def remaining_units(self):
-        retval = []
-        for (key, value) in self.__payments.items():
-            for payment in value:
-                if payment.is_closed:
-                    continue
-                retval.append((payment.key, payment.remaining_value))
-        return retval
+        return [(payment.key, payment.remaining_value) for (key, payment) in self.__payments.iter_open()]
+
+    @property
+    def resident_lots(self) -> int:
+        return self.__payments.resident_lots()
+
+    @property
+    def registers(self):
+        return list(self.__payments.keys())
+
+    def open_lots(self, key):
+        lots = self.__payments.peek_lots(key)
+        return lots.selection() if lots is not None else iter(())
+
+    @property
+    def metrics(self):
+        return self.__metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self.__metrics = metrics
 
     @property
     def closed_transactions(self):
         retval = {}
-        for (key, value) in self.closed_units:
-                if key not in retval:
-                    retval[key] = value
-                else:
-                    retval[key] = tuple( x + y for x, y in zip(value, retval[key]))
+        for key in self.__payments.keys():
+            retval.update(self.__closed_totals.get(key, {}))
         return retval
 
     @property
     def remaining_funds(self):
-        retval = {}
-        for (key, value) in self.remaining_units:
-            if key not in retval:
-                retval[key] = value
-            else:
-                retval[key] = tuple(x + y for x, y in zip(value, retval[key]))
-        return retval
+        return {key : self.__remaining_totals[key] for key in self.__payments.keys() if key in self.__remaining_totals}
+
+    @property
+    def aggregates(self):
+        return (self.remaining_funds, self.closed_transactions)
+
+    @property
+    def lineage(self):
+        return self.__lineage
+
+    @property
+    def observer(self):
+        return self.__observer
+
+    @property
+    def rates(self):
+        return self.__rates
+
+    @rates.setter
+    def rates(self, rates):
+        self.__rates = rates
+
+    @property
+    def timeline(self):
+        return self.__timeline
+
+    def as_of(self, date):
+        if self.__timeline is None:
+            raise ValueError('Point in time queries are disabled, create the engine with a transaction_timeline')
+        return self.__timeline.as_of(date)
+
+    def realized_between(self, start, end):
+        if self.__timeline is None:
+            raise ValueError('Point in time queries are disabled, create the engine with a transaction_timeline')
+        return self.__timeline.realized_between(start, end)
 
-    def generate_diagram(self, render_file):
-        for (src, dst) in self.__edges:
-            self.__diagram.edge(src, dst)
-        return self.__diagram.render(render_file, view=True, format='png')
+    def generate_diagram(self, render_file, transactions = None, format : str = 'png'):
+        if self.__observer is None:
+            raise ValueError('Diagram recording is disabled, create the engine with a diagram_recorder observer')
+        return self.__observer.render(render_file, transactions, format)
 
 
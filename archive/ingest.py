@@ -0,0 +1,46 @@
+import csv
+import os
+
+header_rows = 3
+
+def column_index(cell_reference : str) -> int:
+    index = 0
+    for char in cell_reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+def padded(row : list, width : int):
+    if len(row) < width:
+        row.extend([''] * (width - len(row)))
+    return row
+
+def xls_sheets(spreadsheet_file : str, width : int = 0):
+    import xlrd
+    workbook = xlrd.open_workbook(spreadsheet_file, on_demand=True)
+    try:
+        for sheet_name in workbook.sheet_names():
+            sheet = workbook.sheet_by_name(sheet_name)
+            yield (sheet_name, (padded(sheet.row_values(i), width) for i in range(header_rows, sheet.nrows)))
+            workbook.unload_sheet(sheet_name)
+    finally:
+        workbook.release_resources()
+
+def csv_rows(csv_file : str, width : int = 0):
+    with open(csv_file, newline='') as stream:
+        for (i, row) in enumerate(csv.reader(stream)):
+            if i >= header_rows:
+                yield padded(row, width)
+
+def csv_sheets(csv_file : str, width : int = 0):
+    yield (os.path.splitext(os.path.basename(csv_file))[0], csv_rows(csv_file, width))
+
+def open_sheets(spreadsheet_file : str, width : int = 0):
+    extension = os.path.splitext(spreadsheet_file)[1].lower()
+    if extension == '.csv':
+        return csv_sheets(spreadsheet_file, width)
+    if extension == '.xls':
+        return xls_sheets(spreadsheet_file, width)
+    from xlsx_reader import xlsx_sheets
+    return xlsx_sheets(spreadsheet_file, width)
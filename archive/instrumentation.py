@@ -0,0 +1,87 @@
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+class engine_metrics:
+    def __init__(self, exporters = None):
+        self.__counters = {}
+        self.__timers = {}
+        self.__distributions = {}
+        self.__exporters = list(exporters or [])
+
+    def count(self, name : str, value : int = 1):
+        self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def observe(self, name : str, value):
+        if name not in self.__distributions:
+            self.__distributions[name] = [0, 0, value]
+        distribution = self.__distributions[name]
+        distribution[0] += 1
+        distribution[1] += value
+        distribution[2] = max(distribution[2], value)
+
+    def add_time(self, name : str, seconds : float):
+        if name not in self.__timers:
+            self.__timers[name] = [0, 0.0]
+        timer = self.__timers[name]
+        timer[0] += 1
+        timer[1] += seconds
+
+    @contextmanager
+    def phase(self, name : str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def merge(self, snapshot : dict):
+        for (name, value) in snapshot['counters'].items():
+            self.count(name, value)
+        for (name, timer) in snapshot['timers'].items():
+            total = self.__timers.setdefault(name, [0, 0.0])
+            total[0] += timer['count']
+            total[1] += timer['seconds']
+        for (name, distribution) in snapshot['distributions'].items():
+            total = self.__distributions.setdefault(name, [0, 0, distribution['max']])
+            total[0] += distribution['count']
+            total[1] += distribution['mean'] * distribution['count']
+            total[2] = max(total[2], distribution['max'])
+
+    def add_exporter(self, exporter):
+        self.__exporters.append(exporter)
+
+    def snapshot(self):
+        return {'counters' : dict(self.__counters),
+                'timers' : {name : {'count' : count, 'seconds' : seconds} for (name, (count, seconds)) in self.__timers.items()},
+                'distributions' : {name : {'count' : count, 'mean' : total / count, 'max' : maximum}
+                                   for (name, (count, total, maximum)) in self.__distributions.items()}}
+
+    def export(self):
+        snapshot = self.snapshot()
+        for exporter in self.__exporters:
+            exporter(snapshot)
+        return snapshot
+
+def timed(metrics, name : str):
+    return nullcontext() if metrics is None else metrics.phase(name)
+
+class json_lines_exporter:
+    def __init__(self, stream):
+        self.__stream = stream
+
+    def __call__(self, snapshot : dict):
+        self.__stream.write(json.dumps(snapshot) + '\n')
+        self.__stream.flush()
+
+class text_exporter:
+    def __init__(self, stream):
+        self.__stream = stream
+
+    def __call__(self, snapshot : dict):
+        for (name, value) in snapshot['counters'].items():
+            self.__stream.write(f'{name:<32} {value:>14,}\n')
+        for (name, timer) in snapshot['timers'].items():
+            self.__stream.write(f'{name:<32} {timer["seconds"]:>14.6f} s  ({timer["count"]:,} calls)\n')
+        for (name, distribution) in snapshot['distributions'].items():
+            self.__stream.write(f'{name:<32} mean {distribution["mean"]:,.1f}  max {distribution["max"]:,}  ({distribution["count"]:,} samples)\n')
@@ -0,0 +1,66 @@
+class lineage_index:
+    def __init__(self):
+        self.__children = {}
+        self.__parents = {}
+
+    def add(self, src_transaction : str, dst_transaction : str):
+        if src_transaction not in self.__children:
+            self.__children[src_transaction] = {}
+        self.__children[src_transaction][dst_transaction] = None
+        if dst_transaction not in self.__parents:
+            self.__parents[dst_transaction] = {}
+        self.__parents[dst_transaction][src_transaction] = None
+
+    def to_record(self):
+        return {'children' : {src : list(children) for (src, children) in self.__children.items()},
+                'parents' : {dst : list(parents) for (dst, parents) in self.__parents.items()}}
+
+    @staticmethod
+    def from_record(record : dict):
+        lineage = lineage_index()
+        lineage.__children = {src : dict.fromkeys(children) for (src, children) in record['children'].items()}
+        lineage.__parents = {dst : dict.fromkeys(parents) for (dst, parents) in record['parents'].items()}
+        return lineage
+
+    def children(self, transaction_number : str):
+        return list(self.__children.get(transaction_number, ()))
+
+    def parents(self, transaction_number : str):
+        return list(self.__parents.get(transaction_number, ()))
+
+    def edges(self):
+        for (src, children) in self.__children.items():
+            for dst in children:
+                yield (src, dst)
+
+    @staticmethod
+    def __reachable(neighbours, transaction_number : str):
+        visited = {}
+        pending = [transaction_number]
+        while pending:
+            for neighbour in neighbours(pending.pop()):
+                if neighbour not in visited:
+                    visited[neighbour] = None
+                    pending.append(neighbour)
+        return visited.keys()
+
+    def ancestors(self, transaction_number : str):
+        return set(self.__reachable(self.parents, transaction_number))
+
+    def descendants(self, transaction_number : str):
+        return set(self.__reachable(self.children, transaction_number))
+
+    def origins(self, transaction_number : str):
+        return {ancestor for ancestor in self.ancestors(transaction_number) if not self.parents(ancestor)}
+
+    def component(self, transaction_number : str):
+        visited = {transaction_number}
+        pending = [transaction_number]
+        while pending:
+            current = pending.pop()
+            for neighbours in (self.children, self.parents):
+                for neighbour in neighbours(current):
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        pending.append(neighbour)
+        return visited
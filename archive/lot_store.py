@@ -0,0 +1,231 @@
+import copy
+import sys
+import heapq
+from collections import deque
+from payment import payment_unit
+from lineage import lineage_index
+
+class lot_queue:
+    def origins(self, lot):
+        return (lot.transaction,)
+
+    def to_record(self):
+        return {'lots' : [lot.to_record() for lot in self]}
+
+    def restore(self, record : dict, number_type):
+        self.extend(payment_unit.from_record(lot, number_type) for lot in record['lots'])
+
+class fifo_lots(lot_queue, deque):
+    def head(self):
+        return self[0]
+
+    def take(self):
+        return self.popleft()
+
+    def selection(self):
+        return iter(self)
+
+class lifo_lots(lot_queue, list):
+    def head(self):
+        return self[-1]
+
+    def take(self):
+        return self.pop()
+
+    def selection(self):
+        return reversed(self)
+
+class hifo_lots(lot_queue):
+    def __init__(self):
+        self.__heap = []
+        self.__sequence = 0
+
+    def append(self, lot):
+        heapq.heappush(self.__heap, (-(lot.cost_in_local_currency / lot.units), self.__sequence, lot))
+        self.__sequence += 1
+
+    def extend(self, lots):
+        for lot in lots:
+            self.append(lot)
+
+    def head(self):
+        return self.__heap[0][2]
+
+    def take(self):
+        return heapq.heappop(self.__heap)[2]
+
+    def selection(self):
+        heap = self.__heap
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            (entry, i) = heapq.heappop(frontier)
+            yield entry[2]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def __iter__(self):
+        return (lot for (unit_cost, sequence, lot) in sorted(self.__heap, key=lambda entry: entry[1]))
+
+class average_lots(lot_queue):
+    def __init__(self):
+        self.__pool = None
+        self.__origins = {}
+
+    def append(self, lot):
+        if self.__pool is None:
+            self.__pool = lot
+            self.__origins = {}
+        else:
+            self.__pool.merge(lot)
+        self.__origins[lot.transaction] = None
+
+    def extend(self, lots):
+        for lot in lots:
+            self.append(lot)
+
+    def head(self):
+        return self.__pool
+
+    def take(self):
+        (pool, self.__pool) = (self.__pool, None)
+        return pool
+
+    def origins(self, lot):
+        return tuple(self.__origins)
+
+    def to_record(self):
+        return {'lots' : [lot.to_record() for lot in self], 'origins' : list(self.__origins)}
+
+    def restore(self, record : dict, number_type):
+        for lot in record['lots']:
+            self.__pool = payment_unit.from_record(lot, number_type)
+        self.__origins = dict.fromkeys(record['origins'])
+
+    def selection(self):
+        return iter(self)
+
+    def __len__(self):
+        return 0 if self.__pool is None else 1
+
+    def __iter__(self):
+        return iter(() if self.__pool is None else (self.__pool,))
+
+lot_methods = {'fifo' : fifo_lots, 'lifo' : lifo_lots, 'hifo' : hifo_lots, 'average' : average_lots}
+
+class overlay_lots(lot_queue):
+    def __init__(self, base, method : str):
+        self.__method = method
+        self.__base = base.selection() if base is not None else iter(())
+        self.__base_count = len(base) if base is not None else 0
+        self.__local = lot_methods[method]()
+        self.__next = None
+        self.__fetch()
+        if method == 'average' and self.__next is not None:
+            self.__local.append(self.__take_base())
+
+    def __fetch(self):
+        if self.__next is None and self.__base_count > 0:
+            self.__next = copy.copy(next(self.__base))
+
+    def __take_base(self):
+        (lot, self.__next) = (self.__next, None)
+        self.__base_count -= 1
+        self.__fetch()
+        return lot
+
+    def __use_local(self):
+        if len(self.__local) == 0:
+            return False
+        if self.__next is None or self.__method == 'lifo':
+            return True
+        if self.__method == 'hifo':
+            local = self.__local.head()
+            return local.cost_in_local_currency / local.units > self.__next.cost_in_local_currency / self.__next.units
+        return False
+
+    def head(self):
+        return self.__local.head() if self.__use_local() else self.__next
+
+    def take(self):
+        return self.__local.take() if self.__use_local() else self.__take_base()
+
+    def append(self, lot):
+        self.__local.append(lot)
+
+    def extend(self, lots):
+        for lot in lots:
+            self.__local.append(lot)
+
+    def __len__(self):
+        return self.__base_count + len(self.__local)
+
+class lot_store:
+    def __init__(self, method : str = 'fifo'):
+        if method not in lot_methods:
+            raise ValueError(f'Undefined lot selection method {method}')
+        self.__method = method
+        self.__open = {}
+        self.__closed = {}
+
+    @property
+    def method(self) -> str:
+        return self.__method
+
+    def open_lots(self, key):
+        if key not in self.__open:
+            self.__open[key] = lot_methods[self.__method]()
+        return self.__open[key]
+
+    def peek_lots(self, key):
+        return self.__open.get(key)
+
+    def closed_lots(self, key):
+        return self.__closed.get(key, ())
+
+    def close(self, key, lot):
+        if key not in self.__closed:
+            self.__closed[key] = []
+        self.__closed[key].append(lot)
+
+    def keys(self):
+        return self.__open.keys()
+
+    def resident_lots(self) -> int:
+        return sum(map(len, self.__open.values())) + sum(map(len, self.__closed.values()))
+
+    def transaction_ids(self, record : list = None):
+        return set(record or ())
+
+    def transactions_record(self, transactions : set):
+        return sorted(transactions)
+
+    def lineage(self, record : dict = None):
+        return lineage_index.from_record(record) if record is not None else lineage_index()
+
+    def to_record(self):
+        return {'store' : 'memory', 'method' : self.__method,
+                'registers' : [[*key, lots.to_record(), [lot.to_record() for lot in self.closed_lots(key)]] for (key, lots) in self.__open.items()]}
+
+    @staticmethod
+    def from_record(record : dict, numeric):
+        store = lot_store(record['method'])
+        for (fund_name, register, lots, closed) in record['registers']:
+            key = (sys.intern(fund_name), sys.intern(register))
+            store.open_lots(key).restore(lots, numeric.number_type)
+            for lot in closed:
+                store.close(key, payment_unit.from_record(lot, numeric.number_type))
+        return store
+
+    def iter_open(self):
+        for (key, lots) in self.__open.items():
+            for lot in lots:
+                yield (key, lot)
+
+    def iter_closed(self):
+        for key in self.__open:
+            for lot in self.closed_lots(key):
+                yield (key, lot)
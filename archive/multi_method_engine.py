@@ -0,0 +1,38 @@
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric
+from instrumentation import timed
+
+class multi_method_engine:
+    def __init__(self, methods, numeric = None, metrics = None, rates = None):
+        self.__numeric = numeric if numeric is not None else fraction_numeric()
+        self.__metrics = metrics
+        self.__engines = {method : fifo_transaction_engine(self.__numeric, method=method, rates=rates) for method in methods}
+
+    def apply_batch(self, transactions):
+        transactions = list(transactions)
+        for (method, engine) in self.__engines.items():
+            with timed(self.__metrics, f'engine.apply_batch.{method}'):
+                engine.apply_batch(transactions)
+
+    def has_transaction(self, transaction_number : str) -> bool:
+        return any(engine.has_transaction(transaction_number) for engine in self.__engines.values())
+
+    @property
+    def numeric(self):
+        return self.__numeric
+
+    @property
+    def metrics(self):
+        return self.__metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self.__metrics = metrics
+
+    @property
+    def engines(self):
+        return self.__engines
+
+    @property
+    def aggregates(self):
+        return {method : engine.aggregates for (method, engine) in self.__engines.items()}
@@ -0,0 +1,97 @@
+from decimal import Decimal, Context, ROUND_HALF_EVEN
+from fractions import Fraction
+
+class fraction_numeric:
+    number_type = Fraction
+    exact = True
+
+    def quantize(self, value : Fraction) -> Fraction:
+        return value
+
+    def quantize_units(self, value : Fraction) -> Fraction:
+        return value
+
+    def from_cell(self, value) -> Fraction:
+        if isinstance(value, str):
+            value = value.strip()
+            if '/' in value:
+                return Fraction(value)
+            return Fraction(Decimal(value))
+        return Fraction(Decimal(repr(value)))
+
+    def units_from_cell(self, value) -> Fraction:
+        return self.from_cell(value)
+
+    def to_record(self):
+        return {'backend' : 'fraction'}
+
+    def scale(self, value : Fraction, numerator : Fraction, denominator : Fraction) -> Fraction:
+        return (value * numerator) / denominator
+
+    def scale_units(self, value : Fraction, numerator : Fraction, denominator : Fraction) -> Fraction:
+        return self.scale(value, numerator, denominator)
+
+    def size(self, value : Fraction) -> int:
+        return value.denominator.bit_length()
+
+class decimal_numeric:
+    number_type = Decimal
+    exact = False
+
+    def __init__(self, places : int = 8, rounding : str = ROUND_HALF_EVEN, precision : int = 28, unit_places : int = 8):
+        assert places >= 0 and unit_places >= 0 and precision > max(places, unit_places)
+        self.__quantum = Decimal(1).scaleb(-places)
+        self.__unit_quantum = Decimal(1).scaleb(-unit_places)
+        self.__context = Context(prec=precision, rounding=rounding)
+
+    @property
+    def places(self) -> int:
+        return -self.__quantum.as_tuple().exponent
+
+    @property
+    def unit_places(self) -> int:
+        return -self.__unit_quantum.as_tuple().exponent
+
+    @property
+    def rounding(self) -> str:
+        return self.__context.rounding
+
+    @property
+    def precision(self) -> int:
+        return self.__context.prec
+
+    def to_record(self):
+        return {'backend' : 'decimal', 'places' : self.places, 'rounding' : self.rounding, 'precision' : self.precision,
+                'unit_places' : self.unit_places}
+
+    def quantize(self, value : Decimal) -> Decimal:
+        return value.quantize(self.__quantum, context=self.__context)
+
+    def quantize_units(self, value : Decimal) -> Decimal:
+        return value.quantize(self.__unit_quantum, context=self.__context)
+
+    def from_cell(self, value) -> Decimal:
+        if isinstance(value, str):
+            return self.quantize(Decimal(value.strip()))
+        return self.quantize(Decimal(repr(value)))
+
+    def units_from_cell(self, value) -> Decimal:
+        if isinstance(value, str):
+            return self.quantize_units(Decimal(value.strip()))
+        return self.quantize_units(Decimal(repr(value)))
+
+    def scale(self, value : Decimal, numerator : Decimal, denominator : Decimal) -> Decimal:
+        return self.quantize(self.__context.divide(self.__context.multiply(value, numerator), denominator))
+
+    def scale_units(self, value : Decimal, numerator : Decimal, denominator : Decimal) -> Decimal:
+        return self.quantize_units(self.__context.divide(self.__context.multiply(value, numerator), denominator))
+
+    def size(self, value : Decimal) -> int:
+        return len(value.as_tuple().digits)
+
+def numeric_from_record(record : dict):
+    if record['backend'] == 'fraction':
+        return fraction_numeric()
+    if record['backend'] == 'decimal':
+        return decimal_numeric(record['places'], record['rounding'], record['precision'], record['unit_places'])
+    raise ValueError(f'Undefined numeric backend {record["backend"]}')
@@ -0,0 +1,91 @@
+import bisect
+import heapq
+
+class redemption_optimizer:
+    def __init__(self, engine, prices : dict, currency_conversion_rate):
+        assert currency_conversion_rate > 0 and all([price > 0 for price in prices.values()])
+        self.__numeric = engine.numeric
+        self.__rate = currency_conversion_rate
+        self.__prices = {}
+        self.__units = {}
+        self.__costs = {}
+        self.__zero = zero = self.__numeric.number_type(0)
+        for key in engine.registers:
+            if key[0] not in prices:
+                continue
+            units = [zero]
+            costs = [zero]
+            for lot in engine.open_lots(key):
+                units.append(units[-1] + lot.units)
+                costs.append(costs[-1] + lot.cost_in_local_currency)
+            if len(units) > 1:
+                self.__prices[key] = prices[key[0]]
+                self.__units[key] = units
+                self.__costs[key] = costs
+        self.__hulls = {key : self.__hull(key) for key in self.__units}
+
+    @property
+    def registers(self):
+        return list(self.__units)
+
+    def available(self, key):
+        return self.__units[key][-1] * self.__prices[key]
+
+    def cost(self, key, units):
+        prefix_units = self.__units[key]
+        prefix_costs = self.__costs[key]
+        if units > prefix_units[-1]:
+            raise ValueError(f'Can\'t redeem {float(units)} units from {key} holding {float(prefix_units[-1])}')
+        i = bisect.bisect_left(prefix_units, units)
+        if prefix_units[i] == units:
+            return prefix_costs[i]
+        return prefix_costs[i - 1] + self.__numeric.scale(prefix_costs[i] - prefix_costs[i - 1], units - prefix_units[i - 1],
+                                                          prefix_units[i] - prefix_units[i - 1])
+
+    def evaluate(self, key, units):
+        proceeds = units * self.__prices[key]
+        cost_in_local_currency = self.cost(key, units)
+        return (units, proceeds, cost_in_local_currency, proceeds * self.__rate - cost_in_local_currency)
+
+    def __hull(self, key):
+        rate = float(self.__prices[key] * self.__rate)
+        points = [(float(units), float(units) * rate - float(cost)) for (units, cost) in zip(self.__units[key], self.__costs[key])]
+        hull = []
+        for (i, (units, gain)) in enumerate(points):
+            while len(hull) > 1 and ((points[hull[-1]][0] - points[hull[-2]][0]) * (gain - points[hull[-2]][1]) <=
+                                     (points[hull[-1]][1] - points[hull[-2]][1]) * (units - points[hull[-2]][0])):
+                hull.pop()
+            hull.append(i)
+        price = float(self.__prices[key])
+        return [(self.__units[key][j], (points[j][1] - points[i][1]) / ((points[j][0] - points[i][0]) * price)) for (i, j) in zip(hull, hull[1:])]
+
+    def __marginal_gain(self, allocation : dict, key, proceeds):
+        units = allocation.get(key, self.__zero)
+        return self.evaluate(key, units + proceeds / self.__prices[key])[3] - self.evaluate(key, units)[3]
+
+    def __headroom(self, allocation : dict, key):
+        return (self.__units[key][-1] - allocation.get(key, self.__zero)) * self.__prices[key]
+
+    def plan(self, target):
+        assert target > 0
+        heap = [(hull[0][1], sequence, key, 0) for (sequence, (key, hull)) in enumerate(self.__hulls.items())]
+        heapq.heapify(heap)
+        allocation = {}
+        remaining = target
+        while remaining > 0:
+            if len(heap) == 0:
+                raise ValueError(f'Can\'t redeem {float(target)}, holdings fall short by {float(remaining)}')
+            (slope, sequence, key, position) = heapq.heappop(heap)
+            hull = self.__hulls[key]
+            proceeds = (hull[position][0] - allocation.get(key, self.__zero)) * self.__prices[key]
+            if proceeds < remaining:
+                allocation[key] = hull[position][0]
+                remaining -= proceeds
+                if position + 1 < len(hull):
+                    heapq.heappush(heap, (hull[position + 1][1], sequence, key, position + 1))
+                continue
+            candidates = [key] + [entry[2] for entry in heap if self.__headroom(allocation, entry[2]) >= remaining]
+            key = min(candidates, key=lambda key : self.__marginal_gain(allocation, key, remaining))
+            allocation[key] = allocation.get(key, self.__zero) + remaining / self.__prices[key]
+            remaining = 0
+        return {key : self.evaluate(key, units) for (key, units) in allocation.items()}
@@ -0,0 +1,83 @@
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from fifo_transaction_engine import fifo_transaction_engine
+from transaction_row import Field, fifo_fund_transactions
+from instrumentation import engine_metrics
+
+def row_keys(row):
+    keys = [(row[Field.fund_name].strip(), row[Field.register].strip())]
+    if row[Field.operation] == 'Conversion':
+        keys.append((row[Field.dst_fund_name].strip(), row[Field.dst_register].strip()))
+    return keys
+
+def find_root(parents : dict, key):
+    while parents[key] != key:
+        parents[key] = parents[parents[key]]
+        key = parents[key]
+    return key
+
+def split_components(rows):
+    parents = {}
+    key_order = {}
+    row_roots = []
+    rows = list(rows)
+    for row in rows:
+        keys = row_keys(row)
+        for key in keys:
+            if key not in parents:
+                parents[key] = key
+                key_order[key] = len(key_order)
+        roots = [find_root(parents, key) for key in keys]
+        for root in roots[1:]:
+            parents[root] = roots[0]
+    components = {}
+    for row in rows:
+        root = find_root(parents, row_keys(row)[0])
+        if root not in components:
+            components[root] = []
+        components[root].append(row)
+    return (list(components.values()), key_order)
+
+def evaluate_components(components : list, numeric = None, method : str = 'fifo', rates = None, instrumented : bool = False):
+    metrics = engine_metrics() if instrumented else None
+    results = []
+    for rows in components:
+        engine = fifo_transaction_engine(numeric, metrics=metrics, method=method, rates=rates)
+        fifo_fund_transactions(engine, rows)
+        results.append(engine.aggregates)
+    return (results, metrics.snapshot() if metrics is not None else None)
+
+def merge_results(results, key_order : dict):
+    remaining_funds = {}
+    closed_transactions = {}
+    for (remaining, closed) in results:
+        remaining_funds.update(remaining)
+        closed_transactions.update(closed)
+    remaining_funds = dict(sorted(remaining_funds.items(), key=lambda item: key_order[item[0]]))
+    closed_transactions = dict(sorted(closed_transactions.items(), key=lambda item: key_order[item[0][:2]]))
+    return (closed_transactions, remaining_funds)
+
+def pack_components(components : list, buckets : int):
+    packs = [(0, i, []) for i in range(min(buckets, len(components)))]
+    for component in sorted(components, key=len, reverse=True):
+        (size, i, pack) = heapq.heappop(packs)
+        pack.append(component)
+        heapq.heappush(packs, (size + len(component), i, pack))
+    return [pack for (size, i, pack) in sorted(packs, key=lambda item: item[1])]
+
+def calculate_parallel(sheets, numeric = None, jobs : int = 2, method : str = 'fifo', rates = None, metrics = None):
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        submitted = []
+        for (sheet_name, rows) in sheets:
+            (components, key_order) = split_components(rows)
+            futures = [executor.submit(evaluate_components, pack, numeric, method, rates, metrics is not None)
+                       for pack in pack_components(components, jobs * 4)]
+            submitted.append((futures, key_order))
+        for (futures, key_order) in submitted:
+            results = []
+            for future in futures:
+                (pack_results, snapshot) = future.result()
+                results.extend(pack_results)
+                if snapshot is not None:
+                    metrics.merge(snapshot)
+            yield merge_results(results, key_order)
@@ -1,21 +1,73 @@
+import sys
+from enum import IntEnum
 from fractions import Fraction
 
+class lot_status(IntEnum):
+    exists = 0
+    closed = 1
+
 class payment_unit:
+    __slots__ = ('__fund_name', '__register', '__transaction', '__units', '__cost', '__status', '__cost_in_local_currency', '__redemption')
+
     def __init__(self, fund_name : str, register : str, cost : Fraction, units : Fraction,
-                 currency_conversion_rate : Fraction, transaction : str):
+                 currency_conversion_rate : Fraction, transaction : str, cost_in_local_currency : Fraction = None):
         assert all([x > 0 for x in (units, cost)])
         self.__fund_name = fund_name
         self.__register = register
         self.__transaction = transaction
         self.__units = units
         self.__cost = cost
-        self.__status = 'exists'
-        self.__buy_currency_conversion_rate = currency_conversion_rate
-        assert(type(self.__cost) is Fraction)
+        self.__status = lot_status.exists
+        self.__cost_in_local_currency = cost * currency_conversion_rate if cost_in_local_currency is None else cost_in_local_currency
+        self.__redemption = None
+
+    def __getstate__(self):
+        return (self.__fund_name, self.__register, self.__transaction, self.__units, self.__cost, int(self.__status),
+                self.__cost_in_local_currency, self.__redemption)
+
+    def __setstate__(self, state : tuple):
+        (self.__fund_name, self.__register, self.__transaction, self.__units, self.__cost, status,
+         self.__cost_in_local_currency, self.__redemption) = state
+        self.__status = lot_status(status)
+
+    def to_record(self):
+        redemption = None if self.__redemption is None else [str(value) for value in self.__redemption]
+        return [self.__fund_name, self.__register, self.__transaction, str(self.__units), str(self.__cost), int(self.__status),
+                str(self.__cost_in_local_currency), redemption]
+
+    @staticmethod
+    def from_record(record : list, number_type):
+        (fund_name, register, transaction, units, cost, status, cost_in_local_currency, redemption) = record
+        unit = payment_unit.__new__(payment_unit)
+        unit.__setstate__((sys.intern(fund_name), sys.intern(register), transaction, number_type(units), number_type(cost), status,
+                           number_type(cost_in_local_currency), None if redemption is None else tuple(map(number_type, redemption))))
+        return unit
+
+    def split(self, units : Fraction, cost : Fraction = None, cost_in_local_currency : Fraction = None):
+        assert 0 < units < self.__units
+        if cost is None:
+            cost = (self.__cost * units) / self.__units
+        if cost_in_local_currency is None:
+            cost_in_local_currency = (self.__cost_in_local_currency * cost) / self.__cost
+        portion = payment_unit.__new__(payment_unit)
+        portion.__fund_name = self.__fund_name
+        portion.__register = self.__register
+        portion.__transaction = self.__transaction
+        portion.__units = units
+        portion.__cost = cost
+        portion.__status = self.__status
+        portion.__cost_in_local_currency = cost_in_local_currency
+        portion.__redemption = self.__redemption
+        self.__units -= units
+        self.__cost -= cost
+        self.__cost_in_local_currency -= cost_in_local_currency
+        return portion
 
-    def __mul__(self, multiplier : Fraction):
-        self.__cost *= multiplier
-        self.__units *= multiplier
+    def merge(self, other):
+        assert self.__status == lot_status.exists and other.__status == lot_status.exists
+        self.__units += other.__units
+        self.__cost += other.__cost
+        self.__cost_in_local_currency += other.__cost_in_local_currency
         return self
 
     def convert(self, dst_fund : str, dst_register : str, dst_units : Fraction, transaction : str):
@@ -24,15 +76,17 @@ class payment_unit:
         self.__transaction = transaction
         self.__units = dst_units
 
-    def close(self, redemption_payment : Fraction, currency_exchange_rate : Fraction, transaction : str):
-        self.__redemption_payment = redemption_payment
-        self.__redemption_currency_conversion_rate = currency_exchange_rate
+    def close(self, redemption_payment : Fraction, currency_exchange_rate : Fraction, transaction : str,
+              redemption_in_local_currency : Fraction = None):
+        if redemption_in_local_currency is None:
+            redemption_in_local_currency = redemption_payment * currency_exchange_rate
+        self.__redemption = (redemption_payment, redemption_in_local_currency)
         self.__transaction = transaction
-        self.__status = 'closed'
+        self.__status = lot_status.closed
 
     @property
     def is_closed(self) -> bool:
-        return self.__status != 'exists'
+        return self.__status != lot_status.exists
 
     @property
     def fund_name(self) -> str:
@@ -56,29 +110,25 @@ class payment_unit:
 
     @property
     def cost_in_local_currency(self) -> Fraction:
-        return self.__cost * self.__buy_currency_conversion_rate
+        return self.__cost_in_local_currency
 
     @property
     def close_key(self):
-        if self.__status != 'closed':
+        if self.__status != lot_status.closed:
             raise Exception('Can\'t get closing key when transaction is not yet closed')
-        return (self.fund_name, self.register, self.transaction)
+        return (self.__fund_name, self.__register, self.__transaction)
 
     @property
     def close_value(self):
-        if self.__status != 'closed':
+        if self.__status != lot_status.closed:
             raise Exception('Can\'t get closing value when transaction is not yet closed')
-        cost = self.__cost
-        cost_in_local_currency = self.cost_in_local_currency
-        units = self.units
-        payment = self.__redemption_payment
-        payment_in_local_currency = payment * self.__redemption_currency_conversion_rate
-        return (cost, cost_in_local_currency, payment, payment_in_local_currency, units)
+        (payment, payment_in_local_currency) = self.__redemption
+        return (self.__cost, self.__cost_in_local_currency, payment, payment_in_local_currency, self.__units)
 
     @property
     def key(self):
-        return (self.fund_name, self.register)
+        return (self.__fund_name, self.__register)
 
     @property
     def remaining_value(self):
-        return (self.__cost, self.cost_in_local_currency, self.units)
+        return (self.__cost, self.__cost_in_local_currency, self.__units)
@@ -0,0 +1,135 @@
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+from fifo_transaction_engine import fifo_transaction_engine
+from instrumentation import engine_metrics, timed
+from timeline import transaction_timeline
+
+class portfolio_pool:
+    def __init__(self, spill_directory : str = None, memory_budget : int = None, factory = None, metrics = None, lot_bytes : int = 1536):
+        if memory_budget is not None and spill_directory is None:
+            raise ValueError('A memory budget needs a spill directory')
+        self.__spill_directory = spill_directory
+        self.__memory_budget = memory_budget
+        self.__factory = factory if factory is not None else lambda : fifo_transaction_engine(timeline=transaction_timeline())
+        self.__metrics = metrics if metrics is not None else engine_metrics()
+        self.__lot_bytes = lot_bytes
+        self.__resident = OrderedDict()
+        self.__sizes = {}
+        self.__pinned = {}
+        self.__spilled = set()
+        if spill_directory is not None:
+            os.makedirs(spill_directory, exist_ok=True)
+            self.__spilled.update(unquote(name[:-len('.state')]) for name in os.listdir(spill_directory) if name.endswith('.state'))
+
+    def spill_file(self, portfolio : str):
+        return os.path.join(self.__spill_directory, quote(portfolio, safe='') + '.state')
+
+    def estimate(self, engine) -> int:
+        timeline = engine.timeline
+        return self.__lot_bytes * (engine.resident_lots + (len(timeline) if timeline is not None else 0))
+
+    def __spill(self, portfolio : str):
+        engine = self.__resident.pop(portfolio)
+        self.__sizes.pop(portfolio)
+        with timed(self.__metrics, 'pool.spill'):
+            engine.save(self.spill_file(portfolio))
+        self.__spilled.add(portfolio)
+
+    def __enforce_budget(self, keep : str = None):
+        if self.__memory_budget is None:
+            return
+        for portfolio in list(self.__resident):
+            if self.resident_bytes <= self.__memory_budget:
+                break
+            if portfolio not in self.__pinned and portfolio != keep:
+                self.__spill(portfolio)
+                self.__metrics.count('pool.evictions')
+        self.__metrics.observe('pool.resident_bytes', self.resident_bytes)
+
+    def __measure(self, portfolio : str):
+        self.__sizes[portfolio] = self.estimate(self.__resident[portfolio])
+
+    def update(self, portfolio : str):
+        if portfolio in self.__resident:
+            self.__measure(portfolio)
+            self.__enforce_budget()
+
+    def __acquire(self, portfolio : str):
+        if portfolio in self.__resident:
+            self.__metrics.count('pool.hits')
+            self.__resident.move_to_end(portfolio)
+            return self.__resident[portfolio]
+        self.__metrics.count('pool.misses')
+        if portfolio in self.__spilled:
+            with timed(self.__metrics, 'pool.load'):
+                engine = fifo_transaction_engine.load(self.spill_file(portfolio))
+            self.__metrics.count('pool.loads')
+        else:
+            engine = self.__factory()
+            self.__metrics.count('pool.creates')
+        self.__resident[portfolio] = engine
+        self.__measure(portfolio)
+        return engine
+
+    def get(self, portfolio : str):
+        engine = self.__acquire(portfolio)
+        self.__enforce_budget(portfolio)
+        return engine
+
+    def put(self, portfolio : str, engine):
+        self.drop(portfolio)
+        self.__resident[portfolio] = engine
+        self.__measure(portfolio)
+        self.__enforce_budget(portfolio)
+
+    @contextmanager
+    def checkout(self, portfolio : str):
+        engine = self.__acquire(portfolio)
+        self.__pinned[portfolio] = self.__pinned.get(portfolio, 0) + 1
+        try:
+            yield engine
+        finally:
+            self.__pinned[portfolio] -= 1
+            if self.__pinned[portfolio] == 0:
+                del self.__pinned[portfolio]
+            self.update(portfolio)
+
+    def drop(self, portfolio : str) -> bool:
+        dropped = self.__resident.pop(portfolio, None) is not None
+        self.__sizes.pop(portfolio, None)
+        if portfolio in self.__spilled:
+            self.__spilled.discard(portfolio)
+            os.remove(self.spill_file(portfolio))
+            dropped = True
+        return dropped
+
+    def flush(self):
+        if self.__spill_directory is None:
+            return
+        for portfolio in list(self.__resident):
+            if portfolio not in self.__pinned:
+                self.__spill(portfolio)
+
+    @property
+    def portfolios(self):
+        return list(self.__resident) + sorted(self.__spilled - self.__resident.keys())
+
+    @property
+    def resident(self):
+        return list(self.__resident)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(self.__sizes.values())
+
+    @property
+    def metrics(self):
+        return self.__metrics
+
+    def __contains__(self, portfolio : str) -> bool:
+        return portfolio in self.__resident or portfolio in self.__spilled
+
+    def __len__(self):
+        return len(self.__resident) + len(self.__spilled - self.__resident.keys())
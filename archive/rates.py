@@ -0,0 +1,43 @@
+import bisect
+import csv
+import datetime
+from operator import itemgetter
+from transaction_row import parse_date
+
+class rate_table:
+    def __init__(self, rates):
+        entries = sorted(rates, key=itemgetter(0))
+        self.__dates = [date for (date, rate) in entries]
+        self.__rates = [rate for (date, rate) in entries]
+        self.__cache = {}
+
+    @staticmethod
+    def from_csv(csv_file : str, numeric, date_column : str = 'date', rate_column : str = 'rate'):
+        with open(csv_file, newline='') as stream:
+            return rate_table((rate_table.__required_date(row[date_column]), numeric.units_from_cell(row[rate_column])) for row in csv.DictReader(stream))
+
+    @staticmethod
+    def __required_date(value : str):
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f'Missing or unrecognised rate date {value!r}')
+        return date
+
+    def to_record(self):
+        return [[date.isoformat(), str(rate)] for (date, rate) in zip(self.__dates, self.__rates)]
+
+    @staticmethod
+    def from_record(record : list, number_type):
+        return rate_table((datetime.date.fromisoformat(date), number_type(rate)) for (date, rate) in record)
+
+    def rate(self, date):
+        if date in self.__cache:
+            return self.__cache[date]
+        index = bisect.bisect_right(self.__dates, date) - 1
+        if index < 0:
+            raise ValueError(f'No currency conversion rate on or before {date}')
+        self.__cache[date] = self.__rates[index]
+        return self.__rates[index]
+
+    def __len__(self):
+        return len(self.__dates)
@@ -0,0 +1,162 @@
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from decimal import Decimal
+
+section_fields = {'closed' : ('fund', 'register', 'transaction', 'cost', 'cost_local', 'payment', 'payment_local', 'units'),
+                  'remaining' : ('fund', 'register', 'cost', 'cost_local', 'units')}
+
+report_columns = ('sheet', 'section', 'scope', 'fund', 'register', 'transaction', 'cost', 'cost_local', 'payment', 'payment_local', 'units')
+
+number_columns = ('cost', 'cost_local', 'payment', 'payment_local', 'units')
+
+unit_columns = ('units',)
+
+period_columns = ('period_start', 'period_end')
+
+def closed_rows(closed_transactions : dict):
+    for (key, value) in closed_transactions.items():
+        yield (*key, *value)
+
+def remaining_rows(remaining_funds : dict):
+    for (key, value) in remaining_funds.items():
+        yield (*key, *value)
+
+def exact(value):
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    return str(value)
+
+class table_writer:
+    titles = {'closed' : 'Closed transactions', 'remaining' : 'Remaining funds'}
+    headers = {'closed' : ['Fund', 'Register', 'Transaction', 'Cost PLN', 'Cost USD', 'Payment USD', 'Payment PLN', 'Units'],
+               'remaining' : ['Fund', 'Register', 'Cost PLN', 'Cost USD', 'Units']}
+    labels = {'closed' : 3, 'remaining' : 2}
+
+    def __init__(self, stream):
+        self.__stream = stream
+        self.__sections = 0
+
+    def write_section(self, section : str, rows, sheet : str = None, scope : str = None, period : tuple = None):
+        from tabulate import tabulate
+        labels = self.labels[section]
+        entries = [[f'{item}' for item in row[:labels]] + [f'{float(item):,.2f}' for item in row[labels:]] for row in rows]
+        if self.__sections > 0:
+            self.__stream.write('\n')
+        self.__stream.write(f'{self.titles[section]}:\n' if scope is None else f'{self.titles[section]} ({scope}):\n')
+        self.__stream.write(tabulate(entries, self.headers[section]) + '\n')
+        self.__sections += 1
+
+    def close(self):
+        self.__stream.flush()
+
+class csv_writer:
+    def __init__(self, stream):
+        self.__stream = stream
+        self.__writer = csv.writer(stream)
+        self.__writer.writerow(report_columns)
+
+    def write_section(self, section : str, rows, sheet : str = None, scope : str = None, period : tuple = None):
+        fields = section_fields[section]
+        for row in rows:
+            values = dict(zip(fields, row))
+            self.__writer.writerow([sheet or '', section, scope or ''] +
+                                   [exact(values[field]) if field in values else '' for field in report_columns[3:]])
+
+    def close(self):
+        self.__stream.flush()
+
+class json_lines_writer:
+    def __init__(self, stream):
+        self.__stream = stream
+
+    def write_section(self, section : str, rows, sheet : str = None, scope : str = None, period : tuple = None):
+        fields = section_fields[section]
+        for row in rows:
+            entry = {'sheet' : sheet, 'section' : section, 'scope' : scope}
+            entry.update(zip(fields, map(exact, row)))
+            self.__stream.write(json.dumps(entry) + '\n')
+
+    def close(self):
+        self.__stream.flush()
+
+class columnar_writer:
+    def __init__(self, output_file : str, format : str = 'parquet', batch_size : int = 8192, numeric = None):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError(f'{format} reports need the optional pyarrow package') from None
+        self.__pyarrow = pyarrow
+        self.__decimal = numeric is not None and not numeric.exact
+        self.__types = {column : pyarrow.string() for column in report_columns}
+        if self.__decimal:
+            money_type = pyarrow.decimal128(38, numeric.places)
+            unit_type = pyarrow.decimal128(38, numeric.unit_places)
+            self.__types.update((column, unit_type if column in unit_columns else money_type) for column in number_columns)
+        self.__types.update((column, pyarrow.date32()) for column in period_columns)
+        self.__schema = pyarrow.schema(list(self.__types.items()))
+        self.__batch_size = batch_size
+        self.__columns = {column : [] for column in self.__types}
+        if format == 'parquet':
+            import pyarrow.parquet
+            self.__writer = pyarrow.parquet.ParquetWriter(output_file, self.__schema)
+        else:
+            import pyarrow.ipc
+            self.__writer = pyarrow.ipc.new_file(output_file, self.__schema)
+
+    def __flush(self):
+        if len(self.__columns['section']) > 0:
+            arrays = [self.__pyarrow.array(values, self.__types[column]) for (column, values) in self.__columns.items()]
+            self.__writer.write_table(self.__pyarrow.Table.from_arrays(arrays, schema=self.__schema))
+            self.__columns = {column : [] for column in self.__types}
+
+    def __number(self, value):
+        return value if self.__decimal else exact(value)
+
+    def write_section(self, section : str, rows, sheet : str = None, scope : str = None, period : tuple = None):
+        fields = section_fields[section]
+        (start, end) = period if period is not None else (None, None)
+        for row in rows:
+            values = dict(zip(fields, row))
+            self.__columns['sheet'].append(sheet)
+            self.__columns['section'].append(section)
+            self.__columns['scope'].append(scope)
+            for field in report_columns[3:]:
+                if field not in values:
+                    self.__columns[field].append(None)
+                elif field in number_columns:
+                    self.__columns[field].append(self.__number(values[field]))
+                else:
+                    self.__columns[field].append(values[field])
+            self.__columns['period_start'].append(start)
+            self.__columns['period_end'].append(end)
+            if len(self.__columns['section']) >= self.__batch_size:
+                self.__flush()
+
+    def close(self):
+        self.__flush()
+        self.__writer.close()
+
+text_writers = {'table' : table_writer, 'csv' : csv_writer, 'jsonl' : json_lines_writer}
+columnar_formats = ('arrow', 'parquet')
+
+@contextmanager
+def open_report(format : str = 'table', output_file : str = None, numeric = None):
+    if format in columnar_formats:
+        if output_file is None:
+            raise ValueError(f'{format} reports need an output file')
+        writer = columnar_writer(output_file, format, numeric=numeric)
+        try:
+            yield writer
+        finally:
+            writer.close()
+        return
+    stream = sys.stdout if output_file is None else open(output_file, 'w', newline='')
+    try:
+        writer = text_writers[format](stream)
+        yield writer
+        writer.close()
+    finally:
+        if output_file is not None:
+            stream.close()
@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+from fifo_transaction_engine import fifo_transaction_engine
+from ingest import open_sheets, padded
+from lot_store import lot_methods
+from portfolio_pool import portfolio_pool
+from numeric import fraction_numeric, decimal_numeric
+from timeline import transaction_timeline
+from transaction_row import Field, fifo_fund_rows, fifo_fund_transactions
+
+def replay_portfolio(spreadsheet_file : str, sheet : str = None, numeric = None, method : str = 'fifo', rates = None):
+    for (sheet_name, rows) in open_sheets(spreadsheet_file, len(Field)):
+        if sheet is None or sheet_name == sheet:
+            engine = fifo_transaction_engine(numeric, method=method, timeline=transaction_timeline(), rates=rates)
+            fifo_fund_transactions(engine, rows)
+            return engine
+    raise ValueError(f'Sheet {sheet} not found in {spreadsheet_file}')
+
+def encode_totals(totals : dict):
+    return [[list(key), [str(value) for value in values]] for (key, values) in totals.items()]
+
+class portfolio_service:
+    def __init__(self, numeric = None, method : str = 'fifo', jobs : int = None, rates = None, spill_directory : str = None,
+                 memory_budget : int = None):
+        self.__numeric = numeric if numeric is not None else fraction_numeric()
+        self.__method = method
+        self.__rates = rates
+        self.__jobs = jobs
+        self.__executor = None
+        self.__pool = portfolio_pool(spill_directory, memory_budget, self.__new_engine)
+        self.__locks = {}
+        self.__handlers = {'apply' : self.__apply, 'replay' : self.__replay, 'aggregates' : self.__aggregates, 'as_of' : self.__as_of,
+                           'realized_between' : self.__realized_between, 'preview' : self.__preview, 'portfolios' : self.__portfolios, 'drop' : self.__drop,
+                           'statistics' : self.__statistics}
+
+    def __lock(self, portfolio : str):
+        if portfolio not in self.__locks:
+            self.__locks[portfolio] = asyncio.Lock()
+        return self.__locks[portfolio]
+
+    def __new_engine(self):
+        return fifo_transaction_engine(self.__numeric, method=self.__method, timeline=transaction_timeline(), rates=self.__rates)
+
+    @property
+    def pool(self):
+        return self.__pool
+
+    def __worker_pool(self):
+        if self.__executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.__executor = ProcessPoolExecutor(max_workers=self.__jobs)
+        return self.__executor
+
+    async def __apply(self, request : dict):
+        with self.__pool.checkout(request['portfolio']) as engine:
+            rows = [padded(list(row), len(Field)) for row in request['transactions']]
+            rows = [row for row in rows if not engine.has_transaction(str(row[Field.number]).strip())]
+            batch = fifo_fund_rows(engine.numeric, rows)
+            await asyncio.get_running_loop().run_in_executor(None, engine.apply_batch, batch)
+        return {'applied' : len(batch)}
+
+    async def __replay(self, request : dict):
+        loop = asyncio.get_running_loop()
+        engine = await loop.run_in_executor(self.__worker_pool(), replay_portfolio, request['spreadsheet'], request.get('sheet'),
+                                            self.__numeric, self.__method, self.__rates)
+        self.__pool.put(request['portfolio'], engine)
+        return {'remaining' : len(engine.remaining_funds)}
+
+    async def __aggregates(self, request : dict):
+        (remaining_funds, closed_transactions) = self.__pool.get(request['portfolio']).aggregates
+        return {'remaining' : encode_totals(remaining_funds), 'closed' : encode_totals(closed_transactions)}
+
+    async def __as_of(self, request : dict):
+        (remaining_funds, closed_transactions) = self.__pool.get(request['portfolio']).as_of(datetime.date.fromisoformat(request['date']))
+        return {'remaining' : encode_totals(remaining_funds), 'closed' : encode_totals(closed_transactions)}
+
+    async def __realized_between(self, request : dict):
+        closed_transactions = self.__pool.get(request['portfolio']).realized_between(datetime.date.fromisoformat(request['start']),
+                                                                                     datetime.date.fromisoformat(request['end']))
+        return {'closed' : encode_totals(closed_transactions)}
+
+    async def __preview(self, request : dict):
+        engine = self.__pool.get(request['portfolio'])
+        batch = fifo_fund_rows(engine.numeric, [padded(list(row), len(Field)) for row in request['transactions']])
+        (closed_transactions, consumed_lots) = engine.preview(batch)
+        return {'closed' : encode_totals(closed_transactions),
+                'consumed' : {transaction : [[origin, *map(str, values)] for (origin, *values) in lots]
+                              for (transaction, lots) in consumed_lots.items()}}
+
+    async def __portfolios(self, request : dict):
+        return {'portfolios' : self.__pool.portfolios}
+
+    async def __drop(self, request : dict):
+        return {'dropped' : self.__pool.drop(request['portfolio'])}
+
+    async def __statistics(self, request : dict):
+        return {'resident' : self.__pool.resident, 'resident_bytes' : self.__pool.resident_bytes, **self.__pool.metrics.snapshot()}
+
+    async def handle(self, request : dict):
+        response = {'id' : None}
+        try:
+            if not isinstance(request, dict):
+                raise ValueError(f'Request must be a JSON object, not {type(request).__name__}')
+            response['id'] = request.get('id')
+            if request.get('op') not in self.__handlers:
+                raise ValueError(f'Undefined operation {request.get("op")}')
+            if 'portfolio' in request:
+                async with self.__lock(request['portfolio']):
+                    response['result'] = await self.__handlers[request['op']](request)
+            else:
+                response['result'] = await self.__handlers[request['op']](request)
+            response['ok'] = True
+        except Exception as error:
+            response['ok'] = False
+            response['error'] = f'{type(error).__name__}: {error}'
+        return response
+
+    async def serve_connection(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = {'id' : None, 'ok' : False, 'error' : f'Malformed request: {error}'}
+                else:
+                    response = await self.handle(request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, path : str = None, host : str = '127.0.0.1', port : int = 0):
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_connection, path, limit=2 ** 24)
+        return await asyncio.start_server(self.serve_connection, host, port, limit=2 ** 24)
+
+    def close(self):
+        self.__pool.flush()
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
+
+async def serve(service : portfolio_service, path : str = None, host : str = '127.0.0.1', port : int = 0):
+    server = await service.start(path, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Serve warm cost_base engines per portfolio over a JSON lines socket')
+    parser.add_argument('--socket', help='Unix socket path (default: TCP on --host/--port)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--numeric', help='Numeric backend used for lot arithmetic', choices=['fraction', 'decimal'], default='fraction')
+    parser.add_argument('--places', help='Decimal places of money amounts kept by the decimal backend', type=int, default=8)
+    parser.add_argument('--unit-places', help='Decimal places of units and conversion rates kept by the decimal backend', type=int, default=8)
+    parser.add_argument('--method', help='Lot selection method', choices=list(lot_methods), default='fifo')
+    parser.add_argument('--jobs', help='Worker processes for spreadsheet replays', type=int)
+    parser.add_argument('--rates', help='CSV with date and rate columns used for rows without a conversion rate')
+    parser.add_argument('--spill-directory', help='Directory where least recently used portfolios are spilled and reloaded from')
+    parser.add_argument('--memory-budget', help='Estimated MiB of resident engines kept before spilling (needs --spill-directory)', type=int)
+    options = parser.parse_args()
+    if options.memory_budget is not None and options.spill_directory is None:
+        parser.error('--memory-budget needs --spill-directory')
+    numeric = fraction_numeric() if options.numeric == 'fraction' else decimal_numeric(options.places, unit_places=options.unit_places)
+    rates = None
+    if options.rates is not None:
+        from rates import rate_table
+        rates = rate_table.from_csv(options.rates, numeric)
+    memory_budget = None if options.memory_budget is None else options.memory_budget * 2 ** 20
+    service = portfolio_service(numeric, options.method, options.jobs, rates, options.spill_directory, memory_budget)
+    try:
+        asyncio.run(serve(service, options.socket, options.host, options.port))
+    except KeyboardInterrupt:
+        pass
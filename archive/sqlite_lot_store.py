@@ -0,0 +1,285 @@
+import json
+import sqlite3
+from numeric import fraction_numeric
+from payment import payment_unit
+from lineage import lineage_index
+
+class stale_lot_database(ValueError):
+    pass
+
+class sqlite_lots:
+    def __init__(self, store, key):
+        self.__store = store
+        self.__key = key
+
+    def head(self):
+        return self.__store.head(self.__key)
+
+    def take(self):
+        return self.__store.take(self.__key)
+
+    def append(self, lot):
+        self.__store.append(self.__key, lot)
+
+    def extend(self, lots):
+        for lot in lots:
+            self.__store.append(self.__key, lot)
+
+    def origins(self, lot):
+        return (lot.transaction,)
+
+    def __len__(self):
+        return self.__store.count(self.__key)
+
+    def selection(self):
+        return self.__store.lots(self.__key, self.__store.methods[self.__store.method])
+
+    def __iter__(self):
+        return self.__store.lots(self.__key)
+
+class sqlite_transaction_ids:
+    def __init__(self, store):
+        self.__store = store
+
+    def add(self, transaction_number : str):
+        self.__store.add_transaction(transaction_number)
+
+    def __contains__(self, transaction_number : str):
+        return self.__store.has_transaction(transaction_number)
+
+    def __iter__(self):
+        return self.__store.transaction_numbers()
+
+    def __len__(self):
+        return self.__store.transaction_count()
+
+class sqlite_lineage(lineage_index):
+    def __init__(self, store):
+        self.__store = store
+
+    def add(self, src_transaction : str, dst_transaction : str):
+        self.__store.add_edge(src_transaction, dst_transaction)
+
+    def to_record(self):
+        return None
+
+    def children(self, transaction_number : str):
+        return self.__store.children(transaction_number)
+
+    def parents(self, transaction_number : str):
+        return self.__store.parents(transaction_number)
+
+    def edges(self):
+        return self.__store.edges()
+
+class sqlite_lot_store:
+    methods = {'fifo' : 'ASC', 'lifo' : 'DESC'}
+
+    def __init__(self, database_file : str, method : str = 'fifo', cache_kib : int = 65536, numeric = None):
+        if method not in self.methods:
+            raise ValueError(f'Lot selection method {method} is not supported by the SQLite lot store')
+        self.__database_file = database_file
+        self.__method = method
+        self.__cache_kib = cache_kib
+        self.__numeric = numeric if numeric is not None else fraction_numeric()
+        self.__connect()
+
+    def __connect(self):
+        self.__connection = sqlite3.connect(self.__database_file, isolation_level='DEFERRED')
+        self.__connection.execute(f'PRAGMA cache_size = -{self.__cache_kib}')
+        self.__connection.execute('PRAGMA journal_mode = WAL')
+        self.__connection.execute('PRAGMA synchronous = NORMAL')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS register_keys (position INTEGER PRIMARY KEY, fund TEXT, register TEXT)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS open_lots (sequence INTEGER PRIMARY KEY, position INTEGER, state TEXT)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS open_lots_position ON open_lots (position, sequence)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS closed_lots (sequence INTEGER PRIMARY KEY, position INTEGER, state TEXT)')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS closed_lots_position ON closed_lots (position, sequence)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS transaction_ids (number TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS lineage (src TEXT, dst TEXT, UNIQUE (src, dst))')
+        self.__connection.execute('CREATE INDEX IF NOT EXISTS lineage_dst ON lineage (dst)')
+        self.__connection.execute('CREATE TABLE IF NOT EXISTS store_state (generation INTEGER)')
+        row = self.__connection.execute('SELECT generation FROM store_state').fetchone()
+        if row is None:
+            self.__connection.execute('INSERT INTO store_state VALUES (0)')
+            self.__connection.commit()
+        self.__generation = row[0] if row is not None else 0
+        self.__positions = {(fund, register) : position
+                            for (position, fund, register) in self.__connection.execute('SELECT * FROM register_keys ORDER BY position')}
+        self.__counts = dict(self.__connection.execute('SELECT position, COUNT(*) FROM open_lots GROUP BY position'))
+        self.__sequence = self.__connection.execute('SELECT MAX(sequence) FROM (SELECT sequence FROM open_lots UNION ALL '
+                                                    'SELECT sequence FROM closed_lots)').fetchone()[0] or 0
+        self.__heads = {}
+        self.__dirty = False
+
+    def __getstate__(self):
+        return (self.__database_file, self.__method, self.__cache_kib, self.__numeric, self.flush())
+
+    def __setstate__(self, state : tuple):
+        (self.__database_file, self.__method, self.__cache_kib, self.__numeric, generation) = state
+        self.__connect()
+        self.check_generation(generation)
+
+    def to_record(self):
+        return {'store' : 'sqlite', 'database' : self.__database_file, 'method' : self.__method, 'cache_kib' : self.__cache_kib,
+                'generation' : self.flush()}
+
+    @staticmethod
+    def from_record(record : dict, numeric):
+        store = sqlite_lot_store(record['database'], record['method'], record['cache_kib'], numeric)
+        store.check_generation(record['generation'])
+        return store
+
+    @staticmethod
+    def __encode(lot):
+        return json.dumps(lot.to_record(), separators=(',', ':'))
+
+    def __decode(self, state : str):
+        return payment_unit.from_record(json.loads(state), self.__numeric.number_type)
+
+    def check_generation(self, generation : int):
+        if self.__generation != generation:
+            self.__connection.close()
+            raise stale_lot_database(f'Lot database {self.__database_file} is at generation {self.__generation} but the snapshot expects {generation}')
+
+    @property
+    def generation(self) -> int:
+        return self.__generation
+
+    def __write_heads(self):
+        self.__connection.executemany('UPDATE open_lots SET state = ? WHERE sequence = ?',
+                                      [(self.__encode(lot), sequence) for (sequence, lot) in self.__heads.values()])
+        self.__heads.clear()
+
+    def flush(self) -> int:
+        self.__write_heads()
+        self.__generation += 1
+        self.__connection.execute('UPDATE store_state SET generation = ?', (self.__generation,))
+        self.__connection.commit()
+        self.__dirty = False
+        return self.__generation
+
+    def disconnect(self):
+        if self.__dirty or self.__heads:
+            self.flush()
+        self.__connection.close()
+
+    @property
+    def method(self) -> str:
+        return self.__method
+
+    def __position(self, key):
+        if key not in self.__positions:
+            position = len(self.__positions)
+            self.__connection.execute('INSERT INTO register_keys VALUES (?, ?, ?)', (position, *key))
+            self.__positions[key] = position
+            self.__dirty = True
+        return self.__positions[key]
+
+    def open_lots(self, key):
+        self.__position(key)
+        return sqlite_lots(self, key)
+
+    def head(self, key):
+        if key not in self.__heads:
+            row = self.__connection.execute(f'SELECT sequence, state FROM open_lots WHERE position = ? ORDER BY sequence '
+                                            f'{self.methods[self.__method]} LIMIT 1', (self.__positions[key],)).fetchone()
+            if row is None:
+                raise IndexError(f'No open lots in {key}')
+            self.__heads[key] = (row[0], self.__decode(row[1]))
+        return self.__heads[key][1]
+
+    def take(self, key):
+        self.head(key)
+        (sequence, lot) = self.__heads.pop(key)
+        self.__connection.execute('DELETE FROM open_lots WHERE sequence = ?', (sequence,))
+        self.__counts[self.__positions[key]] -= 1
+        self.__dirty = True
+        return lot
+
+    def append(self, key, lot):
+        position = self.__position(key)
+        if self.__method == 'lifo' and key in self.__heads:
+            (sequence, head) = self.__heads.pop(key)
+            self.__connection.execute('UPDATE open_lots SET state = ? WHERE sequence = ?', (self.__encode(head), sequence))
+        self.__sequence += 1
+        self.__connection.execute('INSERT INTO open_lots VALUES (?, ?, ?)', (self.__sequence, position, self.__encode(lot)))
+        self.__counts[position] = self.__counts.get(position, 0) + 1
+        self.__dirty = True
+
+    def count(self, key) -> int:
+        return self.__counts.get(self.__positions[key], 0)
+
+    def peek_lots(self, key):
+        return sqlite_lots(self, key) if key in self.__positions else None
+
+    def __cached(self, key, sequence : int, state : str):
+        head = self.__heads.get(key)
+        return head[1] if head is not None and head[0] == sequence else self.__decode(state)
+
+    def lots(self, key, order : str = 'ASC'):
+        cursor = self.__connection.execute(f'SELECT sequence, state FROM open_lots WHERE position = ? ORDER BY sequence {order}',
+                                           (self.__positions[key],))
+        return (self.__cached(key, sequence, state) for (sequence, state) in cursor)
+
+    def closed_lots(self, key):
+        if key not in self.__positions:
+            return ()
+        cursor = self.__connection.execute('SELECT state FROM closed_lots WHERE position = ? ORDER BY sequence', (self.__positions[key],))
+        return [self.__decode(state) for (state,) in cursor]
+
+    def close(self, key, lot):
+        self.__sequence += 1
+        self.__connection.execute('INSERT INTO closed_lots VALUES (?, ?, ?)',
+                                  (self.__sequence, self.__position(key), self.__encode(lot)))
+        self.__dirty = True
+
+    def transaction_ids(self, record : list = None):
+        return sqlite_transaction_ids(self)
+
+    def transactions_record(self, transactions):
+        return None
+
+    def lineage(self, record : dict = None):
+        return sqlite_lineage(self)
+
+    def add_transaction(self, transaction_number : str):
+        self.__connection.execute('INSERT OR IGNORE INTO transaction_ids VALUES (?)', (transaction_number,))
+        self.__dirty = True
+
+    def has_transaction(self, transaction_number : str) -> bool:
+        return self.__connection.execute('SELECT 1 FROM transaction_ids WHERE number = ?', (transaction_number,)).fetchone() is not None
+
+    def transaction_numbers(self):
+        return (number for (number,) in self.__connection.execute('SELECT number FROM transaction_ids'))
+
+    def transaction_count(self) -> int:
+        return self.__connection.execute('SELECT COUNT(*) FROM transaction_ids').fetchone()[0]
+
+    def add_edge(self, src_transaction : str, dst_transaction : str):
+        self.__connection.execute('INSERT OR IGNORE INTO lineage VALUES (?, ?)', (src_transaction, dst_transaction))
+        self.__dirty = True
+
+    def children(self, transaction_number : str):
+        return [dst for (dst,) in self.__connection.execute('SELECT dst FROM lineage WHERE src = ? ORDER BY rowid', (transaction_number,))]
+
+    def parents(self, transaction_number : str):
+        return [src for (src,) in self.__connection.execute('SELECT src FROM lineage WHERE dst = ? ORDER BY rowid', (transaction_number,))]
+
+    def edges(self):
+        return iter(self.__connection.execute('SELECT src, dst FROM lineage ORDER BY rowid').fetchall())
+
+    def keys(self):
+        return self.__positions.keys()
+
+    def resident_lots(self) -> int:
+        return len(self.__heads)
+
+    def iter_open(self):
+        keys = list(self.__positions)
+        for (position, sequence, state) in self.__connection.execute('SELECT position, sequence, state FROM open_lots ORDER BY position, sequence'):
+            yield (keys[position], self.__cached(keys[position], sequence, state))
+
+    def iter_closed(self):
+        keys = list(self.__positions)
+        for (position, state) in self.__connection.execute('SELECT position, state FROM closed_lots ORDER BY position, sequence'):
+            yield (keys[position], self.__decode(state))
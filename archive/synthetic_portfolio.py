@@ -0,0 +1,102 @@
+import argparse
+import csv
+import random
+from fractions import Fraction
+from transaction_row import Field
+
+first_date = 43831
+
+def register_key(register : int, level : int):
+    return (f'Synthetic fund {register}.{level}', f'{100000 + register} {level:03d}')
+
+def row(number : int, operation : str, fund_name : str, register : str, units : float, payment = '', commision : float = 0.0,
+        dst_fund_name : str = '', dst_register : str = '', dst_units = '', rate : float = 1.0):
+    values = [''] * len(Field)
+    values[Field.lp] = float(number)
+    values[Field.date] = float(first_date + number // 50)
+    values[Field.operation] = operation
+    values[Field.number] = str(number)
+    values[Field.payment] = payment
+    values[Field.fund_name] = fund_name
+    values[Field.register] = register
+    values[Field.units] = units
+    values[Field.commision] = commision
+    values[Field.dst_fund_name] = dst_fund_name
+    values[Field.dst_register] = dst_register
+    values[Field.dst_units] = dst_units
+    values[Field.currency_converion_rate] = rate
+    return values
+
+def fraction(value : float):
+    return Fraction(repr(value))
+
+def take_units(generator : random.Random, lots : list, partial_fill_ratio : float):
+    if generator.random() < partial_fill_ratio:
+        available = sum(lots)
+        units = round(float(available) * generator.uniform(0.05, 0.95), 4)
+        if units <= 0 or fraction(units) >= available:
+            units = float(lots[0])
+    else:
+        units = float(lots[0])
+    remaining = fraction(units)
+    while remaining > 0:
+        if lots[0] <= remaining:
+            remaining -= lots.pop(0)
+        else:
+            lots[0] -= remaining
+            remaining = 0
+    return units
+
+def synthetic_rows(seed : int = 0, registers : int = 10, lots_per_register : int = 100, partial_fill_ratio : float = 0.5,
+                   conversion_depth : int = 1, sell_probability : float = 0.4, conversion_probability : float = 0.2):
+    generator = random.Random(seed)
+    lots = {(register, level) : [] for register in range(registers) for level in range(conversion_depth + 1)}
+    number = 1
+    for step in range(lots_per_register):
+        for register in range(registers):
+            (fund_name, register_name) = register_key(register, 0)
+            units = round(generator.uniform(1, 100), 4)
+            payment = round(units * generator.uniform(5, 50), 2)
+            rate = round(generator.uniform(3.5, 4.5), 4)
+            yield row(number, 'Buy', fund_name, register_name, units, payment, round(payment * 0.01, 2), rate=rate)
+            lots[(register, 0)].append(fraction(units))
+            number += 1
+            for level in range(conversion_depth):
+                if not lots[(register, level)] or generator.random() >= conversion_probability:
+                    continue
+                (fund_name, register_name) = register_key(register, level)
+                (dst_fund_name, dst_register) = register_key(register, level + 1)
+                units = take_units(generator, lots[(register, level)], partial_fill_ratio)
+                dst_units = round(units * generator.uniform(0.5, 2), 4)
+                yield row(number, 'Conversion', fund_name, register_name, units, commision=0.0, dst_fund_name=dst_fund_name,
+                          dst_register=dst_register, dst_units=dst_units, rate=rate)
+                lots[(register, level + 1)].append(fraction(dst_units))
+                number += 1
+            level = generator.randrange(conversion_depth + 1)
+            if lots[(register, level)] and generator.random() < sell_probability:
+                (fund_name, register_name) = register_key(register, level)
+                units = take_units(generator, lots[(register, level)], partial_fill_ratio)
+                payment = round(units * generator.uniform(5, 60), 2)
+                yield row(number, 'Sell', fund_name, register_name, units, payment, round(payment * 0.01, 2), rate=rate)
+                number += 1
+
+def write_csv(csv_file : str, rows):
+    with open(csv_file, 'w', newline='') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(['Synthetic portfolio'])
+        writer.writerow([''])
+        writer.writerow([field.name for field in Field])
+        for values in rows:
+            writer.writerow([repr(value) if isinstance(value, float) else value for value in values])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = 'Generate a seeded synthetic transaction sheet in the cost_base layout')
+    parser.add_argument('output', help='Output .csv file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--registers', type=int, default=10)
+    parser.add_argument('--lots-per-register', type=int, default=100)
+    parser.add_argument('--partial-fill-ratio', type=float, default=0.5)
+    parser.add_argument('--conversion-depth', type=int, default=1)
+    options = parser.parse_args()
+    write_csv(options.output, synthetic_rows(options.seed, options.registers, options.lots_per_register, options.partial_fill_ratio,
+                                             options.conversion_depth))
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from decimal import ROUND_HALF_UP
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric, decimal_numeric
+from cost_base import load_sheet_state, state_mismatch, render_fifo_fund_diagram
+from diagram import diagram_recorder
+
+class test_cost_base(unittest.TestCase):
+
+    def test_snapshot_settings_must_match(self):
+        engine = fifo_transaction_engine(method='lifo')
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(2), 'in 1')
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = os.path.join(directory, 'sheet.state')
+            self.assertIsNone(load_sheet_state(state_file, fraction_numeric(), 'lifo'))
+            engine.save(state_file)
+            self.assertTrue(load_sheet_state(state_file, fraction_numeric(), 'lifo').has_transaction('in 1'))
+            with self.assertRaises(state_mismatch):
+                load_sheet_state(state_file, fraction_numeric(), 'fifo')
+            with self.assertRaises(state_mismatch):
+                load_sheet_state(state_file, decimal_numeric(), 'lifo')
+            decimal_engine = fifo_transaction_engine(decimal_numeric(4, ROUND_HALF_UP))
+            decimal_engine.save(state_file)
+            self.assertIsNotNone(load_sheet_state(state_file, decimal_numeric(4, ROUND_HALF_UP), 'fifo'))
+            with self.assertRaises(state_mismatch):
+                load_sheet_state(state_file, decimal_numeric(8, ROUND_HALF_UP), 'fifo')
+
+    def test_render_replays_snapshot_without_recorder(self):
+        engine = fifo_transaction_engine()
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(2), 'in 1')
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = os.path.join(directory, 'sheet.state')
+            engine.save(state_file)
+            self.assertIsNotNone(load_sheet_state(state_file, fraction_numeric(), 'fifo'))
+            with mock.patch('sys.stderr'):
+                self.assertIsNone(load_sheet_state(state_file, fraction_numeric(), 'fifo', render=True))
+            fifo_transaction_engine(observer=diagram_recorder()).save(state_file)
+            self.assertIsNotNone(load_sheet_state(state_file, fraction_numeric(), 'fifo', render=True).observer)
+
+    def test_render_register(self):
+        recorder = diagram_recorder()
+        engine = fifo_transaction_engine(observer=recorder)
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(2), 'in 1')
+        engine.add_payment('C', '3', Fraction(50), Fraction(0), Fraction(5), Fraction(2), 'in 2')
+        engine.add_conversion('A', '1', Fraction(4), 'B', '2', Fraction(8), Fraction(0), Fraction(2), 'conv 1')
+        engine.add_withdrawal('B', '2', Fraction(60), Fraction(0), Fraction(8), Fraction(3), 'out 1')
+        with mock.patch.object(recorder, 'render') as render:
+            render_fifo_fund_diagram(recorder, 'diagram', 'svg', register=('B', '2'))
+            render.assert_called_once_with('diagram', {'conv 1', 'out 1'}, 'svg')
+            render.reset_mock()
+            render_fifo_fund_diagram(recorder, 'diagram', 'svg', ancestry='out 1', register=('A', '1'))
+            render.assert_called_once_with('diagram', {'in 1'}, 'svg')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from diagram import diagram_recorder
+
+class test_diagram(unittest.TestCase):
+
+    def create_engine(self, observer = None):
+        engine = fifo_transaction_engine(observer=observer)
+        engine.add_payment('A', '1', Fraction(100), Fraction(1), Fraction(10), Fraction(2), 'in 1')
+        engine.add_conversion('A', '1', Fraction(4), 'B', '2', Fraction(8), Fraction(0), Fraction(2), 'conv 1')
+        engine.add_withdrawal('B', '2', Fraction(60), Fraction(0), Fraction(8), Fraction(3), 'out 1')
+        return engine
+
+    def test_recording_disabled_by_default(self):
+        engine = self.create_engine()
+        self.assertIsNone(engine.observer)
+        with self.assertRaises(ValueError):
+            engine.generate_diagram('diagram')
+
+    def test_diagram_nodes_and_edges(self):
+        recorder = diagram_recorder()
+        engine = self.create_engine(recorder)
+        self.assertEqual(recorder.edges, {('in 1', 'conv 1'), ('conv 1', 'out 1')})
+        self.assertEqual(recorder.edges, set(engine.lineage.edges()))
+        engine.lineage.add('in 1', 'out 1')
+        self.assertIn(('in 1', 'out 1'), recorder.edges)
+        source = recorder.build().source
+        self.assertIn('Buy #1', source)
+        self.assertIn('Convert #1', source)
+        self.assertIn('Sell #1', source)
+        self.assertIn('40.00 USD (80.00 PLN)', source)
+        self.assertIn('"conv 1" -> "out 1"', source)
+
+    def create_portfolio(self):
+        recorder = diagram_recorder()
+        engine = fifo_transaction_engine(observer=recorder)
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(2), 'in 1', datetime.date(2020, 1, 10))
+        engine.add_payment('C', '3', Fraction(50), Fraction(0), Fraction(5), Fraction(2), 'in 2', datetime.date(2020, 2, 10))
+        engine.add_conversion('A', '1', Fraction(4), 'B', '2', Fraction(8), Fraction(0), Fraction(2), 'conv 1', datetime.date(2020, 3, 10))
+        engine.add_withdrawal('B', '2', Fraction(60), Fraction(0), Fraction(8), Fraction(3), 'out 1', datetime.date(2021, 1, 10))
+        engine.add_withdrawal('C', '3', Fraction(60), Fraction(0), Fraction(5), Fraction(3), 'out 2', datetime.date(2021, 2, 10))
+        return recorder
+
+    def test_subgraph_selection(self):
+        recorder = self.create_portfolio()
+        self.assertEqual(recorder.ancestry('out 1'), {'in 1', 'conv 1', 'out 1'})
+        self.assertEqual(recorder.register_transactions('C', '3'), {'in 2', 'out 2'})
+        self.assertEqual(recorder.date_range_transactions(datetime.date(2020, 2, 1), datetime.date(2020, 12, 31)), {'in 2', 'conv 1'})
+        self.assertEqual(recorder.components(), [{'in 1', 'conv 1', 'out 1'}, {'in 2', 'out 2'}])
+        source = recorder.build(recorder.ancestry('out 1')).source
+        self.assertIn('Sell #1', source)
+        self.assertNotIn('Sell #2', source)
+        self.assertNotIn('"in 2"', source)
+        self.assertIn('"in 1" -> "conv 1"', source)
+
+    def test_render_components(self):
+        recorder = self.create_portfolio()
+        with tempfile.TemporaryDirectory() as directory, mock.patch('graphviz.Digraph.render', autospec=True) as render:
+            render.side_effect = lambda diagram, filename, format: f'{filename}.{format}'
+            files = recorder.render_components(directory, 'svg', jobs=2)
+        self.assertEqual(files, [os.path.join(directory, 'component_1.svg'), os.path.join(directory, 'component_2.svg')])
+        sources = sorted(call.args[0].source for call in render.call_args_list)
+        self.assertIn('Sell #1', sources[0])
+        self.assertIn('Sell #2', sources[1])
+
+if __name__ == '__main__':
+    unittest.main()
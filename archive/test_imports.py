@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from synthetic_portfolio import synthetic_rows, write_csv
+
+heavy_modules = ['tabulate', 'graphviz', 'xlrd', 'zipfile', 'xml.etree.ElementTree', 'multiprocessing', 'concurrent.futures', 'pickle',
+                 'diagram', 'parallel']
+
+def loaded_modules(statement : str):
+    code = f'import json, sys\n{statement}\nprint(json.dumps([module for module in {heavy_modules!r} if module in sys.modules]))'
+    result = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(result.stdout.splitlines()[-1])
+
+class test_imports(unittest.TestCase):
+
+    def test_cost_base_cold_start(self):
+        self.assertEqual(loaded_modules('import cost_base'), [])
+
+    def test_csv_run_skips_optional_backends(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file = os.path.join(directory, 'portfolio.csv')
+            write_csv(csv_file, synthetic_rows(registers=2, lots_per_register=5))
+            loaded = loaded_modules(f'import cost_base\ncost_base.calculate_tax({csv_file!r}, None)')
+        self.assertIn('tabulate', loaded)
+        self.assertEqual([module for module in ('graphviz', 'xlrd', 'diagram', 'parallel', 'multiprocessing') if module in loaded], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import types
+import unittest
+from ingest import open_sheets, column_index
+
+class test_ingest(unittest.TestCase):
+
+    def test_column_index(self):
+        self.assertEqual(column_index('A4'), 0)
+        self.assertEqual(column_index('M12'), 12)
+        self.assertEqual(column_index('AA1'), 26)
+
+    def test_xlsx_rows(self):
+        template = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'template.xlsx')
+        sheets = list(open_sheets(template, 14))
+        self.assertEqual(len(sheets), 1)
+        (sheet_name, rows) = sheets[0]
+        self.assertEqual(sheet_name, 'BlackRock')
+        self.assertIsInstance(rows, types.GeneratorType)
+        rows = list(rows)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0][:9], [1.0, 41864.0, 'Buy', '1', 63000.0, 'BGF EURO BOND A2 USD', '100 020 568', 1757.82, 1212.75])
+        self.assertEqual(rows[1][2], 'Conversion')
+        self.assertEqual(rows[1][4], '')
+        self.assertEqual(rows[1][11], 4697.6)
+        self.assertTrue(all([len(row) == 14 for row in rows]))
+
+    def test_csv_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file = os.path.join(directory, 'portfolio.csv')
+            with open(csv_file, 'w', newline='') as stream:
+                stream.write('title\nsubtitle\nheader\n1,41864,Buy,1,100,fund,1,10,0,,,,1.5\n')
+            sheets = list(open_sheets(csv_file, 14))
+            self.assertEqual(sheets[0][0], 'portfolio')
+            rows = list(sheets[0][1])
+        self.assertEqual(rows, [['1', '41864', 'Buy', '1', '100', 'fund', '1', '10', '0', '', '', '', '1.5', '']])
+
+if __name__ == '__main__':
+    unittest.main()
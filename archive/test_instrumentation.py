@@ -0,0 +1,54 @@
+import io
+import json
+import pickle
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from instrumentation import engine_metrics, json_lines_exporter, timed
+
+class test_instrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.metrics = engine_metrics([json_lines_exporter(self.stream)])
+        self.engine = fifo_transaction_engine(metrics=self.metrics)
+        self.engine.apply_batch([('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(1), 'buy 1'),
+                                 ('Buy', 'A', '1', Fraction(60), Fraction(0), Fraction(5), Fraction(1), 'buy 2'),
+                                 ('Sell', 'A', '1', Fraction(120), Fraction(0), Fraction(12), Fraction(1), 'sell 1')])
+
+    def test_counters(self):
+        snapshot = self.metrics.export()
+        self.assertEqual(snapshot['counters']['engine.buy'], 2)
+        self.assertEqual(snapshot['counters']['engine.sell'], 1)
+        self.assertEqual(snapshot['counters']['engine.splits'], 1)
+        self.assertEqual(snapshot['counters']['engine.lots_scanned'], 2)
+        self.assertEqual(snapshot['timers']['engine.apply_batch']['count'], 1)
+        self.assertEqual(snapshot['distributions']['engine.cost_size']['count'], 1)
+        self.assertEqual(json.loads(self.stream.getvalue()), snapshot)
+
+    def test_merge(self):
+        merged = engine_metrics()
+        merged.count('engine.buy')
+        snapshot = self.metrics.snapshot()
+        merged.merge(snapshot)
+        merged.merge(snapshot)
+        totals = merged.snapshot()
+        self.assertEqual(totals['counters']['engine.buy'], 5)
+        self.assertEqual(totals['timers']['engine.apply_batch']['count'], 2)
+        self.assertAlmostEqual(totals['timers']['engine.apply_batch']['seconds'], 2 * snapshot['timers']['engine.apply_batch']['seconds'])
+        self.assertEqual(totals['distributions']['engine.cost_size'], {'count' : 2, 'mean' : snapshot['distributions']['engine.cost_size']['mean'],
+                                                                       'max' : snapshot['distributions']['engine.cost_size']['max']})
+
+    def test_metrics_are_not_saved(self):
+        engine = pickle.loads(pickle.dumps(self.engine))
+        self.assertIsNone(engine.metrics)
+        self.assertEqual(engine.remaining_units, self.engine.remaining_units)
+
+    def test_disabled(self):
+        with timed(None, 'phase'):
+            engine = fifo_transaction_engine()
+            engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(1), 'buy 1')
+        self.assertIsNone(engine.metrics)
+
+if __name__ == '__main__':
+    unittest.main()
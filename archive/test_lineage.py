@@ -0,0 +1,33 @@
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+
+class test_lineage(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = fifo_transaction_engine()
+        self.engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(1), 'buy 1')
+        self.engine.add_payment('A', '1', Fraction(60), Fraction(0), Fraction(5), Fraction(1), 'buy 2')
+        self.engine.add_payment('C', '3', Fraction(40), Fraction(0), Fraction(4), Fraction(1), 'buy 3')
+        self.engine.add_conversion('A', '1', Fraction(12), 'B', '2', Fraction(6), Fraction(0), Fraction(1), 'conv 1')
+        self.engine.add_conversion('C', '3', Fraction(4), 'B', '2', Fraction(2), Fraction(0), Fraction(1), 'conv 2')
+        self.engine.add_withdrawal('B', '2', Fraction(90), Fraction(0), Fraction(7), Fraction(1), 'sell 1')
+        self.engine.add_withdrawal('A', '1', Fraction(40), Fraction(0), Fraction(3), Fraction(1), 'sell 2')
+
+    def test_ancestors(self):
+        lineage = self.engine.lineage
+        self.assertEqual(lineage.parents('sell 1'), ['conv 1', 'conv 2'])
+        self.assertEqual(lineage.ancestors('sell 1'), {'conv 1', 'conv 2', 'buy 1', 'buy 2', 'buy 3'})
+        self.assertEqual(lineage.origins('sell 1'), {'buy 1', 'buy 2', 'buy 3'})
+        self.assertEqual(lineage.origins('sell 2'), {'buy 2'})
+        self.assertEqual(lineage.ancestors('buy 1'), set())
+
+    def test_descendants(self):
+        lineage = self.engine.lineage
+        self.assertEqual(lineage.children('buy 2'), ['conv 1', 'sell 2'])
+        self.assertEqual(lineage.descendants('buy 2'), {'conv 1', 'sell 1', 'sell 2'})
+        self.assertEqual(lineage.descendants('buy 3'), {'conv 2', 'sell 1'})
+        self.assertEqual(lineage.component('buy 3'), {'buy 1', 'buy 2', 'buy 3', 'conv 1', 'conv 2', 'sell 1', 'sell 2'})
+
+if __name__ == '__main__':
+    unittest.main()
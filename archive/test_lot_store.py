@@ -0,0 +1,50 @@
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from multi_method_engine import multi_method_engine
+from lot_store import lot_store
+
+class test_lot_store(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = [('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(4), 'buy 1'),
+                      ('Buy', 'A', '1', Fraction(60), Fraction(0), Fraction(5), Fraction(5), 'buy 2'),
+                      ('Buy', 'A', '1', Fraction(40), Fraction(0), Fraction(5), Fraction(4), 'buy 3'),
+                      ('Sell', 'A', '1', Fraction(240), Fraction(0), Fraction(12), Fraction(4), 'sell 1')]
+
+    def evaluate(self, method : str):
+        engine = fifo_transaction_engine(method=method)
+        engine.apply_batch(self.batch)
+        return engine
+
+    def test_selection_methods(self):
+        expected = {'fifo' : (124, 76), 'lifo' : (120, 80), 'hifo' : (130, 70), 'average' : (120, 80)}
+        for (method, (closed_cost, remaining_cost)) in expected.items():
+            (remaining_funds, closed_transactions) = self.evaluate(method).aggregates
+            self.assertEqual(closed_transactions[('A', '1', 'sell 1')][0], closed_cost, method)
+            self.assertEqual(closed_transactions[('A', '1', 'sell 1')][4], 12, method)
+            self.assertEqual(remaining_funds[('A', '1')][0], remaining_cost, method)
+            self.assertEqual(remaining_funds[('A', '1')][2], 8, method)
+
+    def test_average_cost_pool(self):
+        engine = self.evaluate('average')
+        (remaining_funds, closed_transactions) = engine.aggregates
+        self.assertEqual(closed_transactions[('A', '1', 'sell 1')][1], Fraction(860 * 12, 20))
+        self.assertEqual(remaining_funds[('A', '1')][1], Fraction(860 * 8, 20))
+        self.assertEqual(len(engine.remaining_units), 1)
+        self.assertEqual(engine.lineage.parents('sell 1'), ['buy 1', 'buy 2', 'buy 3'])
+
+    def test_multi_method_engine(self):
+        methods = ['fifo', 'lifo', 'hifo', 'average']
+        engine = multi_method_engine(methods)
+        engine.apply_batch(self.batch)
+        self.assertEqual(list(engine.aggregates), methods)
+        for method in methods:
+            self.assertEqual(engine.aggregates[method], self.evaluate(method).aggregates)
+
+    def test_undefined_method(self):
+        with self.assertRaises(ValueError):
+            lot_store('random')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import itertools
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import decimal_numeric
+from optimizer import redemption_optimizer
+
+class test_optimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = fifo_transaction_engine()
+        self.engine.apply_batch([('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(4), 'buy 1'),
+                                 ('Buy', 'A', '1', Fraction(150), Fraction(0), Fraction(10), Fraction(4), 'buy 2'),
+                                 ('Buy', 'A', '2', Fraction(180), Fraction(0), Fraction(10), Fraction(4), 'buy 3'),
+                                 ('Buy', 'B', '1', Fraction(50), Fraction(0), Fraction(10), Fraction(4), 'buy 4'),
+                                 ('Buy', 'B', '1', Fraction(300), Fraction(0), Fraction(10), Fraction(4), 'buy 5'),
+                                 ('Buy', 'C', '1', Fraction(10), Fraction(0), Fraction(1), Fraction(4), 'buy 6')])
+        self.prices = {'A' : Fraction(16), 'B' : Fraction(20)}
+
+    def test_evaluate_matches_preview(self):
+        optimizer = redemption_optimizer(self.engine, self.prices, Fraction(4))
+        self.assertEqual(optimizer.registers, [('A', '1'), ('A', '2'), ('B', '1')])
+        for units in (Fraction(3), Fraction(10), Fraction(25, 2), Fraction(20)):
+            (closed_transactions, _) = self.engine.preview([('Sell', 'A', '1', units * 16, Fraction(0), units, Fraction(4), 'sell')])
+            self.assertEqual(optimizer.cost(('A', '1'), units), sum(value[1] for value in closed_transactions.values()))
+        with self.assertRaises(ValueError):
+            optimizer.cost(('A', '2'), Fraction(11))
+
+    def test_plan(self):
+        optimizer = redemption_optimizer(self.engine, self.prices, Fraction(4))
+        plan = optimizer.plan(Fraction(260))
+        self.assertEqual(sum(proceeds for (_, proceeds, _, _) in plan.values()), 260)
+        self.assertEqual(plan[('A', '2')], (Fraction(10), Fraction(160), Fraction(720), Fraction(-80)))
+        self.assertEqual(plan[('A', '1')], (Fraction(25, 4), Fraction(100), Fraction(250), Fraction(150)))
+        self.assertNotIn(('B', '1'), plan)
+        with self.assertRaises(ValueError):
+            optimizer.plan(Fraction(1000))
+
+    def test_plan_against_exhaustive_search(self):
+        optimizer = redemption_optimizer(self.engine, self.prices, Fraction(4))
+        for target in (Fraction(40), Fraction(200), Fraction(400), Fraction(720), Fraction(880)):
+            best = None
+            for units in itertools.product(range(21), range(11)):
+                remaining = target - units[0] * 16 - units[1] * 16
+                if 0 <= remaining <= 400:
+                    gain = (optimizer.evaluate(('A', '1'), Fraction(units[0]))[3] + optimizer.evaluate(('A', '2'), Fraction(units[1]))[3] +
+                            optimizer.evaluate(('B', '1'), remaining / 20)[3])
+                    best = gain if best is None else min(best, gain)
+            plan = optimizer.plan(target)
+            self.assertEqual(sum(proceeds for (_, proceeds, _, _) in plan.values()), target)
+            self.assertLessEqual(sum(gain for (_, _, _, gain) in plan.values()), best, target)
+
+    def test_decimal_numeric(self):
+        numeric = decimal_numeric(4)
+        engine = fifo_transaction_engine(numeric)
+        engine.apply_batch([('Buy', 'A', '1', numeric.from_cell(100), numeric.from_cell(0), numeric.from_cell(3), numeric.from_cell(4), 'buy 1')])
+        plan = redemption_optimizer(engine, {'A' : numeric.from_cell(40)}, numeric.from_cell(4)).plan(numeric.from_cell(60))
+        self.assertEqual(plan[('A', '1')][1], 60)
+
+if __name__ == '__main__':
+    unittest.main()
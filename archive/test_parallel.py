@@ -0,0 +1,58 @@
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from transaction_row import fifo_fund_transaction
+from parallel import split_components, calculate_parallel
+from instrumentation import engine_metrics
+
+def buy(number, fund, register, payment, units, rate):
+    return [0, 0, 'Buy', number, payment, fund, register, units, 0.0, '', '', '', rate, '']
+
+def convert(number, fund, register, units, dst_fund, dst_register, dst_units, rate):
+    return [0, 0, 'Conversion', number, '', fund, register, units, 0.0, dst_fund, dst_register, dst_units, rate, '']
+
+def sell(number, fund, register, payment, units, rate):
+    return [0, 0, 'Sell', number, payment, fund, register, units, 0.0, '', '', '', rate, '']
+
+class test_parallel(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [
+            buy('1', 'A', '1', 100.0, 10.0, 1.5),
+            buy('2', 'C', '3', 40.0, 4.0, 1.25),
+            buy('3', 'B', '2', 30.0, 3.0, 1.5),
+            sell('4', 'C', '3', 20.0, 1.5, 2.0),
+            convert('5', 'A', '1', 4.0, 'B', '2', 5.0, 1.0),
+            sell('6', 'B', '2', 50.0, 6.5, 2.5),
+            buy('7', 'D', '4', 12.0, 2.0, 1.0),
+            sell('8', 'A', '1', 70.0, 6.0, 2.0),
+        ]
+
+    def test_split_components(self):
+        (components, key_order) = split_components(self.rows)
+        self.assertEqual([[row[3] for row in rows] for rows in components], [['1', '3', '5', '6', '8'], ['2', '4'], ['7']])
+        self.assertEqual(list(key_order), [('A', '1'), ('C', '3'), ('B', '2'), ('D', '4')])
+
+    def test_parallel_matches_serial(self):
+        engine = fifo_transaction_engine()
+        for row in self.rows:
+            fifo_fund_transaction(engine, row)
+        results = list(calculate_parallel([('first', self.rows), ('second', self.rows[:4])], jobs=2))
+        self.assertEqual(len(results), 2)
+        (closed_transactions, remaining_funds) = results[0]
+        self.assertEqual(list(closed_transactions.items()), list(engine.closed_transactions.items()))
+        self.assertEqual(list(remaining_funds.items()), list(engine.remaining_funds.items()))
+        self.assertEqual(results[1][1][('C', '3')], (Fraction(25), Fraction(125, 4), Fraction(5, 2)))
+
+    def test_parallel_metrics(self):
+        metrics = engine_metrics()
+        engine = fifo_transaction_engine(metrics=engine_metrics())
+        for row in self.rows:
+            fifo_fund_transaction(engine, row)
+        list(calculate_parallel([('first', self.rows)], jobs=2, metrics=metrics))
+        counters = metrics.snapshot()['counters']
+        self.assertEqual(counters, engine.metrics.snapshot()['counters'])
+        self.assertEqual((counters['engine.buy'], counters['engine.sell']), (4, 3))
+
+if __name__ == '__main__':
+    unittest.main()
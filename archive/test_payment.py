@@ -1,6 +1,9 @@
 import unittest
 from payment import payment_unit
 from fractions import Fraction
+from numeric import fraction_numeric
+from synthetic_portfolio import row
+from transaction_row import fifo_fund_rows
 
 class test_payment_test(unittest.TestCase):
 
@@ -52,14 +55,6 @@ class test_payment_test(unittest.TestCase):
         self.assertEqual(cost_in_local_currency, params['cost'] * params['currency_exchange_rate'])
         self.assertEqual(units, params['units'])
 
-    def test_multiplication(self):
-        rate = 0.3
-        unit = self.create_payment_unit('primary') * Fraction(rate)
-        params = self.params['primary']
-        self.assertEqual(unit.units, params['units'] * rate)
-        self.assertEqual(unit.cost, params['cost'] * rate)
-        self.assertEqual(unit.cost_in_local_currency, params['cost'] * params['currency_exchange_rate'] * rate)
-
     def test_close_transaction_key(self):
         params = self.params['primary']
         unit = self.create_payment_unit('primary')
@@ -95,5 +90,36 @@ class test_payment_test(unittest.TestCase):
         self.assertEqual(unit.register, params['register'])
         self.assertEqual(unit.units, params['units'])
 
+    def test_compact_representation(self):
+        unit = payment_unit('Subfund gold', '121', Fraction(10), Fraction(2), Fraction(3), '1-1')
+        other = payment_unit('Subfund gold', '121', Fraction(20), Fraction(4), Fraction(3), '1-2')
+        self.assertFalse(hasattr(unit, '__dict__'))
+        self.assertEqual(other.key, unit.key)
+        unit.close(Fraction(12), Fraction(2), '2-1')
+        self.assertEqual(unit.close_key, ('Subfund gold', '121', '2-1'))
+        self.assertEqual(unit.close_value, (Fraction(10), Fraction(30), Fraction(12), Fraction(24), Fraction(2)))
+
+    def test_parsed_names_are_shared(self):
+        names = [''.join(['Subfund ', str(i // 2), ' gold']) for i in range(4)]
+        registers = [str(120 + i // 2) + ' ' for i in range(4)]
+        self.assertIsNot(names[0], names[1])
+        rows = [row(i, ('Buy', 'Sell')[i % 2], names[i], registers[i], 1.0, 10.0, rate=2.0) for i in range(4)]
+        units = [payment_unit(*transaction[1:4], *transaction[5:8]) for transaction in fifo_fund_rows(fraction_numeric(), rows)]
+        self.assertIs(units[0].fund_name, units[1].fund_name)
+        self.assertIs(units[2].register, units[3].register)
+        self.assertEqual(units[0].key, ('Subfund 0 gold', '120'))
+
+    def test_split(self):
+        unit = payment_unit('Subfund gold', '121', Fraction(90), Fraction(9), Fraction(2), '1-1')
+        portion = unit.split(Fraction(3))
+        self.assertEqual(portion.remaining_value, (Fraction(30), Fraction(60), Fraction(3)))
+        self.assertEqual(unit.remaining_value, (Fraction(60), Fraction(120), Fraction(6)))
+        self.assertEqual(portion.key, unit.key)
+        self.assertEqual(portion.transaction, unit.transaction)
+        portion.close(Fraction(40), Fraction(1), '2-1')
+        self.assertFalse(unit.is_closed)
+        self.assertEqual(unit.split(Fraction(2), Fraction(25)).cost, Fraction(25))
+        self.assertEqual(unit.remaining_value, (Fraction(35), Fraction(70), Fraction(4)))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+from portfolio_pool import portfolio_pool
+
+def buy(number : int, units : int = 10):
+    return ('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(units), Fraction(4), f'buy {number}')
+
+class test_portfolio_pool(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.spill_directory = os.path.join(self.directory.name, 'spill')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def counters(self, pool : portfolio_pool):
+        return pool.metrics.snapshot()['counters']
+
+    def test_least_recently_used_spill(self):
+        pool = portfolio_pool(self.spill_directory, 4 * 1536, lot_bytes=1536)
+        for portfolio in ('a', 'b', 'c'):
+            with pool.checkout(portfolio) as engine:
+                engine.apply_batch([buy(1)])
+        self.assertEqual(pool.resident, ['b', 'c'])
+        self.assertEqual(pool.portfolios, ['b', 'c', 'a'])
+        self.assertTrue(os.path.exists(pool.spill_file('a')))
+        pool.get('b')
+        engine = pool.get('a')
+        self.assertTrue(engine.has_transaction('buy 1'))
+        self.assertEqual(pool.resident, ['b', 'a'])
+        self.assertEqual(self.counters(pool), {'pool.misses' : 4, 'pool.creates' : 3, 'pool.evictions' : 2, 'pool.hits' : 1, 'pool.loads' : 1})
+
+    def test_pinned_portfolios_stay_resident(self):
+        pool = portfolio_pool(self.spill_directory, 2 * 1536, lot_bytes=1536)
+        with pool.checkout('a') as first:
+            first.apply_batch([buy(1)])
+            with pool.checkout('b') as second:
+                second.apply_batch([buy(2)])
+                pool.update('a')
+                self.assertEqual(pool.resident, ['a', 'b'])
+            self.assertEqual(pool.resident, ['a'])
+        self.assertEqual(pool.resident, ['a'])
+        self.assertEqual(pool.portfolios, ['a', 'b'])
+        self.assertEqual(pool.resident_bytes, 2 * 1536)
+
+    def test_portfolio_larger_than_budget(self):
+        pool = portfolio_pool(self.spill_directory, 1536, lot_bytes=1536)
+        with pool.checkout('a') as engine:
+            engine.apply_batch([buy(1), buy(2)])
+        self.assertEqual(pool.resident, [])
+        engine = pool.get('a')
+        self.assertEqual(pool.resident, ['a'])
+        engine.apply_batch([buy(3)])
+        pool.get('b')
+        self.assertEqual(pool.resident, ['b'])
+        self.assertTrue(pool.get('a').has_transaction('buy 3'))
+        with pool.checkout('a') as engine:
+            engine.apply_batch([buy(4)])
+            self.assertEqual(pool.resident, ['a'])
+        self.assertTrue(pool.get('a').has_transaction('buy 4'))
+
+    def test_reload_after_restart(self):
+        pool = portfolio_pool(self.spill_directory)
+        pool.get('client/1').apply_batch([buy(1), buy(2)])
+        pool.flush()
+        self.assertEqual(pool.resident, [])
+        restarted = portfolio_pool(self.spill_directory)
+        self.assertIn('client/1', restarted)
+        self.assertEqual(restarted.get('client/1').remaining_funds[('A', '1')], (200, 800, 20))
+        self.assertTrue(restarted.drop('client/1'))
+        self.assertFalse(os.path.exists(restarted.spill_file('client/1')))
+        self.assertEqual(len(restarted), 0)
+
+    def test_budget_needs_spill_directory(self):
+        with self.assertRaises(ValueError):
+            portfolio_pool(memory_budget=1024)
+        pool = portfolio_pool()
+        pool.get('a').apply_batch([buy(1)])
+        pool.flush()
+        self.assertEqual(pool.resident, ['a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import copy
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from sqlite_lot_store import sqlite_lot_store
+from instrumentation import engine_metrics
+
+class test_preview(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = [('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(4), 'buy 1'),
+                      ('Buy', 'A', '1', Fraction(60), Fraction(0), Fraction(5), Fraction(5), 'buy 2'),
+                      ('Buy', 'A', '1', Fraction(40), Fraction(0), Fraction(5), Fraction(4), 'buy 3'),
+                      ('Sell', 'A', '1', Fraction(48), Fraction(0), Fraction(2), Fraction(4), 'sell 1')]
+        self.candidates = [('Conversion', 'A', '1', Fraction(9), 'B', '1', Fraction(18), Fraction(0), Fraction(4), 'conversion 1'),
+                           ('Buy', 'B', '1', Fraction(30), Fraction(0), Fraction(3), Fraction(5), 'buy 4'),
+                           ('Sell', 'B', '1', Fraction(100), Fraction(0), Fraction(20), Fraction(5), 'sell 2'),
+                           ('Sell', 'A', '1', Fraction(90), Fraction(0), Fraction(6), Fraction(3), 'sell 3')]
+
+    def assert_matches_apply(self, engine):
+        before = engine.aggregates
+        (closed_transactions, consumed_lots) = engine.preview(self.candidates)
+        self.assertEqual(engine.aggregates, before)
+        applied = copy.deepcopy(engine)
+        applied.apply_batch(self.candidates)
+        expected = {key : value for (key, value) in applied.closed_transactions.items() if key[2] in ('sell 2', 'sell 3')}
+        self.assertEqual(closed_transactions, expected)
+        self.assertEqual(sum(units for (_, units, _, _) in consumed_lots['sell 3']), 6)
+        self.assertEqual(set(consumed_lots), {'conversion 1', 'sell 2', 'sell 3'})
+
+    def test_methods(self):
+        for method in ('fifo', 'lifo', 'hifo', 'average'):
+            engine = fifo_transaction_engine(method=method)
+            engine.apply_batch(self.batch)
+            with self.subTest(method=method):
+                self.assert_matches_apply(engine)
+
+    def test_consumed_lots(self):
+        engine = fifo_transaction_engine()
+        engine.apply_batch(self.batch)
+        (_, consumed_lots) = engine.preview([('Sell', 'A', '1', Fraction(50), Fraction(0), Fraction(10), Fraction(4), 'sell 4')])
+        self.assertEqual(consumed_lots['sell 4'], [('buy 1', 8, 80, 320), ('buy 2', 2, 24, 120)])
+        self.assertEqual([value for (_, value) in engine.remaining_units], [(80, 320, 8), (60, 300, 5), (40, 160, 5)])
+
+    def test_insufficient_units(self):
+        engine = fifo_transaction_engine()
+        engine.apply_batch(self.batch)
+        with self.assertRaises(ValueError):
+            engine.preview([('Sell', 'A', '1', Fraction(50), Fraction(0), Fraction(30), Fraction(4), 'sell 4')])
+        with self.assertRaises(ValueError):
+            engine.preview([('Sell', 'C', '1', Fraction(50), Fraction(0), Fraction(1), Fraction(4), 'sell 4')])
+        self.assertNotIn(('C', '1'), engine.remaining_funds)
+        self.assertEqual(len(engine.remaining_units), 3)
+
+    def test_no_side_effects(self):
+        engine = fifo_transaction_engine(metrics=engine_metrics())
+        engine.apply_batch(self.batch)
+        before = engine.metrics.snapshot()
+        engine.preview(self.candidates)
+        self.assertEqual(engine.metrics.snapshot()['counters'], before['counters'])
+        self.assertEqual(engine.metrics.snapshot()['distributions'], before['distributions'])
+        with tempfile.TemporaryDirectory() as directory:
+            payments = sqlite_lot_store(os.path.join(directory, 'lots.sqlite'))
+            engine = fifo_transaction_engine(payments=payments)
+            engine.apply_batch(self.batch)
+            self.assertEqual(engine.resident_lots, 1)
+            engine.preview(self.candidates)
+            self.assertEqual(len(engine.remaining_units), 3)
+            self.assertEqual(engine.resident_lots, 1)
+            payments.disconnect()
+
+    def test_sqlite_lot_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for method in ('fifo', 'lifo'):
+                payments = sqlite_lot_store(os.path.join(directory, f'{method}.sqlite'), method)
+                engine = fifo_transaction_engine(method=method, payments=payments)
+                engine.apply_batch(self.batch)
+                reference = fifo_transaction_engine(method=method)
+                reference.apply_batch(self.batch)
+                with self.subTest(method=method):
+                    self.assertEqual(engine.preview(self.candidates), reference.preview(self.candidates))
+                    self.assertEqual(engine.aggregates, reference.aggregates)
+                payments.disconnect()
+
+if __name__ == '__main__':
+    unittest.main()
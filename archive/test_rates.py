@@ -0,0 +1,52 @@
+import datetime
+import os
+import tempfile
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric
+from rates import rate_table
+from synthetic_portfolio import row
+from transaction_row import fifo_fund_rows
+
+class test_rates(unittest.TestCase):
+
+    def setUp(self):
+        self.rates = rate_table([(datetime.date(2020, 1, 3), Fraction(4)), (datetime.date(2020, 1, 1), Fraction(3))])
+
+    def test_lookup(self):
+        self.assertEqual(self.rates.rate(datetime.date(2020, 1, 1)), 3)
+        self.assertEqual(self.rates.rate(datetime.date(2020, 1, 2)), 3)
+        self.assertEqual(self.rates.rate(datetime.date(2020, 2, 1)), 4)
+        with self.assertRaises(ValueError):
+            self.rates.rate(datetime.date(2019, 12, 31))
+
+    def test_from_csv(self):
+        with tempfile.TemporaryDirectory() as directory:
+            csv_file = os.path.join(directory, 'rates.csv')
+            with open(csv_file, 'w') as stream:
+                stream.write('date,rate\n2020-01-01,3.9512\n43833,4.01\n')
+            rates = rate_table.from_csv(csv_file, fraction_numeric())
+        self.assertEqual(len(rates), 2)
+        self.assertEqual(rates.rate(datetime.date(2020, 1, 2)), Fraction('3.9512'))
+        self.assertEqual(rates.rate(datetime.date(2020, 1, 3)), Fraction('4.01'))
+
+    def test_engine_resolves_missing_rates(self):
+        rows = [row(1, 'Buy', 'A', '1', 10.0, 100.0, rate=''), row(2, 'Sell', 'A', '1', 4.0, 60.0, rate=''),
+                row(3, 'Sell', 'A', '1', 1.0, 20.0, rate=5.0)]
+        rows[0][1] = '2020-01-01'
+        rows[1][1] = rows[2][1] = '2020-01-04'
+        engine = fifo_transaction_engine(rates=self.rates)
+        engine.apply_batch(fifo_fund_rows(engine.numeric, rows))
+        closed_transactions = engine.closed_transactions
+        self.assertEqual(closed_transactions[('A', '1', '2')], (40, 120, 60, 240, 4))
+        self.assertEqual(closed_transactions[('A', '1', '3')], (10, 30, 20, 100, 1))
+        engine.add_payment('A', '1', Fraction(10), Fraction(0), Fraction(1), None, '4', datetime.date(2020, 1, 2))
+        self.assertEqual(engine.remaining_funds[('A', '1')], (60, 180, 6))
+
+    def test_missing_rate_without_table(self):
+        with self.assertRaises(ValueError):
+            fifo_transaction_engine().add_payment('A', '1', Fraction(10), Fraction(0), Fraction(1), None, '1', datetime.date(2020, 1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
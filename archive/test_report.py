@@ -0,0 +1,95 @@
+import csv
+import datetime
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import sys
+import unittest
+from unittest import mock
+from decimal import Decimal
+from fractions import Fraction
+from numeric import decimal_numeric
+from report import closed_rows, remaining_rows, table_writer, csv_writer, json_lines_writer, open_report
+
+class test_report(unittest.TestCase):
+
+    def setUp(self):
+        self.closed = {('A', '1', 'sell 1') : (Fraction(1, 3), Fraction(4, 3), Fraction(2), Fraction(8), Fraction(1, 7))}
+        self.remaining = {('A', '1') : (Decimal('1.10000000'), Decimal('4.4'), Decimal('2'))}
+
+    def write(self, writer):
+        writer.write_section('closed', closed_rows(self.closed), 'sheet', None)
+        writer.write_section('remaining', remaining_rows(self.remaining), 'sheet', 'as of 2020-01-01')
+        writer.close()
+
+    def test_csv_keeps_exact_values(self):
+        stream = io.StringIO()
+        self.write(csv_writer(stream))
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        self.assertEqual(Fraction(rows[0]['cost']), Fraction(1, 3))
+        self.assertEqual(Fraction(rows[0]['units']), Fraction(1, 7))
+        self.assertEqual(rows[0]['transaction'], 'sell 1')
+        self.assertEqual((rows[1]['section'], rows[1]['scope'], rows[1]['payment']), ('remaining', 'as of 2020-01-01', ''))
+        self.assertEqual(Decimal(rows[1]['cost']), Decimal('1.1'))
+
+    def test_json_lines(self):
+        stream = io.StringIO()
+        self.write(json_lines_writer(stream))
+        (closed, remaining) = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(closed['cost_local'], '4/3')
+        self.assertEqual(remaining, {'sheet' : 'sheet', 'section' : 'remaining', 'scope' : 'as of 2020-01-01', 'fund' : 'A', 'register' : '1',
+                                     'cost' : '1.10000000', 'cost_local' : '4.4', 'units' : '2'})
+
+    def test_table(self):
+        stream = io.StringIO()
+        self.write(table_writer(stream))
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'Closed transactions:')
+        self.assertIn('Remaining funds (as of 2020-01-01):', lines)
+        self.assertIn('0.33', lines[3])
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet(self):
+        import pyarrow.parquet
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, 'report.parquet')
+            with open_report('parquet', output_file) as writer:
+                writer.write_section('closed', closed_rows(self.closed), 'sheet')
+            table = pyarrow.parquet.read_table(output_file)
+            self.assertEqual(table.column('cost').to_pylist(), ['1/3'])
+            self.assertEqual(table.column('units').to_pylist(), ['1/7'])
+            with open_report('parquet', output_file, decimal_numeric(places=8, unit_places=4)) as writer:
+                writer.write_section('remaining', remaining_rows(self.remaining), 'sheet', 'as of 2020-01-01', (None, datetime.date(2020, 1, 1)))
+            table = pyarrow.parquet.read_table(output_file)
+        self.assertEqual(table.column('cost').to_pylist(), [Decimal('1.1')])
+        self.assertEqual(table.column('units').to_pylist(), [Decimal('2')])
+        self.assertEqual(table.column('period_end').to_pylist(), [datetime.date(2020, 1, 1)])
+
+    def test_columnar_types(self):
+        pyarrow = mock.MagicMock()
+        pyarrow.decimal128.side_effect = lambda precision, scale : ('decimal128', precision, scale)
+        modules = {'pyarrow' : pyarrow, 'pyarrow.ipc' : pyarrow.ipc, 'pyarrow.parquet' : pyarrow.parquet}
+        for (numeric, section, rows, money_type, unit_type, cost, payment, units) in (
+                (None, 'closed', closed_rows(self.closed), pyarrow.string.return_value, pyarrow.string.return_value, '1/3', '2', '1/7'),
+                (decimal_numeric(places=8, unit_places=4), 'remaining', remaining_rows(self.remaining), ('decimal128', 38, 8),
+                 ('decimal128', 38, 4), Decimal('1.10000000'), None, Decimal('2'))):
+            pyarrow.reset_mock()
+            with mock.patch.dict(sys.modules, modules), open_report('arrow', 'report.arrow', numeric) as writer:
+                writer.write_section(section, rows, 'sheet', 'as of 2020-01-01', (None, datetime.date(2020, 1, 1)))
+            schema = dict(pyarrow.schema.call_args.args[0])
+            self.assertEqual(schema['cost'], money_type)
+            self.assertEqual(schema['units'], unit_type)
+            self.assertIs(schema['fund'], pyarrow.string.return_value)
+            self.assertIs(schema['period_end'], pyarrow.date32.return_value)
+            arrays = {column : call.args for (column, call) in zip(schema, pyarrow.array.call_args_list)}
+            self.assertEqual(arrays['cost'], ([cost], money_type))
+            self.assertEqual(arrays['payment'], ([payment], money_type))
+            self.assertEqual(arrays['units'], ([units], unit_type))
+            self.assertEqual(arrays['period_end'], ([datetime.date(2020, 1, 1)], pyarrow.date32.return_value))
+            pyarrow.ipc.new_file.return_value.write_table.assert_called_once()
+            pyarrow.ipc.new_file.return_value.close.assert_called_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from service import portfolio_service
+from synthetic_portfolio import row, synthetic_rows, write_csv
+
+class test_service(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.service = portfolio_service(jobs=1)
+        self.rows = [row(1, 'Buy', 'A', '1', 10.0, 100.0, rate=4.0), row(2, 'Sell', 'A', '1', 4.0, 60.0, rate=4.0)]
+
+    def tearDown(self):
+        self.service.close()
+
+    async def test_apply_and_query(self):
+        response = await self.service.handle({'id' : 1, 'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows})
+        self.assertEqual(response, {'id' : 1, 'ok' : True, 'result' : {'applied' : 2}})
+        response = await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows})
+        self.assertEqual(response['result'], {'applied' : 0})
+        response = await self.service.handle({'op' : 'aggregates', 'portfolio' : 'p'})
+        self.assertEqual(response['result']['remaining'], [[['A', '1'], ['60', '240', '6']]])
+        self.assertEqual(response['result']['closed'], [[['A', '1', '2'], ['40', '160', '60', '240', '4']]])
+        response = await self.service.handle({'op' : 'as_of', 'portfolio' : 'p', 'date' : '2019-01-01'})
+        self.assertEqual(response['result'], {'remaining' : [], 'closed' : []})
+
+    async def test_preview(self):
+        await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows})
+        response = await self.service.handle({'op' : 'preview', 'portfolio' : 'p',
+                                              'transactions' : [row(3, 'Sell', 'A', '1', 3.0, 60.0, rate=5.0)]})
+        self.assertEqual(response['result'], {'closed' : [[['A', '1', '3'], ['30', '120', '60', '300', '3']]],
+                                              'consumed' : {'3' : [['1', '3', '30', '120']]}})
+        response = await self.service.handle({'op' : 'aggregates', 'portfolio' : 'p'})
+        self.assertEqual(response['result']['remaining'], [[['A', '1'], ['60', '240', '6']]])
+
+    async def test_spilled_portfolios(self):
+        with tempfile.TemporaryDirectory() as directory:
+            service = portfolio_service(jobs=1, spill_directory=directory, memory_budget=1)
+            await service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows})
+            await service.handle({'op' : 'apply', 'portfolio' : 'q', 'transactions' : self.rows[:1]})
+            statistics = await service.handle({'op' : 'statistics'})
+            self.assertEqual(statistics['result']['resident'], [])
+            self.assertEqual(statistics['result']['counters']['pool.evictions'], 2)
+            response = await service.handle({'op' : 'aggregates', 'portfolio' : 'p'})
+            self.assertEqual(response['result']['closed'], [[['A', '1', '2'], ['40', '160', '60', '240', '4']]])
+            response = await service.handle({'op' : 'portfolios'})
+            self.assertEqual(sorted(response['result']['portfolios']), ['p', 'q'])
+            service.close()
+
+    async def test_rejected_apply_keeps_portfolio(self):
+        await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows[:1]})
+        response = await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : [row(2, 'Sell', 'A', '1', 11.0, 60.0, rate=4.0)]})
+        self.assertFalse(response['ok'])
+        response = await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows})
+        self.assertEqual(response['result'], {'applied' : 1})
+        response = await self.service.handle({'op' : 'aggregates', 'portfolio' : 'p'})
+        self.assertEqual(response['result']['remaining'], [[['A', '1'], ['60', '240', '6']]])
+
+    async def test_errors(self):
+        response = await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : [row(1, 'Sell', 'A', '1', 1.0, 1.0)]})
+        self.assertFalse(response['ok'])
+        response = await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : [row(1, 'Buy', 5, '1', 1.0, 1.0, rate=1.0)]})
+        self.assertFalse(response['ok'])
+        self.assertTrue(response['error'].startswith('AttributeError'))
+        response = await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : 5})
+        self.assertFalse(response['ok'])
+        response = await self.service.handle({'op' : 'unknown'})
+        self.assertFalse(response['ok'])
+
+    async def test_socket_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            server = await self.service.start(os.path.join(directory, 'service.sock'))
+            async with server:
+                (reader, writer) = await asyncio.open_unix_connection(os.path.join(directory, 'service.sock'))
+                for request in ({'op' : 'apply', 'portfolio' : 'p', 'transactions' : self.rows}, {'op' : 'portfolios'}):
+                    writer.write(json.dumps(request).encode() + b'\n')
+                await writer.drain()
+                self.assertTrue(json.loads(await reader.readline())['ok'])
+                self.assertEqual(json.loads(await reader.readline())['result'], {'portfolios' : ['p']})
+                writer.close()
+                await writer.wait_closed()
+
+    async def test_non_object_requests(self):
+        for request in ([1], 'x', None):
+            response = await self.service.handle(request)
+            self.assertEqual((response['id'], response['ok']), (None, False))
+            self.assertTrue(response['error'].startswith('ValueError'))
+        with tempfile.TemporaryDirectory() as directory:
+            server = await self.service.start(os.path.join(directory, 'service.sock'))
+            async with server:
+                (reader, writer) = await asyncio.open_unix_connection(os.path.join(directory, 'service.sock'))
+                writer.write(b'[1]\n"x"\nnull\n' + json.dumps({'id' : 4, 'op' : 'portfolios'}).encode() + b'\n')
+                await writer.drain()
+                for _ in range(3):
+                    self.assertFalse(json.loads(await reader.readline())['ok'])
+                self.assertEqual(json.loads(await reader.readline()), {'id' : 4, 'result' : {'portfolios' : []}, 'ok' : True})
+                writer.close()
+                await writer.wait_closed()
+
+    async def test_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spreadsheet_file = os.path.join(directory, 'portfolio.csv')
+            rows = list(synthetic_rows(seed=2, registers=2, lots_per_register=10))
+            write_csv(spreadsheet_file, rows)
+            replayed = await self.service.handle({'op' : 'replay', 'portfolio' : 'r', 'spreadsheet' : spreadsheet_file})
+            self.assertTrue(replayed['ok'], replayed)
+            await self.service.handle({'op' : 'apply', 'portfolio' : 'p', 'transactions' : rows})
+            first = await self.service.handle({'op' : 'aggregates', 'portfolio' : 'r'})
+            second = await self.service.handle({'op' : 'aggregates', 'portfolio' : 'p'})
+            self.assertEqual(first['result'], second['result'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric
+from sqlite_lot_store import sqlite_lot_store, stale_lot_database
+from cost_base import load_sheet_state
+from synthetic_portfolio import synthetic_rows
+from transaction_row import fifo_fund_rows
+
+class test_sqlite_lot_store(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.batch = fifo_fund_rows(fraction_numeric(), list(synthetic_rows(seed=11, registers=4, lots_per_register=40, conversion_depth=2)))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_matches_memory_store(self):
+        for method in ('fifo', 'lifo'):
+            store = sqlite_lot_store(os.path.join(self.directory.name, f'{method}.sqlite'), method)
+            engine = fifo_transaction_engine(method=method, payments=store)
+            engine.apply_batch(self.batch)
+            expected = fifo_transaction_engine(method=method)
+            expected.apply_batch(self.batch)
+            self.assertEqual(list(engine.closed_transactions.items()), list(expected.closed_transactions.items()), method)
+            self.assertEqual(list(engine.remaining_funds.items()), list(expected.remaining_funds.items()), method)
+            self.assertEqual(engine.remaining_units, expected.remaining_units, method)
+            self.assertEqual(engine.closed_units, expected.closed_units, method)
+            store.disconnect()
+
+    def test_snapshot_reconnects(self):
+        store = sqlite_lot_store(os.path.join(self.directory.name, 'lots.sqlite'))
+        engine = fifo_transaction_engine(payments=store)
+        engine.apply_batch(self.batch[:len(self.batch) // 2])
+        state_file = os.path.join(self.directory.name, 'engine.state')
+        engine.save(state_file)
+        store.disconnect()
+        engine = fifo_transaction_engine.load(state_file)
+        engine.apply_batch(self.batch[len(self.batch) // 2:])
+        expected = fifo_transaction_engine()
+        expected.apply_batch(self.batch)
+        self.assertEqual(engine.aggregates, expected.aggregates)
+
+    def test_stale_database_is_detected(self):
+        store = sqlite_lot_store(os.path.join(self.directory.name, 'lots.sqlite'))
+        engine = fifo_transaction_engine(payments=store)
+        engine.apply_batch(self.batch[:len(self.batch) // 2])
+        state_file = os.path.join(self.directory.name, 'engine.state')
+        engine.save(state_file)
+        store.disconnect()
+        self.assertIsNotNone(load_sheet_state(state_file))
+        engine = fifo_transaction_engine.load(state_file)
+        engine.apply_batch(self.batch[len(self.batch) // 2:])
+        engine.save(os.path.join(self.directory.name, 'newer.state'))
+        with self.assertRaises(stale_lot_database):
+            fifo_transaction_engine.load(state_file)
+        self.assertIsNone(load_sheet_state(state_file))
+
+    def test_uncommitted_changes_are_discarded(self):
+        database_file = os.path.join(self.directory.name, 'lots.sqlite')
+        store = sqlite_lot_store(database_file)
+        engine = fifo_transaction_engine(payments=store)
+        engine.apply_batch(self.batch[:10])
+        state_file = os.path.join(self.directory.name, 'engine.state')
+        engine.save(state_file)
+        engine.apply_batch(self.batch[10:])
+        del engine, store
+        engine = fifo_transaction_engine.load(state_file)
+        expected = fifo_transaction_engine()
+        expected.apply_batch(self.batch[:10])
+        self.assertEqual(engine.remaining_units, expected.remaining_units)
+
+    def test_transactions_and_lineage_live_in_database(self):
+        store = sqlite_lot_store(os.path.join(self.directory.name, 'lots.sqlite'))
+        engine = fifo_transaction_engine(payments=store)
+        engine.apply_batch(self.batch[:len(self.batch) // 2])
+        state_file = os.path.join(self.directory.name, 'engine.state')
+        engine.save(state_file)
+        store.disconnect()
+        with gzip.open(state_file, 'rt') as stream:
+            record = json.load(stream)
+        self.assertEqual((record['transactions'], record['lineage']), (None, None))
+        engine = fifo_transaction_engine.load(state_file)
+        engine.apply_batch(self.batch[len(self.batch) // 2:])
+        expected = fifo_transaction_engine()
+        expected.apply_batch(self.batch)
+        self.assertEqual(set(engine.lineage.edges()), set(expected.lineage.edges()))
+        numbers = [transaction[9] if transaction[0] == 'Conversion' else transaction[7] for transaction in self.batch]
+        for number in numbers[-20:]:
+            self.assertEqual(engine.lineage.ancestors(number), expected.lineage.ancestors(number))
+            self.assertEqual(engine.lineage.origins(number), expected.lineage.origins(number))
+            self.assertEqual(engine.lineage.component(number), expected.lineage.component(number))
+        self.assertTrue(all(map(engine.has_transaction, numbers)))
+        self.assertFalse(engine.has_transaction('missing'))
+
+    def test_unsupported_method(self):
+        with self.assertRaises(ValueError):
+            sqlite_lot_store(os.path.join(self.directory.name, 'lots.sqlite'), 'hifo')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+from fifo_transaction_engine import fifo_transaction_engine
+from transaction_row import Field, fifo_fund_transactions
+from synthetic_portfolio import synthetic_rows
+
+class test_synthetic_portfolio(unittest.TestCase):
+
+    def test_seeded_rows_are_reproducible(self):
+        first = list(synthetic_rows(seed=7, registers=3, lots_per_register=20, conversion_depth=2))
+        second = list(synthetic_rows(seed=7, registers=3, lots_per_register=20, conversion_depth=2))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, list(synthetic_rows(seed=8, registers=3, lots_per_register=20, conversion_depth=2)))
+        self.assertTrue(all([len(row) == len(Field) for row in first]))
+        self.assertEqual({row[Field.operation] for row in first}, {'Buy', 'Conversion', 'Sell'})
+
+    def test_rows_replay_through_engine(self):
+        for partial_fill_ratio in (0.0, 1.0):
+            rows = list(synthetic_rows(seed=1, registers=4, lots_per_register=50, partial_fill_ratio=partial_fill_ratio, conversion_depth=3))
+            engine = fifo_transaction_engine()
+            fifo_fund_transactions(engine, rows)
+            sells = [row for row in rows if row[Field.operation] == 'Sell']
+            self.assertEqual(len({key[2] for key in engine.closed_transactions}), len(sells))
+
+if __name__ == '__main__':
+    unittest.main()
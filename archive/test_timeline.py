@@ -0,0 +1,67 @@
+import datetime
+import unittest
+from fractions import Fraction
+from fifo_transaction_engine import fifo_transaction_engine
+from numeric import fraction_numeric
+from synthetic_portfolio import synthetic_rows
+from timeline import transaction_timeline
+from transaction_row import fifo_fund_rows
+
+class test_timeline(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = fifo_fund_rows(fraction_numeric(), list(synthetic_rows(seed=5, registers=3, lots_per_register=40)))
+        self.engine = fifo_transaction_engine(timeline=transaction_timeline(checkpoint_interval=7))
+        self.engine.apply_batch(self.batch)
+
+    def replay(self, start, end):
+        engine = fifo_transaction_engine()
+        engine.apply_batch([transaction for transaction in self.batch if start <= transaction[-1] <= end])
+        return engine.aggregates
+
+    def test_as_of_matches_replay(self):
+        first = self.batch[0][-1]
+        last = self.batch[-1][-1]
+        for days in (0, 1, 2, 3, (last - first).days):
+            date = first + datetime.timedelta(days=days)
+            self.assertEqual(self.engine.as_of(date), self.replay(first, date))
+        self.assertEqual(self.engine.as_of(first - datetime.timedelta(days=1)), ({}, {}))
+
+    def test_realized_between(self):
+        first = self.batch[0][-1]
+        (start, end) = (first + datetime.timedelta(days=1), first + datetime.timedelta(days=2))
+        realized = self.engine.realized_between(start, end)
+        closed_until_end = self.engine.as_of(end)[1]
+        closed_before_start = self.engine.as_of(start - datetime.timedelta(days=1))[1]
+        self.assertEqual(realized, {key : value for (key, value) in closed_until_end.items() if key not in closed_before_start})
+
+    def test_out_of_order_record(self):
+        timeline = transaction_timeline(checkpoint_interval=1)
+        timeline.record(datetime.date(2020, 1, 3), [(('A', '1'), (Fraction(3), Fraction(3), Fraction(1)))], ())
+        timeline.record(datetime.date(2020, 1, 1), [(('A', '1'), (Fraction(1), Fraction(1), Fraction(1)))], ())
+        self.assertEqual(timeline.as_of(datetime.date(2020, 1, 2)), ({('A', '1') : (1, 1, 1)}, {}))
+        self.assertEqual(timeline.as_of(datetime.date(2020, 1, 3)), ({('A', '1') : (4, 4, 2)}, {}))
+
+    def test_undated_rows_follow_the_previous_row(self):
+        engine = fifo_transaction_engine(timeline=transaction_timeline())
+        (first, second) = (datetime.date(2020, 1, 1), datetime.date(2020, 1, 3))
+        engine.apply_batch([
+            ('Buy', 'A', '1', Fraction(10), Fraction(0), Fraction(1), Fraction(1), 'in 0'),
+            ('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(1), 'in 1', first),
+            ('Buy', 'A', '1', Fraction(50), Fraction(0), Fraction(5), Fraction(1), 'in 2', None),
+            ('Sell', 'A', '1', Fraction(80), Fraction(0), Fraction(8), Fraction(1), 'out 1', None),
+            ('Sell', 'A', '1', Fraction(80), Fraction(0), Fraction(8), Fraction(1), 'out 2', second),
+        ])
+        self.assertEqual(engine.as_of(first - datetime.timedelta(days=1))[0], {('A', '1') : (Fraction(10), Fraction(10), Fraction(1))})
+        (remaining, closed) = engine.as_of(first)
+        self.assertEqual(remaining, {('A', '1') : (Fraction(80), Fraction(80), Fraction(8))})
+        self.assertEqual(set(closed), {('A', '1', 'out 1')})
+        self.assertEqual(engine.as_of(second), engine.aggregates)
+        self.assertEqual(set(engine.realized_between(first, first)), {('A', '1', 'out 1')})
+
+    def test_disabled(self):
+        with self.assertRaises(ValueError):
+            fifo_transaction_engine().as_of(datetime.date(2020, 1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
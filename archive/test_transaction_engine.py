@@ -1,6 +1,10 @@
+import os
+import tempfile
 from unittest import TestCase
 from fractions import Fraction
-from fifo_transaction_engine import fifo_transaction_engine
+from decimal import Decimal, ROUND_HALF_UP
+from fifo_transaction_engine import fifo_transaction_engine, state_version
+from numeric import decimal_numeric
 
 
 class TestTransaction_engine(TestCase):
@@ -168,3 +172,240 @@ class TestTransaction_engine(TestCase):
         self.check_closed_unit(closed_units[1], 'A', '1', 'transaction out', Fraction(1), Fraction(15), Fraction(1), Fraction(20), Fraction(2))
         self.check_closed_unit(closed_units[2], 'A', '1', 'transaction out', Fraction(1), Fraction(5), Fraction(1), Fraction(20), Fraction(2))
 
+
+    def test_repeated_withdrawals_keep_closed_history_order(self):
+        engine = fifo_transaction_engine()
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(1), 'in 1')
+        engine.add_payment('A', '1', Fraction(60), Fraction(0), Fraction(5), Fraction(1), 'in 2')
+        engine.add_withdrawal('A', '1', Fraction(40), Fraction(0), Fraction(4), Fraction(2), 'out 1')
+        engine.add_withdrawal('A', '1', Fraction(90), Fraction(0), Fraction(9), Fraction(2), 'out 2')
+        closed_units = engine.closed_units
+        remaining_units = engine.remaining_units
+
+        self.assertEqual(len(closed_units), 3)
+        self.check_closed_unit(closed_units[0], 'A', '1', 'out 1', Fraction(4), Fraction(40), Fraction(1), Fraction(40), Fraction(2))
+        self.check_closed_unit(closed_units[1], 'A', '1', 'out 2', Fraction(6), Fraction(60), Fraction(1), Fraction(60), Fraction(2))
+        self.check_closed_unit(closed_units[2], 'A', '1', 'out 2', Fraction(3), Fraction(36), Fraction(1), Fraction(30), Fraction(2))
+        self.assertEqual(len(remaining_units), 1)
+        self.check_remaining_unit(remaining_units[0], 'A', '1', Fraction(24), Fraction(1), Fraction(2))
+
+    def test_aggregates_match_lot_totals(self):
+        engine = fifo_transaction_engine()
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(3, 2), 'in 1')
+        engine.add_payment('B', '2', Fraction(50), Fraction(1), Fraction(5), Fraction(2), 'in 2')
+        engine.add_conversion('A', '1', Fraction(4), 'B', '2', Fraction(3), Fraction(0), Fraction(2), 'conv 1')
+        engine.add_withdrawal('B', '2', Fraction(70), Fraction(0), Fraction(7), Fraction(5, 4), 'out 1')
+        engine.add_withdrawal('A', '1', Fraction(90), Fraction(0), Fraction(6), Fraction(5, 4), 'out 2')
+
+        expected_closed = {}
+        for (key, value) in engine.closed_units:
+            expected_closed[key] = tuple(x + y for x, y in zip(value, expected_closed.get(key, (0,) * len(value))))
+        expected_remaining = {}
+        for (key, value) in engine.remaining_units:
+            expected_remaining[key] = tuple(x + y for x, y in zip(value, expected_remaining.get(key, (0,) * len(value))))
+
+        (remaining_funds, closed_transactions) = engine.aggregates
+        self.assertEqual(closed_transactions, expected_closed)
+        self.assertEqual(remaining_funds, expected_remaining)
+        self.assertEqual(list(remaining_funds.keys()), [('B', '2')])
+
+    def test_decimal_backend(self):
+        numeric = decimal_numeric(places=2, rounding=ROUND_HALF_UP)
+        engine = fifo_transaction_engine(numeric)
+        engine.add_payment('A', '1', Decimal('100.00'), Decimal('0'), Decimal('3'), Decimal('1.5'), 'in 1')
+        engine.add_withdrawal('A', '1', Decimal('50.00'), Decimal('0'), Decimal('1'), Decimal('2'), 'out 1')
+        (cost, cost_in_local_currency, payment, payment_in_local_currency, units) = engine.closed_transactions[('A', '1', 'out 1')]
+        self.assertIsInstance(cost, Decimal)
+        self.assertEqual(cost, Decimal('33.33'))
+        self.assertEqual(payment, Decimal('50.00'))
+        self.assertEqual(payment_in_local_currency, Decimal('100.00'))
+        self.assertEqual(units, Decimal('1'))
+        (cost, cost_in_local_currency, units) = engine.remaining_funds[('A', '1')]
+        self.assertEqual(units, Decimal('2'))
+        with self.assertRaises(AssertionError):
+            engine.add_payment('A', '1', Fraction(1), Fraction(0), Fraction(1), Fraction(1), 'in 2')
+
+    def test_decimal_shares_keep_the_remainder(self):
+        numeric = decimal_numeric(places=2, rounding=ROUND_HALF_UP)
+        buys = [('Buy', 'A', '1', Decimal('10.00'), Decimal('0'), Decimal('1'), Decimal('1.00'), f'in {i}') for i in range(3)]
+        engine = fifo_transaction_engine(numeric)
+        engine.apply_batch(buys + [('Sell', 'A', '1', Decimal('10.00'), Decimal('0'), Decimal('3'), Decimal('1.00'), 'out 1')])
+        self.assertEqual(sum(value[2] for value in engine.closed_transactions.values()), Decimal('10.00'))
+        self.assertEqual(sum(value[2] for (key, value) in engine.closed_units), Decimal('10.00'))
+        engine = fifo_transaction_engine(numeric)
+        engine.apply_batch(buys + [('Conversion', 'A', '1', Decimal('3'), 'B', '1', Decimal('1'), Decimal('0'), Decimal('1.00'), 'conv 1')])
+        self.assertEqual(sum(value[2] for (key, value) in engine.remaining_units), Decimal('1'))
+        self.assertEqual(engine.remaining_funds[('B', '1')][2], Decimal('1'))
+        engine.add_withdrawal('B', '1', Decimal('12.00'), Decimal('0'), Decimal('1'), Decimal('1.00'), 'out 2')
+        self.assertEqual(engine.remaining_units, [])
+        (closed_transactions, consumed_lots) = fifo_transaction_engine(numeric).preview(
+            buys + [('Sell', 'A', '1', Decimal('10.00'), Decimal('0'), Decimal('3'), Decimal('1.00'), 'out 1')])
+        self.assertEqual(sum(value[2] for value in closed_transactions.values()), Decimal('10.00'))
+
+    def test_decimal_products_follow_places(self):
+        numeric = decimal_numeric(places=2, rounding=ROUND_HALF_UP)
+        engine = fifo_transaction_engine(numeric, method='average')
+        engine.add_payment('A', '1', Decimal('10.00'), Decimal('0'), Decimal('1'), Decimal('1.00'), 'in 1')
+        engine.add_payment('A', '1', Decimal('20.00'), Decimal('0'), Decimal('1'), Decimal('2.00'), 'in 2')
+        engine.add_withdrawal('A', '1', Decimal('20.00'), Decimal('0'), Decimal('1'), Decimal('1.3333'), 'out 1')
+        closed = engine.closed_transactions[('A', '1', 'out 1')]
+        self.assertEqual(closed, (Decimal('15.00'), Decimal('25.00'), Decimal('20.00'), Decimal('26.67'), Decimal('1')))
+        self.assertEqual(engine.remaining_funds[('A', '1')], (Decimal('15.00'), Decimal('25.00'), Decimal('1')))
+        self.assertEqual(engine.remaining_units, [(('A', '1'), (Decimal('15.00'), Decimal('25.00'), Decimal('1')))])
+        self.assertTrue(all(value.as_tuple().exponent >= -2 for value in closed))
+        engine = fifo_transaction_engine(numeric)
+        engine.add_payment('A', '1', Decimal('100.00'), Decimal('0'), Decimal('3'), Decimal('1.5'), 'in 1')
+        engine.add_withdrawal('A', '1', Decimal('50.00'), Decimal('0'), Decimal('1'), Decimal('2'), 'out 1')
+        self.assertEqual(engine.remaining_units, [(('A', '1'), (Decimal('66.67'), Decimal('100.00'), Decimal('2')))])
+        self.assertEqual(engine.remaining_funds[('A', '1')], (Decimal('66.67'), Decimal('100.00'), Decimal('2')))
+        engine = fifo_transaction_engine(decimal_numeric(places=2, rounding=ROUND_HALF_UP, unit_places=4))
+        engine.add_payment('A', '1', Decimal('10.00'), Decimal('0'), Decimal('1'), Decimal('1.00'), 'in 1')
+        engine.add_payment('A', '1', Decimal('20.00'), Decimal('0'), Decimal('2'), Decimal('1.00'), 'in 2')
+        engine.add_conversion('A', '1', Decimal('3'), 'B', '1', Decimal('1'), Decimal('0'), Decimal('1.00'), 'swap 1')
+        self.assertEqual([value[2] for (_, value) in engine.remaining_units], [Decimal('0.3333'), Decimal('0.6667')])
+
+    def test_decimal_aggregates_match_lot_totals(self):
+        from lot_store import lot_methods
+        from synthetic_portfolio import synthetic_rows
+        from transaction_row import fifo_fund_rows
+        rows = list(synthetic_rows(seed=7, registers=4, lots_per_register=40, conversion_depth=2))
+        for method in lot_methods:
+            engine = fifo_transaction_engine(decimal_numeric(places=2, rounding=ROUND_HALF_UP), method=method)
+            engine.apply_batch(fifo_fund_rows(engine.numeric, rows))
+            remaining = {}
+            for (key, value) in engine.remaining_units:
+                remaining[key] = tuple(x + y for x, y in zip(value, remaining.get(key, (0,) * len(value))))
+            closed = {}
+            for (key, value) in engine.closed_units:
+                closed[key] = tuple(x + y for x, y in zip(value, closed.get(key, (0,) * len(value))))
+            self.assertEqual(engine.remaining_funds, remaining, method)
+            self.assertEqual(engine.closed_transactions, closed, method)
+
+    def test_save_and_load_state(self):
+        engine = fifo_transaction_engine()
+        engine.add_payment('A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(3, 2), 'in 1')
+        engine.add_conversion('A', '1', Fraction(4), 'B', '2', Fraction(3), Fraction(0), Fraction(2), 'conv 1')
+        engine.add_withdrawal('A', '1', Fraction(30), Fraction(0), Fraction(2), Fraction(2), 'out 1')
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = os.path.join(directory, 'engine.state')
+            engine.save(state_file)
+            restored = fifo_transaction_engine.load(state_file)
+        self.assertTrue(restored.has_transaction('conv 1'))
+        self.assertFalse(restored.has_transaction('out 2'))
+        self.assertEqual(restored.closed_units, engine.closed_units)
+        self.assertEqual(restored.aggregates, engine.aggregates)
+        restored.add_withdrawal('B', '2', Fraction(30), Fraction(0), Fraction(3), Fraction(2), 'out 2')
+        self.assertEqual(list(restored.remaining_funds.keys()), [('A', '1')])
+        self.assertEqual(restored.remaining_funds[('A', '1')][2], Fraction(4))
+
+    def test_state_is_a_versioned_record(self):
+        import datetime
+        import gzip
+        import json
+        from lot_store import lot_methods
+        from timeline import transaction_timeline
+        from rates import rate_table
+        from diagram import diagram_recorder
+        day = datetime.date(2020, 1, 1)
+        for numeric in (None, decimal_numeric(4, ROUND_HALF_UP)):
+            number = Fraction if numeric is None else Decimal
+            for method in lot_methods:
+                engine = fifo_transaction_engine(numeric, diagram_recorder(), method=method, timeline=transaction_timeline(2),
+                                                 rates=rate_table([(day, number(2))]))
+                engine.apply_batch([
+                    ('Buy', 'A', '1', number(100), number(0), number(10), None, 'in 1', day),
+                    ('Buy', 'A', '1', number(90), number(0), number(6), number(3), 'in 2', day + datetime.timedelta(days=1)),
+                    ('Conversion', 'A', '1', number(12), 'B', '2', number(3), number(0), number(2), 'conv 1', day + datetime.timedelta(days=2)),
+                    ('Sell', 'A', '1', number(30), number(0), number(2), number(2), 'out 1', day + datetime.timedelta(days=3)),
+                ])
+                with tempfile.TemporaryDirectory() as directory:
+                    state_file = os.path.join(directory, 'engine.state')
+                    engine.save(state_file)
+                    with gzip.open(state_file, 'rt') as stream:
+                        self.assertEqual(json.load(stream)['version'], state_version)
+                    restored = fifo_transaction_engine.load(state_file)
+                self.assertEqual(restored.numeric.to_record(), engine.numeric.to_record(), method)
+                self.assertEqual(restored.method, method)
+                self.assertEqual(restored.remaining_units, engine.remaining_units, method)
+                self.assertEqual(restored.closed_units, engine.closed_units, method)
+                self.assertEqual(restored.aggregates, engine.aggregates, method)
+                self.assertEqual(list(restored.lineage.edges()), list(engine.lineage.edges()), method)
+                self.assertEqual(restored.as_of(day + datetime.timedelta(days=2)), engine.as_of(day + datetime.timedelta(days=2)), method)
+                self.assertEqual(restored.observer.edges, engine.observer.edges, method)
+                self.assertEqual(restored.observer.build().source, engine.observer.build().source, method)
+                for target in (engine, restored):
+                    target.apply_batch([('Buy', 'B', '2', number(10), number(0), number(1), None, 'in 3', day),
+                                        ('Sell', 'B', '2', number(50), number(0), number(4), number(2), 'out 2')])
+                self.assertEqual(restored.aggregates, engine.aggregates, method)
+                self.assertEqual(list(restored.lineage.edges()), list(engine.lineage.edges()), method)
+
+    def test_load_rejects_pickled_state(self):
+        import pickle
+        with tempfile.TemporaryDirectory() as directory:
+            state_file = os.path.join(directory, 'engine.state')
+            with open(state_file, 'wb') as stream:
+                pickle.dump((5, fifo_transaction_engine()), stream)
+            with self.assertRaises(ValueError):
+                fifo_transaction_engine.load(state_file)
+
+    def test_apply_batch_matches_single_calls(self):
+        engine = fifo_transaction_engine()
+        engine.add_payment('A', '1', Fraction(100), Fraction(1), Fraction(10), Fraction(3, 2), 'in 1')
+        engine.add_payment('A', '1', Fraction(50), Fraction(1), Fraction(4), Fraction(3, 2), 'in 2')
+        engine.add_conversion('A', '1', Fraction(12), 'B', '2', Fraction(6), Fraction(0), Fraction(2), 'conv 1')
+        engine.add_withdrawal('B', '2', Fraction(70), Fraction(0), Fraction(5), Fraction(5, 4), 'out 1')
+
+        batched = fifo_transaction_engine()
+        batched.apply_batch([
+            ('Buy', 'A', '1', Fraction(100), Fraction(1), Fraction(10), Fraction(3, 2), 'in 1'),
+            ('Buy', 'A', '1', Fraction(50), Fraction(1), Fraction(4), Fraction(3, 2), 'in 2'),
+            ('Conversion', 'A', '1', Fraction(12), 'B', '2', Fraction(6), Fraction(0), Fraction(2), 'conv 1'),
+            ('Sell', 'B', '2', Fraction(70), Fraction(0), Fraction(5), Fraction(5, 4), 'out 1'),
+        ])
+        self.assertEqual(batched.closed_units, engine.closed_units)
+        self.assertEqual(batched.remaining_units, engine.remaining_units)
+        self.assertEqual(batched.aggregates, engine.aggregates)
+
+    def test_apply_batch_validates_before_applying(self):
+        engine = fifo_transaction_engine()
+        with self.assertRaises(AssertionError):
+            engine.apply_batch([
+                ('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(1), 'in 1'),
+                ('Sell', 'A', '1', 20.0, Fraction(0), Fraction(2), Fraction(1), 'out 1'),
+            ])
+        with self.assertRaises(ValueError):
+            engine.apply_batch([('Transfer', 'A', '1')])
+        self.assertEqual(engine.remaining_units, [])
+        self.assertFalse(engine.has_transaction('in 1'))
+
+    def test_rejected_batch_keeps_engine_consistent(self):
+        engine = fifo_transaction_engine()
+        engine.apply_batch([('Buy', 'A', '1', Fraction(100), Fraction(0), Fraction(10), Fraction(4), 'in 1')])
+        with self.assertRaises(ValueError):
+            engine.apply_batch([('Sell', 'A', '1', Fraction(40), Fraction(0), Fraction(4), Fraction(4), 'out 1'),
+                                ('Sell', 'A', '1', Fraction(1000), Fraction(0), Fraction(100), Fraction(4), 'out 2')])
+        with self.assertRaises(ValueError):
+            engine.add_withdrawal('A', '1', Fraction(1000), Fraction(0), Fraction(100), Fraction(4), 'out 3')
+        with self.assertRaises(ValueError):
+            engine.add_conversion('A', '1', Fraction(11), 'B', '1', Fraction(11), Fraction(0), Fraction(4), 'conv 1')
+        self.assertFalse(engine.has_transaction('out 1'))
+        self.assertEqual(engine.remaining_units, [(('A', '1'), (Fraction(100), Fraction(400), Fraction(10)))])
+        self.assertEqual(engine.remaining_funds, {('A', '1') : (Fraction(100), Fraction(400), Fraction(10))})
+        engine.apply_batch([('Conversion', 'A', '1', Fraction(4), 'B', '1', Fraction(8), Fraction(0), Fraction(4), 'conv 2'),
+                            ('Sell', 'B', '1', Fraction(80), Fraction(0), Fraction(8), Fraction(4), 'out 4'),
+                            ('Sell', 'A', '1', Fraction(60), Fraction(0), Fraction(6), Fraction(4), 'out 5')])
+        self.assertEqual(engine.remaining_funds, {})
+        self.assertEqual(engine.closed_transactions[('A', '1', 'out 5')], (Fraction(60), Fraction(240), Fraction(60), Fraction(240), Fraction(6)))
+
+    def test_decimal_batch_check_matches_applied_conversions(self):
+        engine = fifo_transaction_engine(decimal_numeric(places=2, rounding=ROUND_HALF_UP, unit_places=2))
+        engine.apply_batch([('Buy', 'A', '1', Decimal('10.00'), Decimal('0'), Decimal('1'), Decimal('1.00'), f'in {i}') for i in range(3)])
+        with self.assertRaises(ValueError):
+            engine.apply_batch([('Conversion', 'A', '1', Decimal('3'), 'B', '1', Decimal('1'), Decimal('0'), Decimal('1.00'), 'conv 1'),
+                                ('Sell', 'B', '1', Decimal('12.00'), Decimal('0'), Decimal('1.01'), Decimal('1.00'), 'out 1')])
+        self.assertFalse(engine.has_transaction('conv 1'))
+        self.assertEqual(engine.remaining_funds, {('A', '1') : (Decimal('30.00'), Decimal('30.00'), Decimal('3'))})
+        engine.apply_batch([('Conversion', 'A', '1', Decimal('3'), 'B', '1', Decimal('1'), Decimal('0'), Decimal('1.00'), 'conv 1'),
+                            ('Sell', 'B', '1', Decimal('12.00'), Decimal('0'), Decimal('1'), Decimal('1.00'), 'out 1')])
+        self.assertEqual(engine.remaining_funds, {})
+        self.assertEqual(sum(value[4] for value in engine.closed_transactions.values()), Decimal('1'))
@@ -0,0 +1,44 @@
+import datetime
+import unittest
+from decimal import Decimal
+from numeric import fraction_numeric, decimal_numeric
+from synthetic_portfolio import synthetic_rows, row
+from transaction_row import fifo_fund_row, fifo_fund_rows, parse_date
+
+class test_transaction_row(unittest.TestCase):
+
+    def test_columnar_matches_row_parsing(self):
+        rows = list(synthetic_rows(seed=3, registers=4, lots_per_register=30))
+        for numeric in (fraction_numeric(), decimal_numeric(places=6)):
+            self.assertEqual(fifo_fund_rows(numeric, rows), [fifo_fund_row(numeric, values) for values in rows])
+
+    def test_interned_names(self):
+        rows = [row(1, 'Buy', ' fund ', 'register', 1.5, 10.0), row(2, 'Sell', 'fund', ' register', 1.5, 12.0)]
+        (buy, sell) = fifo_fund_rows(decimal_numeric(places=2), rows)
+        self.assertIs(buy[1], sell[1])
+        self.assertIs(buy[2], sell[2])
+        self.assertEqual(buy[3], Decimal('10.00'))
+
+    def test_units_and_rates_keep_unit_places(self):
+        rows = [row(1, 'Buy', 'fund', 'register', 0.333333, 10.005, rate=4.0211),
+                row(2, 'Conversion', 'fund', 'register', 0.333333, dst_fund_name='other', dst_register='register', dst_units=1.23456789, rate=4.0211)]
+        numeric = decimal_numeric(places=2, unit_places=6)
+        for (buy, conversion) in (fifo_fund_rows(numeric, rows), [fifo_fund_row(numeric, values) for values in rows]):
+            self.assertEqual(buy[3:7], (Decimal('10.00'), Decimal('0.00'), Decimal('0.333333'), Decimal('4.021100')))
+            self.assertEqual((conversion[3], conversion[6], conversion[8]), (Decimal('0.333333'), Decimal('1.234568'), Decimal('4.021100')))
+
+    def test_date_formats(self):
+        expected = datetime.date(2021, 3, 4)
+        for value in ('2021-03-04', ' 04.03.2021 ', '04/03/2021', '2021/03/04', '2021-03-04 00:00:00', '44259', 44259.0):
+            self.assertEqual(parse_date(value), expected, value)
+        self.assertIsNone(parse_date(''))
+        with self.assertWarns(UserWarning):
+            self.assertIsNone(parse_date('early March'))
+
+    def test_undefined_transaction_type(self):
+        rows = [row(1, 'Buy', 'fund', 'register', 1.0, 10.0), row(2, 'Dividend', 'fund', 'register', 1.0, 1.0)]
+        with self.assertRaises(ValueError):
+            fifo_fund_rows(fraction_numeric(), rows)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import bisect
+import datetime
+from operator import itemgetter
+
+class transaction_timeline:
+    def __init__(self, checkpoint_interval : int = 1024):
+        assert checkpoint_interval > 0
+        self.__interval = checkpoint_interval
+        self.__dates = []
+        self.__entries = []
+        self.__remaining = {}
+        self.__closed = {}
+        self.__checkpoints = [(0, {}, {})]
+
+    @staticmethod
+    def __apply(totals : dict, changes):
+        for (key, value) in changes:
+            if key in totals:
+                totals[key] = tuple(x + y for (x, y) in zip(totals[key], value))
+            else:
+                totals[key] = value
+
+    def record(self, date, remaining, closed):
+        entry = (tuple(remaining), tuple(closed))
+        index = bisect.bisect_right(self.__dates, date)
+        if index < len(self.__dates):
+            del self.__checkpoints[bisect.bisect_right(self.__checkpoints, index, key=itemgetter(0)):]
+        self.__dates.insert(index, date)
+        self.__entries.insert(index, entry)
+        self.__apply(self.__remaining, entry[0])
+        self.__apply(self.__closed, entry[1])
+        if len(self.__entries) % self.__interval == 0:
+            self.__checkpoints.append((len(self.__entries), dict(self.__remaining), dict(self.__closed)))
+
+    def to_record(self):
+        return {'checkpoint_interval' : self.__interval,
+                'entries' : [[date.isoformat(), [[list(key), [str(x) for x in value]] for (key, value) in remaining],
+                              [[list(key), [str(x) for x in value]] for (key, value) in closed]]
+                             for (date, (remaining, closed)) in zip(self.__dates, self.__entries)]}
+
+    @staticmethod
+    def from_record(record : dict, number_type):
+        timeline = transaction_timeline(record['checkpoint_interval'])
+        for (date, remaining, closed) in record['entries']:
+            timeline.record(datetime.date.fromisoformat(date), [(tuple(key), tuple(map(number_type, value))) for (key, value) in remaining],
+                            [(tuple(key), tuple(map(number_type, value))) for (key, value) in closed])
+        return timeline
+
+    def __state(self, index : int):
+        if index == len(self.__entries):
+            return (dict(self.__remaining), dict(self.__closed))
+        (start, remaining, closed) = self.__checkpoints[bisect.bisect_right(self.__checkpoints, index, key=itemgetter(0)) - 1]
+        (remaining, closed) = (dict(remaining), dict(closed))
+        for (remaining_changes, closed_changes) in self.__entries[start:index]:
+            self.__apply(remaining, remaining_changes)
+            self.__apply(closed, closed_changes)
+        return (remaining, closed)
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def as_of(self, date):
+        (remaining, closed) = self.__state(bisect.bisect_right(self.__dates, date))
+        return ({key : value for (key, value) in remaining.items() if value[2] != 0}, closed)
+
+    def realized_between(self, start, end):
+        closed = {}
+        for (remaining_changes, closed_changes) in self.__entries[bisect.bisect_left(self.__dates, start):bisect.bisect_right(self.__dates, end)]:
+            self.__apply(closed, closed_changes)
+        return closed
@@ -0,0 +1,150 @@
+import sys
+import datetime
+import functools
+import itertools
+import warnings
+from enum import IntEnum
+from instrumentation import timed
+
+class Field(IntEnum):
+    lp = 0,
+    date = 1,
+    operation = 2,
+    number = 3,
+    payment = 4,
+    fund_name = 5,
+    register = 6,
+    units = 7,
+    commision = 8,
+    dst_fund_name = 9,
+    dst_register = 10,
+    dst_units = 11,
+    currency_converion_rate = 12
+    tax_gain = 13
+
+spreadsheet_epoch = datetime.date(1899, 12, 30)
+
+date_formats = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y.%m.%d')
+
+def parse_date(value):
+    if isinstance(value, str):
+        value = value.strip()
+        if value == '':
+            return None
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+        for date_format in date_formats:
+            try:
+                return datetime.datetime.strptime(value, date_format).date()
+            except ValueError:
+                pass
+        try:
+            value = float(value)
+        except ValueError:
+            warnings.warn(f'Unrecognised date {value!r}, the row is treated as undated')
+            return None
+    return spreadsheet_epoch + datetime.timedelta(days=int(value))
+
+def rate_cell(numeric, value):
+    if isinstance(value, str) and value.strip() == '':
+        return None
+    return numeric.units_from_cell(value)
+
+def fifo_fund_buy_row(numeric, row):
+    fund_name = sys.intern(row[Field.fund_name].strip())
+    register = sys.intern(row[Field.register].strip())
+    payment = numeric.from_cell(row[Field.payment])
+    units = numeric.units_from_cell(row[Field.units])
+    currency_conversion_rate = rate_cell(numeric, row[Field.currency_converion_rate])
+    fee = numeric.from_cell(row[Field.commision])
+    transaction_number = row[Field.number].strip()
+    return ('Buy', fund_name, register, payment, fee, units, currency_conversion_rate, transaction_number, parse_date(row[Field.date]))
+
+def fifo_fund_conversion_row(numeric, row):
+    src_fund_name = sys.intern(row[Field.fund_name].strip())
+    src_register = sys.intern(row[Field.register].strip())
+    src_units = numeric.units_from_cell(row[Field.units])
+    dst_fund_name = sys.intern(row[Field.dst_fund_name].strip())
+    dst_register = sys.intern(row[Field.dst_register].strip())
+    dst_units = numeric.units_from_cell(row[Field.dst_units])
+    fee = numeric.from_cell(row[Field.commision])
+    transaction_number = row[Field.number].strip()
+    currency_conversion_rate = rate_cell(numeric, row[Field.currency_converion_rate])
+    return ('Conversion', src_fund_name, src_register, src_units, dst_fund_name, dst_register, dst_units, fee, currency_conversion_rate,
+            transaction_number, parse_date(row[Field.date]))
+
+def fifo_fund_sell_row(numeric, row):
+    fund_name = sys.intern(row[Field.fund_name].strip())
+    register = sys.intern(row[Field.register].strip())
+    payment = numeric.from_cell(row[Field.payment])
+    units = numeric.units_from_cell(row[Field.units])
+    fee = numeric.from_cell(row[Field.commision])
+    transaction_number = row[Field.number].strip()
+    currency_conversion_rate = rate_cell(numeric, row[Field.currency_converion_rate])
+    return ('Sell', fund_name, register, payment, fee, units, currency_conversion_rate, transaction_number, parse_date(row[Field.date]))
+
+row_parsers = {'Buy' : fifo_fund_buy_row, 'Conversion' : fifo_fund_conversion_row, 'Sell' : fifo_fund_sell_row}
+
+row_layout = {'Buy' : ((Field.fund_name, 'name'), (Field.register, 'name'), (Field.payment, 'number'), (Field.commision, 'number'),
+                       (Field.units, 'units'), (Field.currency_converion_rate, 'rate'), (Field.number, 'text'), (Field.date, 'date')),
+              'Conversion' : ((Field.fund_name, 'name'), (Field.register, 'name'), (Field.units, 'units'),
+                              (Field.dst_fund_name, 'name'), (Field.dst_register, 'name'), (Field.dst_units, 'units'),
+                              (Field.commision, 'number'), (Field.currency_converion_rate, 'rate'), (Field.number, 'text'), (Field.date, 'date')),
+              'Sell' : ((Field.fund_name, 'name'), (Field.register, 'name'), (Field.payment, 'number'), (Field.commision, 'number'),
+                        (Field.units, 'units'), (Field.currency_converion_rate, 'rate'), (Field.number, 'text'), (Field.date, 'date'))}
+
+def fifo_fund_row(numeric, row):
+    transaction_type = row[Field.operation]
+    if transaction_type not in row_parsers:
+        raise ValueError(f'Undefined transaction type {transaction_type}')
+    return row_parsers[transaction_type](numeric, row)
+
+def intern_cell(value : str):
+    return sys.intern(value.strip())
+
+def convert_column(convert, column : list):
+    converted = {value : convert(value) for value in set(column)}
+    return list(map(converted.__getitem__, column))
+
+def fifo_fund_rows(numeric, rows : list):
+    converters = {'name' : intern_cell, 'number' : numeric.from_cell, 'units' : numeric.units_from_cell,
+                  'rate' : functools.partial(rate_cell, numeric), 'date' : parse_date}
+    groups = {}
+    for (index, row) in enumerate(rows):
+        groups.setdefault(row[Field.operation], []).append(index)
+    batch = [None] * len(rows)
+    for (transaction_type, indices) in groups.items():
+        if transaction_type not in row_layout:
+            raise ValueError(f'Undefined transaction type {transaction_type}')
+        cells = list(zip(*map(rows.__getitem__, indices)))
+        columns = [list(map(str.strip, cells[field])) if kind == 'text' else convert_column(converters[kind], cells[field])
+                   for (field, kind) in row_layout[transaction_type]]
+        for (index, values) in zip(indices, zip(*columns)):
+            batch[index] = (transaction_type, *values)
+    return batch
+
+def fifo_fund_buy_transaction(engine, row):
+    engine.add_payment(*fifo_fund_buy_row(engine.numeric, row)[1:])
+
+def fifo_fund_conversion_transaction(engine, row):
+    engine.add_conversion(*fifo_fund_conversion_row(engine.numeric, row)[1:])
+
+def fifo_fund_sell_transaction(engine, row):
+    engine.add_withdrawal(*fifo_fund_sell_row(engine.numeric, row)[1:])
+
+def fifo_fund_transaction(engine, row):
+    engine.apply_batch([fifo_fund_row(engine.numeric, row)])
+
+def fifo_fund_transactions(engine, rows, batch_size : int = 4096):
+    metrics = engine.metrics
+    iterator = iter(rows)
+    while True:
+        with timed(metrics, 'rows.read'):
+            chunk = list(itertools.islice(iterator, batch_size))
+        if not chunk:
+            break
+        with timed(metrics, 'rows.parse'):
+            batch = fifo_fund_rows(engine.numeric, chunk)
+        engine.apply_batch(batch)
@@ -0,0 +1,72 @@
+import posixpath
+import zipfile
+from xml.etree import ElementTree
+from ingest import header_rows, column_index, padded
+
+spreadsheet_ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+relationship_ns = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+package_ns = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+def xlsx_shared_strings(archive : zipfile.ZipFile):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as stream:
+        for (event, element) in ElementTree.iterparse(stream):
+            if element.tag == f'{spreadsheet_ns}si':
+                strings.append(''.join(text.text or '' for text in element.iter(f'{spreadsheet_ns}t')))
+                element.clear()
+    return strings
+
+def xlsx_sheet_paths(archive : zipfile.ZipFile):
+    relationships = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for relationship in relationships.iter(f'{package_ns}Relationship'):
+        target = relationship.get('Target')
+        targets[relationship.get('Id')] = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    for sheet in workbook.iter(f'{spreadsheet_ns}sheet'):
+        yield (sheet.get('name'), targets[sheet.get(f'{relationship_ns}id')])
+
+def xlsx_cell_value(cell, shared_strings : list):
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(text.text or '' for text in cell.iter(f'{spreadsheet_ns}t'))
+    value = cell.find(f'{spreadsheet_ns}v')
+    if value is None or value.text is None:
+        return ''
+    if cell_type == 's':
+        return shared_strings[int(value.text)]
+    if cell_type in ('str', 'e'):
+        return value.text
+    if cell_type == 'b':
+        return int(value.text)
+    return float(value.text)
+
+def xlsx_rows(spreadsheet_file : str, sheet_path : str, shared_strings : list, width : int = 0):
+    with zipfile.ZipFile(spreadsheet_file) as archive, archive.open(sheet_path) as stream:
+        sheet_data = None
+        row_number = 0
+        for (event, element) in ElementTree.iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == f'{spreadsheet_ns}sheetData':
+                    sheet_data = element
+                continue
+            if element.tag != f'{spreadsheet_ns}row':
+                continue
+            row_number = int(element.get('r', row_number + 1))
+            if row_number > header_rows:
+                row = []
+                for cell in element.iter(f'{spreadsheet_ns}c'):
+                    index = column_index(cell.get('r')) if cell.get('r') is not None else len(row)
+                    padded(row, index)
+                    row.append(xlsx_cell_value(cell, shared_strings))
+                yield padded(row, width)
+            sheet_data.clear()
+
+def xlsx_sheets(spreadsheet_file : str, width : int = 0):
+    with zipfile.ZipFile(spreadsheet_file) as archive:
+        shared_strings = xlsx_shared_strings(archive)
+        sheet_paths = list(xlsx_sheet_paths(archive))
+    for (sheet_name, sheet_path) in sheet_paths:
+        yield (sheet_name, xlsx_rows(spreadsheet_file, sheet_path, shared_strings, width))